@@ -0,0 +1,399 @@
+#!/usr/bin/env python3
+"""
+运动文件导入（GPX / TCX / FIT）
+把手表导出的活动文件写入跑步日志（run_log.py），日报里的跑步统计就来自真实数据。
+
+- 流式解析：GPX/TCX 用 expat 边读边处理，不建 DOM；FIT 按消息定义逐条解码，只取 record 消息里的
+  时间和经纬度。轨迹点直接追加到 array 列，一年 1 Hz 的轨迹也只占几十 MB 连续内存。
+- 距离：对整条轨迹的经纬度数组做向量化 haversine（NumPy）；没有安装 NumPy 时逐点计算，结果相同但慢很多。
+- 移动时间：相邻两点速度不低于 MIN_MOVING_SPEED 且间隔不超过 MAX_POINT_GAP 的时间之和，配速 = 移动时间 / 距离。
+- 批量导入：文件在进程池中并行解析（默认用满所有 CPU），主进程按开始时间顺序写入跑步日志；
+  已导入的文件按内容哈希记录在跑步日志旁的 .imported.json 中，重复导入会跳过。
+
+用法:
+    python activity_import.py <文件或目录>... [--workers N] [--dry-run]
+
+环境变量：
+    RUN_TIMEZONE   按哪个时区的日期记入跑步日志，默认 Asia/Shanghai
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import struct
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timezone
+from xml.parsers import expat
+from zoneinfo import ZoneInfo
+
+from run_log import format_duration, get_run_log
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+RUN_TIMEZONE = os.getenv('RUN_TIMEZONE', 'Asia/Shanghai')
+SUPPORTED_SUFFIXES = ('.gpx', '.tcx', '.fit')
+EARTH_RADIUS = 6371008.8
+# 低于这个速度（米/秒）视为停下
+MIN_MOVING_SPEED = 0.5
+# 两点间隔超过这个秒数视为暂停（自动暂停、信号丢失）
+MAX_POINT_GAP = 30
+READ_CHUNK = 1 << 16
+
+# FIT 时间戳从 1989-12-31 00:00 UTC 起算
+FIT_EPOCH = 631065600
+FIT_RECORD = 20
+FIT_TIMESTAMP, FIT_LAT, FIT_LONG = 253, 0, 1
+FIT_INVALID_SINT32 = 0x7FFFFFFF
+SEMICIRCLE = 180 / 2 ** 31
+
+
+class Track:
+    """轨迹点的三列数组：UTC 时间戳、纬度、经度"""
+
+    def __init__(self):
+        self.times = array('d')
+        self.lats = array('d')
+        self.lons = array('d')
+
+    def add(self, timestamp, lat, lon):
+        self.times.append(timestamp)
+        self.lats.append(lat)
+        self.lons.append(lon)
+
+    def __len__(self):
+        return len(self.times)
+
+
+def parse_time(text):
+    """ISO 8601 时间（GPX/TCX 一般以 Z 结尾）转换成 UTC 时间戳"""
+    moment = datetime.fromisoformat(text.strip().replace('Z', '+00:00'))
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+
+def _parse_xml(path, point_tag, time_tag, lat_tag=None, lon_tag=None):
+    """expat 流式解析 GPX/TCX：point_tag 结束时把收集到的时间和经纬度写入轨迹
+
+    GPX 的经纬度是 trkpt 的属性（lat_tag 为 None），TCX 的是子元素 LatitudeDegrees / LongitudeDegrees。
+    """
+    track = Track()
+    point = {}
+    # 只收集需要的元素的文本，其余字符数据直接丢弃
+    text = []
+    capturing = [False]
+    capture = {time_tag, lat_tag, lon_tag} - {None}
+
+    # 不做命名空间处理，带前缀的 'gpx:trkpt' 去掉前缀；每种元素名只拆一次
+    names = {}
+
+    def local(name):
+        short = names.get(name)
+        if short is None:
+            short = names[name] = name.rpartition(':')[2]
+        return short
+
+    def start(name, attrs):
+        name = local(name)
+        if name == point_tag:
+            point.clear()
+            if lat_tag is None and 'lat' in attrs and 'lon' in attrs:
+                point['lat'], point['lon'] = float(attrs['lat']), float(attrs['lon'])
+        elif name in capture:
+            text.clear()
+            capturing[0] = True
+
+    def end(name):
+        name = local(name)
+        capturing[0] = False
+        if name == point_tag:
+            if 'time' in point and 'lat' in point:
+                track.add(point['time'], point['lat'], point['lon'])
+        elif name == time_tag:
+            point['time'] = parse_time(''.join(text))
+        elif name == lat_tag:
+            point['lat'] = float(''.join(text))
+        elif name == lon_tag:
+            point['lon'] = float(''.join(text))
+
+    parser = expat.ParserCreate()
+    parser.buffer_text = True
+    parser.StartElementHandler = start
+    parser.EndElementHandler = end
+    parser.CharacterDataHandler = lambda data: capturing[0] and text.append(data)
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(READ_CHUNK)
+            parser.Parse(chunk, not chunk)
+            if not chunk:
+                break
+    return track
+
+
+def parse_gpx(path):
+    return _parse_xml(path, 'trkpt', 'time')
+
+
+def parse_tcx(path):
+    return _parse_xml(path, 'Trackpoint', 'Time', 'LatitudeDegrees', 'LongitudeDegrees')
+
+
+def _fit_layout(architecture, fields, developer_size):
+    """把一个消息定义编译成 struct，返回 (struct, 时间戳/纬度/经度在解包结果中的下标)"""
+    order = '>' if architecture else '<'
+    codes = []
+    indexes = {}
+    for number, size, _ in fields:
+        if number in (FIT_TIMESTAMP, FIT_LAT, FIT_LONG) and size == 4:
+            indexes[number] = len(codes)
+            codes.append('I' if number == FIT_TIMESTAMP else 'i')
+        else:
+            codes.append(f'{size}s')
+    if developer_size:
+        codes.append(f'{developer_size}s')
+    return struct.Struct(order + ''.join(codes)), indexes
+
+
+def parse_fit(path):
+    """FIT 流式解码：只解 record 消息的时间和经纬度，其余消息按定义的长度跳过"""
+    track = Track()
+    layouts = {}
+    last_timestamp = 0
+    with open(path, 'rb') as f:
+        header = f.read(12)
+        if len(header) < 12 or header[8:12] != b'.FIT':
+            raise ValueError("不是 FIT 文件")
+        header_size = header[0]
+        data_size = struct.unpack('<I', header[4:8])[0]
+        f.read(header_size - 12)
+        remaining = data_size
+
+        def read(size):
+            nonlocal remaining
+            data = f.read(size)
+            if len(data) != size:
+                raise ValueError("FIT 文件被截断")
+            remaining -= size
+            return data
+
+        while remaining > 0:
+            record_header = read(1)[0]
+            if record_header & 0x80:
+                # 压缩时间戳：低 5 位是相对上一个时间戳的偏移
+                local_type = (record_header >> 5) & 0x03
+                offset = record_header & 0x1F
+                timestamp = (last_timestamp & ~0x1F) + offset
+                if offset < (last_timestamp & 0x1F):
+                    timestamp += 0x20
+                last_timestamp = timestamp
+            else:
+                local_type = record_header & 0x0F
+                timestamp = None
+                if record_header & 0x40:
+                    # 定义消息
+                    _, architecture = read(2)
+                    global_number = struct.unpack('>H' if architecture else '<H', read(2))[0]
+                    field_count = read(1)[0]
+                    fields = [tuple(read(3)) for _ in range(field_count)]
+                    developer_size = 0
+                    if record_header & 0x20:
+                        developer_count = read(1)[0]
+                        developer_size = sum(read(3)[1] for _ in range(developer_count))
+                    layout, indexes = _fit_layout(architecture, fields, developer_size)
+                    layouts[local_type] = (global_number, layout, indexes)
+                    continue
+
+            if local_type not in layouts:
+                raise ValueError(f"FIT 数据消息缺少定义 (local type {local_type})")
+            global_number, layout, indexes = layouts[local_type]
+            values = layout.unpack(read(layout.size))
+            if FIT_TIMESTAMP in indexes:
+                timestamp = values[indexes[FIT_TIMESTAMP]]
+                last_timestamp = timestamp
+            if global_number != FIT_RECORD or timestamp is None or FIT_LAT not in indexes or FIT_LONG not in indexes:
+                continue
+            lat, lon = values[indexes[FIT_LAT]], values[indexes[FIT_LONG]]
+            if lat == FIT_INVALID_SINT32 or lon == FIT_INVALID_SINT32:
+                continue
+            track.add(timestamp + FIT_EPOCH, lat * SEMICIRCLE, lon * SEMICIRCLE)
+    return track
+
+
+PARSERS = {'.gpx': parse_gpx, '.tcx': parse_tcx, '.fit': parse_fit}
+
+
+def segment_lengths(lats, lons):
+    """相邻两点之间的 haversine 距离（米），返回长度为 n-1 的序列"""
+    if np is not None:
+        lat = np.radians(np.frombuffer(lats, dtype=np.float64))
+        lon = np.radians(np.frombuffer(lons, dtype=np.float64))
+        a = (np.sin(np.diff(lat) / 2) ** 2
+             + np.cos(lat[:-1]) * np.cos(lat[1:]) * np.sin(np.diff(lon) / 2) ** 2)
+        return 2 * EARTH_RADIUS * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+    lengths = array('d')
+    previous = None
+    for lat, lon in zip(lats, lons):
+        lat, lon = math.radians(lat), math.radians(lon)
+        if previous is not None:
+            a = (math.sin((lat - previous[0]) / 2) ** 2
+                 + math.cos(previous[0]) * math.cos(lat) * math.sin((lon - previous[1]) / 2) ** 2)
+            lengths.append(2 * EARTH_RADIUS * math.asin(math.sqrt(min(a, 1.0))))
+        previous = (lat, lon)
+    return lengths
+
+
+def track_stats(track):
+    """距离（米）、移动时间和总时间（秒）"""
+    if len(track) < 2:
+        return 0.0, 0.0, 0.0
+    lengths = segment_lengths(track.lats, track.lons)
+    elapsed = track.times[-1] - track.times[0]
+    if np is not None:
+        gaps = np.diff(np.frombuffer(track.times, dtype=np.float64))
+        moving = (gaps > 0) & (gaps <= MAX_POINT_GAP) & (lengths >= MIN_MOVING_SPEED * gaps)
+        return float(lengths.sum()), float(gaps[moving].sum()), elapsed
+
+    moving_time = 0.0
+    for index, length in enumerate(lengths):
+        gap = track.times[index + 1] - track.times[index]
+        if 0 < gap <= MAX_POINT_GAP and length >= MIN_MOVING_SPEED * gap:
+            moving_time += gap
+    return math.fsum(lengths), moving_time, elapsed
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(READ_CHUNK), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def analyze_file(path):
+    """解析一个活动文件（在工作进程中运行），返回可 pickle 的结果字典"""
+    result = {'path': path}
+    try:
+        result['digest'] = file_digest(path)
+        track = PARSERS[os.path.splitext(path)[1].lower()](path)
+        if len(track) < 2:
+            result['error'] = "没有带位置的轨迹点"
+            return result
+        distance, moving_time, elapsed = track_stats(track)
+        result.update({
+            'start': track.times[0],
+            'points': len(track),
+            'distance_km': round(distance / 1000, 3),
+            'moving_time': round(moving_time, 1),
+            'elapsed_time': round(elapsed, 1),
+            'pace': round(moving_time / (distance / 1000), 1) if distance else 0.0,
+        })
+    except (OSError, ValueError, KeyError, struct.error, expat.ExpatError) as e:
+        result['error'] = str(e)
+    return result
+
+
+def find_activity_files(paths):
+    """展开目录，返回所有支持格式的文件"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for directory, _, names in os.walk(path):
+                files.extend(os.path.join(directory, name) for name in sorted(names)
+                             if name.lower().endswith(SUPPORTED_SUFFIXES))
+        elif path.lower().endswith(SUPPORTED_SUFFIXES):
+            files.append(path)
+    return files
+
+
+def analyze_files(files, workers=None):
+    """并行解析多个文件；只有一个文件或 workers=1 时在当前进程解析"""
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(files) <= 1:
+        return [analyze_file(path) for path in files]
+    with ProcessPoolExecutor(max_workers=min(workers, len(files))) as executor:
+        chunksize = max(1, len(files) // (workers * 4))
+        return list(executor.map(analyze_file, files, chunksize=chunksize))
+
+
+def imported_index_path(run_log):
+    return f"{os.path.splitext(run_log.path)[0]}.imported.json"
+
+
+def load_imported(run_log):
+    try:
+        with open(imported_index_path(run_log), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def save_imported(run_log, imported):
+    path = imported_index_path(run_log)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(imported, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, path)
+
+
+def import_activities(paths, run_log=None, workers=None, dry_run=False, tz=RUN_TIMEZONE):
+    """导入文件或目录中的活动，返回 {'imported': [...], 'skipped': [...], 'failed': [...]}"""
+    run_log = run_log or get_run_log()
+    imported = load_imported(run_log)
+    results = analyze_files(find_activity_files(paths), workers)
+
+    summary = {'imported': [], 'skipped': [], 'failed': []}
+    zone = ZoneInfo(tz)
+    for result in sorted(results, key=lambda item: item.get('start', 0)):
+        if 'error' in result:
+            summary['failed'].append(result)
+        elif result['digest'] in imported:
+            summary['skipped'].append(result)
+        else:
+            result['date'] = datetime.fromtimestamp(result['start'], zone).date().isoformat()
+            if not dry_run:
+                run_log.append(date.fromisoformat(result['date']),
+                               result['distance_km'], result['moving_time'])
+                imported[result['digest']] = {
+                    'path': os.path.basename(result['path']), 'date': result['date'],
+                    'distance_km': result['distance_km'], 'moving_time': result['moving_time'],
+                }
+            summary['imported'].append(result)
+
+    if summary['imported'] and not dry_run:
+        save_imported(run_log, imported)
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='导入 GPX / TCX / FIT 运动文件到跑步日志')
+    parser.add_argument('paths', nargs='+', help='活动文件或目录')
+    parser.add_argument('--workers', type=int, default=None, help='并行解析的进程数，默认 CPU 核数')
+    parser.add_argument('--dry-run', action='store_true', help='只解析并打印，不写入跑步日志')
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    summary = import_activities(args.paths, workers=args.workers, dry_run=args.dry_run)
+    for result in summary['imported']:
+        print(f"✅ {result['date']} {result['distance_km']:.2f} km  移动 {format_duration(result['moving_time'])}  "
+              f"配速 {format_duration(result['pace'])}/km  ({os.path.basename(result['path'])}, {result['points']} 点)")
+    for result in summary['failed']:
+        print(f"❌ {result['path']}: {result['error']}")
+    print(f"📥 导入 {len(summary['imported'])} 个，已导入过 {len(summary['skipped'])} 个，"
+          f"失败 {len(summary['failed'])} 个，用时 {time.perf_counter() - start:.2f}s"
+          + ("（dry run，未写入）" if args.dry_run else ""))
+    return 1 if summary['failed'] and not summary['imported'] else 0
+
+
+if __name__ == '__main__':
+    import sys
+
+    sys.exit(main())
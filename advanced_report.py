@@ -1,11 +1,18 @@
-import asyncio
 import os
-import requests
-import random
 import json
 from datetime import datetime, timedelta
-from telegram import Bot
-from telegram.constants import ParseMode
+from zoneinfo import ZoneInfo
+
+# telegram、httpx、asyncio 导入较慢（合计约 0.4 秒），事件库会加载 sqlite3，
+# 都只在真正发送或联网时导入，--help、--dry-run --offline 等路径不会加载它们
+import metrics
+from github_graphql import get_graphql_source
+from lunar_calendar import format_lunar
+from poem_corpus import pick_poem, season_of
+from report_cache import REPORT_CACHE_TODAY_TTL, get_report_cache, report_key
+from report_template import render_advanced_report
+from resilience import Deadline, call_with_retries, get_last_good, last_good_key
+from solar_terms import get_solar_term, next_solar_term
 
 # --- 配置 ---
 BOT_TOKEN = os.getenv('BOT_TOKEN', "8226079704:AAHuBWHZphave2xwU_A6ELI3M3IsZOfwZQ4")
@@ -13,18 +20,48 @@ CHAT_ID = os.getenv('CHAT_ID', "-1002587693096")
 GITHUB_TOKEN = os.getenv('GITHUB_TOKEN', '')
 GH_USERNAME = os.getenv('GH_USERNAME', '')
 
+WEEKDAYS = ['一', '二', '三', '四', '五', '六', '日']
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config.json')
+# 配置文件按修改时间缓存，批量推送时不必为每个接收者重复解析
+_config_cache = {}
+
 class DailyReportGenerator:
-    def __init__(self):
-        self.current_time = datetime.now()
+    def __init__(self, username=None, http_client=None, chat_id=None, timezone=None, report_date=None):
+        """
+        Args:
+            username (str): GitHub 用户名，不传则使用环境变量或配置文件
+            chat_id (str): 接收日报的 chat，用于每日诗词的轮转，默认 CHAT_ID
+            http_client (httpx.AsyncClient): 指定 HTTP 客户端，默认使用进程内共享的连接池
+            timezone (str): chat 所在时区（如 Asia/Shanghai），日期、节气、农历按当地日期计算，默认本机时区
+            report_date (date): 按这一天生成日报（补生成历史日报，见 backfill.py），默认今天
+        """
+        if timezone:
+            self.current_time = datetime.now(ZoneInfo(timezone)).replace(tzinfo=None)
+        else:
+            self.current_time = datetime.now()
+        if report_date is not None:
+            self.current_time = datetime.combine(report_date, self.current_time.time())
         self.start_of_year = datetime(self.current_time.year, 1, 1)
         self.config = self.load_config()
+        self.username = username
+        self.chat_id = chat_id or CHAT_ID
+        self._http_client = http_client
+        
+    def get_http_client(self):
+        """获取 HTTP 客户端（默认共享连接池，复用已建立的连接）"""
+        if self._http_client is not None:
+            return self._http_client
+        from http_pool import get_shared_client
+        return get_shared_client()
         
     def load_config(self):
-        """加载配置文件"""
+        """加载配置文件（文件未修改时复用上次解析的结果）"""
         try:
-            config_path = os.path.join(os.path.dirname(__file__), 'config.json')
-            with open(config_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            mtime = os.stat(CONFIG_PATH).st_mtime_ns
+            if _config_cache.get('mtime') != mtime:
+                with open(CONFIG_PATH, 'r', encoding='utf-8') as f:
+                    _config_cache.update(mtime=mtime, config=json.load(f))
+            return _config_cache['config']
         except FileNotFoundError:
             # 如果配置文件不存在，返回默认配置
             return {
@@ -33,6 +70,15 @@ class DailyReportGenerator:
                 }
             }
         
+    def get_github_username(self):
+        """GitHub 用户名：参数 > 环境变量 > 配置文件"""
+        return self.username or GH_USERNAME or self.config.get('github', {}).get('username', '')
+    
+    def github_target_date(self, days_back=1):
+        """要统计 GitHub 活动的日期"""
+        return (self.current_time - timedelta(days=days_back)).date()
+        
+    @metrics.timed('date_info')
     def get_date_info(self):
         """获取日期相关信息：日期、星期、节气、农历"""
         day_of_year = (self.current_time - self.start_of_year).days + 1
@@ -44,13 +90,13 @@ class DailyReportGenerator:
         progress_bar = "█" * filled_blocks + "░" * (20 - filled_blocks)
         
         # 中文星期
-        weekdays = ['一', '二', '三', '四', '五', '六', '日']
-        weekday = weekdays[self.current_time.weekday()]
+        weekday = WEEKDAYS[self.current_time.weekday()]
         
-        # 获取节气（简化版本）
+        # 获取节气及下一个节气
         solar_term = self.get_solar_term()
+        next_term, _, days_to_next_term = next_solar_term(self.current_time.date())
         
-        # 获取农历（简化版本）
+        # 获取农历
         lunar_info = self.get_lunar_date()
         
         return {
@@ -61,265 +107,303 @@ class DailyReportGenerator:
             'progress_percent': round(progress_percent, 1),
             'progress_bar': progress_bar,
             'solar_term': solar_term,
+            'next_solar_term': next_term,
+            'days_to_next_term': days_to_next_term,
             'lunar_date': lunar_info
         }
     
     def get_solar_term(self):
-        """获取当前节气（简化版本）"""
-        # 简化的节气计算，实际应用建议使用专业的农历库
-        month = self.current_time.month
-        day = self.current_time.day
-        
-        solar_terms = {
-            (1, 5, 6): "小寒", (1, 20, 21): "大寒",
-            (2, 3, 5): "立春", (2, 18, 20): "雨水",
-            (3, 5, 6): "惊蛰", (3, 20, 21): "春分",
-            (4, 4, 6): "清明", (4, 19, 21): "谷雨",
-            (5, 5, 6): "立夏", (5, 20, 22): "小满",
-            (6, 5, 7): "芒种", (6, 21, 22): "夏至",
-            (7, 6, 8): "小暑", (7, 22, 24): "大暑",
-            (8, 7, 9): "立秋", (8, 22, 24): "处暑",
-            (9, 7, 9): "白露", (9, 22, 24): "秋分",
-            (10, 8, 9): "寒露", (10, 23, 24): "霜降",
-            (11, 7, 8): "立冬", (11, 22, 23): "小雪",
-            (12, 6, 8): "大雪", (12, 21, 23): "冬至"
-        }
-        
-        for (m, start, end), term in solar_terms.items():
-            if month == m and start <= day <= end:
-                return term
-        return ""
+        """获取当前节气（按太阳视黄经计算，当天不是节气则返回空字符串）"""
+        return get_solar_term(self.current_time.date())
     
+    @metrics.timed('lunar_date')
     def get_lunar_date(self):
-        """获取农历日期（简化版本）"""
+        """获取农历日期（本地计算，无需联网）"""
         try:
-            # 这里使用一个简化的农历API或者库
-            # 实际应用中建议使用专业的农历转换库如 lunardate
-            response = requests.get(
-                f"https://api.xiaobaibk.com/api/lunar/?date={self.current_time.strftime('%Y-%m-%d')}",
-                timeout=3
-            )
-            if response.status_code == 200:
-                data = response.json()
-                if data.get('code') == 200:
-                    lunar_data = data.get('data', {})
-                    return f"{lunar_data.get('lunar_year', '')} {lunar_data.get('lunar_month', '')}{lunar_data.get('lunar_day', '')}"
-        except:
-            pass
-        
-        # 如果API失败，返回简化的农历信息
-        lunar_months = ['正月', '二月', '三月', '四月', '五月', '六月', 
-                       '七月', '八月', '九月', '十月', '冬月', '腊月']
-        lunar_days = ['初一', '初二', '初三', '初四', '初五', '初六', '初七', '初八', '初九', '初十',
-                     '十一', '十二', '十三', '十四', '十五', '十六', '十七', '十八', '十九', '二十',
-                     '廿一', '廿二', '廿三', '廿四', '廿五', '廿六', '廿七', '廿八', '廿九', '三十']
-        
-        # 简单估算（不准确，仅为示例）
-        month_approx = ((self.current_time.month - 1) % 12)
-        day_approx = min(self.current_time.day - 1, 29)
-        
-        return f"{lunar_months[month_approx]}{lunar_days[day_approx]}"
+            return format_lunar(self.current_time)
+        except ValueError:
+            # 超出 1900-2100 农历表范围
+            return ""
     
-    async def get_github_activity(self, days_back=1):
+    @metrics.timed('github_activity')
+    async def get_github_activity(self, days_back=1, deadline=None):
         """获取 GitHub 活动信息
+
+        先把新事件增量同步到本地事件库，再按日期从库里查询，
+        不受 API 第一页 30 条的限制，days_back=2 以上也能查到。
+        GITHUB_SOURCE=graphql 时改用批量 GraphQL 数据源（见 github_graphql.py）。
+        请求在 deadline 内带重试完成，超时或熔断时使用上次成功的结果（见 resilience.py）。
         
         Args:
             days_back (int): 获取几天前的活动，默认1（昨天）
                            0 = 今天, 1 = 昨天, 2 = 前天
+            deadline (Deadline): 这份日报剩余的时间，默认新建一个 REPORT_DEADLINE 的时限
         """
-        username = GH_USERNAME or self.config.get('github', {}).get('username', '')
+        username = self.get_github_username()
         
         if not username:
             return {"prs": [], "issues": [], "commits": [], "stars": 0}
-            
+        
+        target_date = self.github_target_date(days_back)
+        graphql_source = get_graphql_source()
+        source = 'github' if graphql_source is None else 'github_graphql'
+        try:
+            if graphql_source is not None:
+                activity = await call_with_retries(source, lambda timeout: graphql_source.get_activity(
+                    self.get_http_client(), username, target_date, timeout), deadline)
+            else:
+                activity = await self.get_stored_github_activity(username, target_date, deadline)
+        except Exception as e:
+            return self.github_fallback(source, username, target_date, e)
+        
+        if not activity.get('error'):
+            # 结果没变时不重复写盘（批量推送中同一用户、同一天会查很多次）
+            last_good, key = get_last_good(), last_good_key('github', username, target_date)
+            if last_good.peek(key) != activity:
+                last_good.put(key, activity)
+                if graphql_source is not None:
+                    from event_store import activity_counts, get_event_store
+                    # GraphQL 没有原始事件，用当天的结果更新周报、月报用的每日汇总
+                    get_event_store().set_day_activity(username, target_date, activity_counts(activity))
+        return activity
+    
+    async def get_stored_github_activity(self, username, target_date, deadline=None):
+        """同步事件库后按日期查询；同步失败但目标日期已经完整入库时直接用库里的事件"""
+        from event_store import get_event_store
+
+        store = get_event_store()
         try:
-            headers = {'User-Agent': 'Daily-Report-Bot'}
+            headers = {}
             if GITHUB_TOKEN:
                 headers['Authorization'] = f'token {GITHUB_TOKEN}'
             
-            # 获取用户事件
-            events_url = f"https://api.github.com/users/{username}/events"
-            response = requests.get(events_url, headers=headers, timeout=10)
-            
-            if response.status_code != 200:
-                print(f"GitHub API 返回状态码: {response.status_code}")
-                return {"prs": [], "issues": [], "commits": [], "error": True}
-            
-            events = response.json()
-            target_date = self.current_time - timedelta(days=days_back)
-            
-            github_activity = {"prs": [], "issues": [], "commits": [], "date": target_date.strftime('%Y-%m-%d')}
-            
-            for event in events[:30]:  # 检查最近30个事件
-                event_date = datetime.strptime(event['created_at'], '%Y-%m-%dT%H:%M:%SZ')
-                
-                # 检查是否是目标日期的活动
-                if event_date.date() == target_date.date():
-                    if event['type'] == 'PullRequestEvent' and event['payload']['action'] in ['opened', 'closed']:
-                        pr_info = {
-                            'action': '创建了' if event['payload']['action'] == 'opened' else '合并了',
-                            'title': event['payload']['pull_request']['title'],
-                            'repo': event['repo']['name'],
-                            'url': event['payload']['pull_request']['html_url']
-                        }
-                        github_activity['prs'].append(pr_info)
-                        
-                    elif event['type'] == 'IssuesEvent' and event['payload']['action'] == 'opened':
-                        issue_info = {
-                            'action': '创建了',
-                            'title': event['payload']['issue']['title'],
-                            'repo': event['repo']['name'],
-                            'url': event['payload']['issue']['html_url']
-                        }
-                        github_activity['issues'].append(issue_info)
-                        
-                    elif event['type'] == 'PushEvent':
-                        commits = event['payload']['commits']
-                        for commit in commits[:2]:  # 最多2个提交
-                            commit_info = {
-                                'message': commit['message'].split('\n')[0][:60],  # 只取第一行，限制长度
-                                'repo': event['repo']['name']
-                            }
-                            github_activity['commits'].append(commit_info)
-            
-            return github_activity
+            # 只翻页到上次同步的位置；第一页带 ETag，没有新事件时返回 304
+            await call_with_retries('github', lambda timeout: store.sync(
+                self.get_http_client(), username, headers=headers, token=GITHUB_TOKEN, timeout=timeout), deadline)
             
         except Exception as e:
-            print(f"获取 GitHub 活动失败: {e}")
-            return {"prs": [], "issues": [], "commits": [], "error": True}
+            if not store.covers(username, target_date):
+                raise
+            # 目标日期的事件在上次同步时已经完整入库
+            print(f"⚠️ 同步 GitHub 事件失败，使用本地事件库: {e}")
+        
+        return self.summarize_events(store.events_between(username, target_date), target_date)
     
-
+    def github_fallback(self, source, username, target_date, error):
+        """GitHub 超时、熔断或失败：有上次成功的结果就用它（标记为 stale），否则返回错误"""
+        cached = get_last_good().get(last_good_key('github', username, target_date))
+        if cached is not None:
+            print(f"⚠️ 获取 GitHub 活动失败，使用上次成功的结果: {error}")
+            metrics.inc('fallbacks', source=source)
+            return dict(cached, stale=True)
+        print(f"获取 GitHub 活动失败: {error}")
+        metrics.inc('errors', source=source)
+        return {"prs": [], "issues": [], "commits": [], "error": True}
+    
+    def summarize_events(self, events, target_date):
+        """把某一天的事件整理成 PR、Issue、提交列表"""
+        github_activity = {"prs": [], "issues": [], "commits": [], "date": target_date.strftime('%Y-%m-%d')}
+        
+        for event in events:
+            if event['type'] == 'PullRequestEvent' and event['payload']['action'] in ['opened', 'closed']:
+                pr_info = {
+                    'action': '创建了' if event['payload']['action'] == 'opened' else '合并了',
+                    'title': event['payload']['pull_request']['title'],
+                    'repo': event['repo']['name'],
+                    'url': event['payload']['pull_request']['html_url']
+                }
+                github_activity['prs'].append(pr_info)
+                
+            elif event['type'] == 'IssuesEvent' and event['payload']['action'] == 'opened':
+                issue_info = {
+                    'action': '创建了',
+                    'title': event['payload']['issue']['title'],
+                    'repo': event['repo']['name'],
+                    'url': event['payload']['issue']['html_url']
+                }
+                github_activity['issues'].append(issue_info)
+                
+            elif event['type'] == 'PushEvent':
+                commits = event['payload']['commits']
+                for commit in commits[:2]:  # 每次推送最多2个提交
+                    commit_info = {
+                        'message': commit['message'].split('\n')[0][:60],  # 只取第一行，限制长度
+                        'repo': event['repo']['name']
+                    }
+                    github_activity['commits'].append(commit_info)
+        
+        return github_activity
     
     def get_daily_poem(self):
-        """获取每日诗词"""
-        poems = [
-            {"content": "携壶酌流霞，搴菊泛寒荣。", "author": "李白", "title": "九日龙山饮"},
-            {"content": "山重水复疑无路，柳暗花明又一村。", "author": "陆游", "title": "游山西村"},
-            {"content": "海内存知己，天涯若比邻。", "author": "王勃", "title": "送杜少府之任蜀州"},
-            {"content": "落红不是无情物，化作春泥更护花。", "author": "龚自珍", "title": "己亥杂诗"},
-            {"content": "会当凌绝顶，一览众山小。", "author": "杜甫", "title": "望岳"},
-            {"content": "长风破浪会有时，直挂云帆济沧海。", "author": "李白", "title": "行路难"},
-            {"content": "问君能有几多愁，恰似一江春水向东流。", "author": "李煜", "title": "虞美人"},
-            {"content": "春花秋月何时了，往事知多少。", "author": "李煜", "title": "虞美人"},
-            {"content": "但愿人长久，千里共婵娟。", "author": "苏轼", "title": "水调歌头"},
-            {"content": "人生如梦，一尊还酹江月。", "author": "苏轼", "title": "念奴娇·赤壁怀古"},
-            {"content": "采菊东篱下，悠然见南山。", "author": "陶渊明", "title": "饮酒"},
-            {"content": "不畏浮云遮望眼，自缘身在最高层。", "author": "王安石", "title": "登飞来峰"},
-            {"content": "千里莺啼绿映红，水村山郭酒旗风。", "author": "杜牧", "title": "江南春"},
-            {"content": "停车坐爱枫林晚，霜叶红于二月花。", "author": "杜牧", "title": "山行"},
-        ]
-        return random.choice(poems)
+        """获取每日诗词（同一个 chat 每天固定一首，轮完整个诗词库前不重复）"""
+        poem_config = self.config.get('poem', {})
+        today = self.current_time.date()
+        return pick_poem(
+            self.chat_id,
+            today,
+            author=poem_config.get('author') or None,
+            season=season_of(today) if poem_config.get('match_season') else None,
+            solar_term=self.get_solar_term() if poem_config.get('match_solar_term') else None
+        )
     
-    async def generate_report(self, github_days_back=1):
-        """生成简洁日报"""
-        date_info = self.get_date_info()
-        github_activity = await self.get_github_activity(github_days_back)
-        poem = self.get_daily_poem()
+    async def generate_report(self, github_days_back=1, offline=False, use_cache=True, cache_only=False,
+                              deadline=None):
+        """生成简洁日报
 
-        # 构建报告文本
-        report = f"<b>📅 每日报告</b>\n\n"
-        report += f"📆 <b>{date_info['date']} {date_info['weekday']}</b>\n"
-        if date_info['solar_term']:
-            report += f"🌸 节气：{date_info['solar_term']}\n"
-        report += f"🏮 农历：{date_info['lunar_date']}\n\n"
-        report += f"今天是今年的第 <b>{date_info['day_of_year']}</b> 天\n"
-        report += f"<code>{date_info['progress_bar']}</code> {date_info['progress_percent']}% ({date_info['day_of_year']}/{date_info['total_days']})\n\n"
+        Args:
+            offline (bool): 不请求 GitHub，只用本地数据渲染（用于预览）
+            use_cache (bool): 使用日报缓存，重跑或多个 chat 共用同一份数据时直接命中
+            cache_only (bool): 只读缓存、不联网；缓存里没有 GitHub 数据时按 offline 处理（--preview）
+            deadline (Deadline): 等待数据源的时限，默认 REPORT_DEADLINE；交互模式用更短的时限
 
-        # GitHub 活动
-        if github_days_back == 0:
-            date_text = "今天"
-        elif github_days_back == 1:
-            date_text = "昨天"
+        生成后 self.degraded 表示 GitHub 部分是否用了旧数据或获取失败。
+        """
+        # 各数据源共用这份日报的总时限
+        deadline = deadline or Deadline()
+        self.degraded = False
+        cache = get_report_cache() if use_cache and (cache_only or not offline) else None
+        if cache is not None:
+            user = self.get_github_username()
+            day = self.current_time.date()
+            chat_key = report_key(user, day, github_days_back, self.chat_id)
+            sections_key = report_key(user, day, github_days_back)
+            cached = cache.get(chat_key)
+            if cached is not None:
+                return cached['report']
+            sections = cache.get(sections_key)
         else:
-            date_text = f"{github_days_back}天前"
-        report += f"<b>💻 GitHub ({date_text})：</b>\n"
-        has_activity = False
-        for pr in github_activity.get('prs', []):
-            report += f"• {pr['action']} PR: {pr['title']} ({pr['repo']})\n"
-            has_activity = True
-        for issue in github_activity.get('issues', []):
-            report += f"• {issue['action']} Issue: {issue['title']} ({issue['repo']})\n"
-            has_activity = True
-        for commit in github_activity.get('commits', []):
-            report += f"• 提交了: {commit['message']} ({commit['repo']})\n"
-            has_activity = True
-        if not has_activity:
-            if github_activity.get('error'):
-                report += "• GitHub 数据获取失败\n"
-            else:
-                report += f"• {date_text}没有 GitHub 活动\n"
-        report += "\n"
+            sections = None
 
-        # 每日诗词
-        report += "<b>📜 今天的一句诗:</b>\n"
-        report += f"<i>{poem['content']}</i>\n"
-        if poem.get('author') and poem.get('title'):
-            report += f"—— {poem['author']}《{poem['title']}》\n"
+        if sections is not None:
+            date_info, github_activity = sections['date_info'], sections['github_activity']
+        else:
+            date_info = self.get_date_info()
+            if offline or cache_only:
+                github_activity = {"prs": [], "issues": [], "commits": []}
+            else:
+                github_activity = await self.get_github_activity(github_days_back, deadline)
+        self.degraded = bool(github_activity.get('error') or github_activity.get('stale'))
+        poem = self.get_daily_poem()
+        with metrics.span('render'):
+            report = render_advanced_report(date_info, github_activity, poem, github_days_back)
 
+        # 只缓存完整、成功的结果；GitHub 获取失败或用了旧数据时下次应重新请求
+        if cache is not None and not cache_only and not github_activity.get('error') and not github_activity.get('stale'):
+            # 今天还没过完，之后的提交要能出现在日报里，只短暂缓存
+            ttl = REPORT_CACHE_TODAY_TTL if github_days_back == 0 else None
+            if sections is None:
+                cache.put(sections_key, {'date_info': date_info, 'github_activity': github_activity}, ttl=ttl)
+            cache.put(chat_key, {'report': report}, ttl=ttl)
         return report
 
-async def send_daily_report(github_days_back=1):
+async def send_daily_report(github_days_back=1, force=False):
     """发送日报
     
     Args:
         github_days_back (int): 获取几天前的 GitHub 活动，默认1（昨天）
+        force (bool): 发送日志里今天已经发送过也重新发送
     """
-    bot = Bot(token=BOT_TOKEN)
+    from bot_client import create_bot
+    from delivery import DeliveryQueue
+    from http_pool import close_shared_client
+    from send_journal import get_send_journal, message_ids
+
+    generator = DailyReportGenerator()
+    journal = get_send_journal()
+    report_date = generator.current_time.date()
+    if not force and journal.is_done(CHAT_ID, report_date, github_days_back):
+        print("⏭️ 今天的日报已经发送过（见发送日志），跳过；需要重发请加 --force")
+        return
+
+    bot = create_bot(BOT_TOKEN)
+    # 日报和错误通知走同一个队列：按顺序发送，429 时等待，超长日报自动拆分
+    delivery = DeliveryQueue(bot, workers=1)
+    report = None
     
     try:
         # 生成日报
-        generator = DailyReportGenerator()
         report = await generator.generate_report(github_days_back)
         
         # 发送消息
-        await bot.send_message(
-            chat_id=CHAT_ID,
-            text=report,
-            parse_mode=ParseMode.HTML,
-            disable_web_page_preview=True
-        )
+        messages = await delivery.send(CHAT_ID, report)
+        journal.record_sent(CHAT_ID, report_date, message_ids(messages), github_days_back)
         
         print("✅ 日报发送成功！")
         
     except Exception as e:
         print(f"❌ 日报发送失败: {e}")
+        # 记为死信，之后可以用 python send_journal.py replay 补发
+        journal.record_failed(CHAT_ID, report_date, e, text=report, days_back=github_days_back)
         # 发送简化的错误通知
         try:
             error_msg = f"⚠️ 日报生成失败\n\n错误: {str(e)[:100]}"
-            await bot.send_message(chat_id=CHAT_ID, text=error_msg)
-        except:
+            await delivery.send(CHAT_ID, error_msg, parse_mode=None)
+        except Exception:
             print("连错误通知都发送失败了")
+    finally:
+        await delivery.close()
+        journal.close()
+        await close_shared_client()
+        metrics.export_run()
+
+async def preview_report(github_days_back=1, offline=False, cache_only=False):
+    """只生成并打印日报，不发送（不会导入 telegram）"""
+    report = await DailyReportGenerator().generate_report(github_days_back, offline=offline, cache_only=cache_only)
+    if not (offline or cache_only):
+        from http_pool import close_shared_client
+        await close_shared_client()
+    print(report)
 
 # 兼容性：保持原有的简单推送功能
 async def push_poem():
     """推送简单的古诗（向后兼容）"""
     await send_daily_report()
 
+def parse_days_back(mode):
+    """simple / today / yesterday / N -> 几天前"""
+    if mode in (None, 'simple', 'yesterday'):
+        return 1
+    if mode == 'today':
+        return 0
+    if mode.isdigit():
+        return int(mode)
+    raise ValueError(mode)
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='发送每日报告',
+        epilog='示例: python advanced_report.py today --dry-run'
+    )
+    parser.add_argument('mode', nargs='?',
+                        help='simple=简单版本, today=今天的活动, yesterday=昨天的活动（默认）, N=N天前的活动')
+    parser.add_argument('--dry-run', action='store_true', help='只打印日报，不发送')
+    parser.add_argument('--offline', action='store_true', help='不请求 GitHub（与 --dry-run 一起用于快速预览）')
+    parser.add_argument('--preview', action='store_true', help='从日报缓存渲染并打印，不联网、不发送')
+    parser.add_argument('--force', action='store_true', help='发送日志中今天已发送过也重新发送')
+    args = parser.parse_args(argv)
+
+    try:
+        days_back = parse_days_back(args.mode)
+    except ValueError:
+        print("❌ 无效参数")
+        parser.print_help()
+        return 2
+
+    import asyncio
+    if args.preview:
+        asyncio.run(preview_report(days_back, cache_only=True))
+    elif args.dry_run:
+        asyncio.run(preview_report(days_back, offline=args.offline))
+    elif args.mode == 'simple':
+        # python advanced_report.py simple - 发送简单版本
+        asyncio.run(push_poem())
+    else:
+        # python advanced_report.py [today|yesterday|N] - 发送完整日报（默认显示昨天活动）
+        asyncio.run(send_daily_report(github_days_back=days_back, force=args.force))
+    return 0
+
 if __name__ == '__main__':
     import sys
-    
-    if len(sys.argv) > 1:
-        if sys.argv[1] == 'simple':
-            # python advanced_report.py simple - 发送简单版本
-            asyncio.run(push_poem())
-        elif sys.argv[1] == 'today':
-            # python advanced_report.py today - 显示今天的 GitHub 活动
-            asyncio.run(send_daily_report(github_days_back=0))
-        elif sys.argv[1] == 'yesterday':
-            # python advanced_report.py yesterday - 显示昨天的 GitHub 活动
-            asyncio.run(send_daily_report(github_days_back=1))
-        elif sys.argv[1].isdigit():
-            # python advanced_report.py 2 - 显示2天前的 GitHub 活动
-            days = int(sys.argv[1])
-            asyncio.run(send_daily_report(github_days_back=days))
-        else:
-            print("❌ 无效参数")
-            print("用法:")
-            print("  python advanced_report.py        - 默认日报（显示昨天活动）")
-            print("  python advanced_report.py simple - 简单版本")
-            print("  python advanced_report.py today  - 显示今天的活动")
-            print("  python advanced_report.py yesterday - 显示昨天的活动")
-            print("  python advanced_report.py 2     - 显示2天前的活动")
-    else:
-        # python advanced_report.py - 发送完整日报（默认显示昨天活动）
-        asyncio.run(send_daily_report())
+    sys.exit(main())
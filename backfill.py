@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+补生成历史日报 / 年度回顾
+按天调用 send_daily_report(github_days_back=N) 生成一段时间的日报，每一天都要重新请求 GitHub。
+这里每个数据源只取一次：
+- GitHub：事件库同步一次，整个日期范围一次查询，遍历一遍按天分桶
+- 跑步：日志一次读完，按范围过滤
+然后逐天渲染日报（写文件或发送到 Telegram，生成一份输出一份），最后汇总成一份回顾。
+365 天的年度回顾只需要一次数据获取。
+
+GitHub 事件 API 只能取到最近 90 天（最多 300 条）；更早的日期取决于本地事件库里积累了多少。
+
+用法:
+    python backfill.py 2025-01-01 2025-12-31                 逐天写入 backfill_reports/，并输出回顾
+    python backfill.py 2025-01-01 2025-12-31 --summary       只生成回顾
+    python backfill.py 2025-09-01 2025-09-30 --send          逐天发送到 CHAT_ID
+    python backfill.py 2025 --summary --send                 发送 2025 年度回顾
+"""
+
+import argparse
+import asyncio
+import os
+from collections import Counter
+from datetime import date, timedelta
+
+import metrics
+from advanced_report import BOT_TOKEN, CHAT_ID, GITHUB_TOKEN, DailyReportGenerator
+from event_store import get_event_store
+from report_template import render_advanced_report, render_review
+from resilience import Deadline, call_with_retries
+from run_log import format_duration, get_run_log
+
+BACKFILL_DIR = os.getenv('BACKFILL_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backfill_reports'))
+# 回顾里列出的仓库数
+TOP_REPOS = 5
+
+
+def date_range(start, end):
+    return [start + timedelta(days=offset) for offset in range((end - start).days + 1)]
+
+
+def parse_range(start_text, end_text=None):
+    """'2025' -> 全年，'2025-03' -> 整月，否则为 YYYY-MM-DD [YYYY-MM-DD]"""
+    if end_text is None and len(start_text) == 4:
+        year = int(start_text)
+        return date(year, 1, 1), date(year, 12, 31)
+    if end_text is None and len(start_text) == 7:
+        year, month = map(int, start_text.split('-'))
+        following = date(year + month // 12, month % 12 + 1, 1)
+        return date(year, month, 1), following - timedelta(days=1)
+    start = date.fromisoformat(start_text)
+    end = date.fromisoformat(end_text) if end_text else start
+    if end < start:
+        raise ValueError("结束日期早于开始日期")
+    return start, end
+
+
+def bucket_events(events):
+    """一次遍历把事件按 UTC 日期分桶（与 summarize_events 的日期口径一致）"""
+    buckets = {}
+    for event in events:
+        buckets.setdefault(event['created_at'][:10], []).append(event)
+    return buckets
+
+
+async def fetch_github_range(generator, start, end, deadline=None):
+    """同步一次事件库，取回 [start, end] 的全部事件，返回 {日期: 当天的事件}
+
+    同步失败时使用事件库里已有的事件。
+    """
+    username = generator.get_github_username()
+    if not username:
+        return {}
+    store = get_event_store()
+    headers = {'Authorization': f'token {GITHUB_TOKEN}'} if GITHUB_TOKEN else {}
+    try:
+        await call_with_retries('github', lambda timeout: store.sync(
+            generator.get_http_client(), username, headers=headers, token=GITHUB_TOKEN, timeout=timeout),
+            deadline or Deadline())
+    except Exception as e:
+        print(f"⚠️ 同步 GitHub 事件失败，使用本地事件库: {e}")
+    with metrics.span('backfill_query', source='github'):
+        return bucket_events(store.events_between(username, start, end))
+
+
+def running_range(run_log, start, end):
+    """一次读完跑步日志，汇总 [start, end] 内的跑步"""
+    runs = [(day, distance, duration) for day, distance, duration in run_log.read_records()
+            if start <= day <= end]
+    return {
+        'runs': len(runs),
+        'distance': round(sum(run[1] for run in runs), 2),
+        'duration': format_duration(sum(run[2] for run in runs)),
+        'run_days': len({run[0] for run in runs}),
+        'longest': round(max((run[1] for run in runs), default=0.0), 2),
+    }
+
+
+def longest_streak(days):
+    """连续有活动的最长天数"""
+    best = current = 0
+    previous = None
+    for day in sorted(days):
+        current = current + 1 if previous is not None and (day - previous).days == 1 else 1
+        best = max(best, current)
+        previous = day
+    return best
+
+
+def summarize_github(buckets, start, end):
+    """[start, end] 内的 GitHub 统计：活跃天数、连续天数、提交 / PR / Issue 数、常用仓库"""
+    commits = prs = issues = 0
+    repo_commits = Counter()
+    active_days = []
+    busiest_day, busiest_events = None, 0
+    for key, events in buckets.items():
+        day = date.fromisoformat(key)
+        if not start <= day <= end:
+            continue
+        active_days.append(day)
+        if len(events) > busiest_events:
+            busiest_day, busiest_events = key, len(events)
+        for event in events:
+            payload = event.get('payload', {})
+            if event['type'] == 'PushEvent':
+                count = len(payload.get('commits', []))
+                commits += count
+                repo_commits[event['repo']['name']] += count
+            elif event['type'] == 'PullRequestEvent' and payload.get('action') == 'opened':
+                prs += 1
+            elif event['type'] == 'IssuesEvent' and payload.get('action') == 'opened':
+                issues += 1
+    return {
+        'active_days': len(active_days),
+        'longest_streak': longest_streak(active_days),
+        'commits': commits,
+        'prs': prs,
+        'issues': issues,
+        'busiest_day': busiest_day,
+        'busiest_events': busiest_events,
+        'top_repos': [{'repo': repo, 'commits': count}
+                      for repo, count in repo_commits.most_common(TOP_REPOS) if count],
+    }
+
+
+def review_title(start, end):
+    if (start.month, start.day, end.month, end.day) == (1, 1, 12, 31) and start.year == end.year:
+        return f"{start.year} 年度回顾"
+    if start.day == 1 and (end + timedelta(days=1)).day == 1 and (start.year, start.month) == (end.year, end.month):
+        return f"{start.year} 年 {start.month} 月回顾"
+    return "回顾"
+
+
+def build_review(buckets, start, end, run_log=None):
+    return {
+        'title': review_title(start, end),
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'days': (end - start).days + 1,
+        'github': summarize_github(buckets, start, end),
+        'running': running_range(run_log or get_run_log(), start, end),
+    }
+
+
+def iter_reports(buckets, start, end, username=None, chat_id=None, github_days_back=1):
+    """逐天渲染日报：report_date 那天发出的日报，GitHub 部分是 github_days_back 天前的活动"""
+    for day in date_range(start, end):
+        generator = DailyReportGenerator(username=username, chat_id=chat_id, report_date=day)
+        target = generator.github_target_date(github_days_back)
+        activity = generator.summarize_events(buckets.get(target.isoformat(), []), target)
+        with metrics.span('render'):
+            report = render_advanced_report(generator.get_date_info(), activity, generator.get_daily_poem(),
+                                            github_days_back)
+        yield day, report
+
+
+async def emit(buckets, review, start, end, username, chat_id, github_days_back, summary_only,
+               delivery=None, out_dir=None):
+    """逐天输出日报（生成一份就提交 / 写入一份），最后输出回顾，返回日报份数"""
+    count = 0
+    if not summary_only:
+        if delivery is None:
+            os.makedirs(out_dir, exist_ok=True)
+        for day, report in iter_reports(buckets, start, end, username, chat_id, github_days_back):
+            if delivery is not None:
+                delivery.submit(chat_id, report)
+            else:
+                with open(os.path.join(out_dir, f"{day.isoformat()}.html"), 'w', encoding='utf-8') as f:
+                    f.write(report)
+            count += 1
+    if delivery is not None:
+        await delivery.send(chat_id, review)
+    elif not summary_only:
+        with open(os.path.join(out_dir, 'review.html'), 'w', encoding='utf-8') as f:
+            f.write(review)
+    return count
+
+
+async def backfill(start, end, username=None, chat_id=None, github_days_back=1, out_dir=BACKFILL_DIR,
+                   send=False, summary_only=False):
+    """补生成 [start, end] 的日报和回顾，返回回顾的数据"""
+    from http_pool import close_shared_client
+
+    chat_id = chat_id or CHAT_ID
+    generator = DailyReportGenerator(username=username, chat_id=chat_id)
+    try:
+        # 日报需要 github_days_back 天前的活动，回顾需要 [start, end]，一次取回两者的并集
+        buckets = await fetch_github_range(generator, start - timedelta(days=github_days_back), end)
+    finally:
+        await close_shared_client()
+    summary = build_review(buckets, start, end)
+    review = render_review(summary)
+
+    try:
+        if send:
+            from bot_client import create_bot
+            from delivery import DeliveryQueue
+
+            bot = create_bot(BOT_TOKEN)
+            async with bot:
+                # 同一个 chat 按提交顺序发送，日报按日期先后到达
+                async with DeliveryQueue(bot, workers=1) as delivery:
+                    count = await emit(buckets, review, start, end, username, chat_id, github_days_back,
+                                       summary_only, delivery=delivery)
+        else:
+            count = await emit(buckets, review, start, end, username, chat_id, github_days_back,
+                               summary_only, out_dir=out_dir)
+    finally:
+        metrics.export_run()
+
+    if not summary_only:
+        where = f"发送到 {chat_id}" if send else f"写入 {out_dir}"
+        print(f"✅ 已生成 {count} 份日报并{where}")
+    if not send:
+        print(review)
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='补生成一段时间的日报，并汇总成回顾',
+        epilog='示例: python backfill.py 2025 --summary'
+    )
+    parser.add_argument('start', help='开始日期 YYYY-MM-DD，或年份 YYYY、月份 YYYY-MM')
+    parser.add_argument('end', nargs='?', help='结束日期 YYYY-MM-DD（含），默认与开始日期相同')
+    parser.add_argument('--user', help='GitHub 用户名，默认使用环境变量或配置文件')
+    parser.add_argument('--days-back', type=int, default=1, help='每份日报统计几天前的 GitHub 活动，默认 1')
+    parser.add_argument('--out', default=BACKFILL_DIR, help='日报输出目录')
+    parser.add_argument('--send', action='store_true', help='发送到 CHAT_ID，而不是写文件')
+    parser.add_argument('--summary', action='store_true', help='只生成回顾')
+    args = parser.parse_args(argv)
+
+    try:
+        start, end = parse_range(args.start, args.end)
+    except ValueError as e:
+        print(f"❌ 无效的日期范围: {e}")
+        return 2
+    asyncio.run(backfill(start, end, username=args.user, github_days_back=args.days_back, out_dir=args.out,
+                         send=args.send, summary_only=args.summary))
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
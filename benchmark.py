@@ -0,0 +1,670 @@
+#!/usr/bin/env python3
+"""
+性能基准测试（不联网、不需要 Bot Token）
+
+用法:
+    python benchmark.py render [--reports 10000]   模板渲染微基准
+    python benchmark.py suite [选项]               端到端基准：日报生成延迟、各段耗时、批量推送吞吐量
+    python benchmark.py startup [选项]             启动时间：--help、离线预览、import 的耗时和 -X importtime 明细
+    python benchmark.py sources [选项]             GitHub 数据源对比：REST 与批量 GraphQL 的请求数和耗时
+    python benchmark.py sharded [选项]             多进程分片生成：不同进程数下的批量推送吞吐量
+
+suite 使用本地桩代替 GitHub API 和 Telegram Bot，结果写入 JSON 文件；
+指定 --baseline 时与基线比较，超过容差即以非零状态码退出（可用于 CI）。
+"""
+
+import argparse
+import asyncio
+import functools
+import html
+import json
+import os
+import platform
+import random
+import string
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from report_template import render_advanced_report
+
+BENCH_OUTPUT = 'bench_results.json'
+STARTUP_OUTPUT = 'bench_startup.json'
+SOURCES_OUTPUT = 'bench_sources.json'
+SHARDED_OUTPUT = 'bench_sharded.json'
+# 参与基线比较的指标：(路径, 越大越好?)
+BASELINE_METRICS = [
+    ('report_latency_ms.p50', False),
+    ('report_latency_ms.p95', False),
+    ('fanout.*.throughput', True),
+    ('sharded.*.throughput', True),
+    ('startup_ms.*.p50', False),
+    ('*.api_requests', False),
+]
+
+# 启动时间基准测量的命令，以及每条路径不应加载的重模块
+STARTUP_COMMANDS = {
+    'interpreter': (['-c', 'pass'], ()),
+    'help': (['advanced_report.py', '--help'], ('telegram', 'httpx', 'asyncio', 'sqlite3')),
+    'dry_run_offline': (['advanced_report.py', '--dry-run', '--offline'], ('telegram', 'httpx', 'sqlite3')),
+    'preview': (['advanced_report.py', '--preview'], ('telegram', 'httpx')),
+    'import': (['-c', 'import advanced_report'], ('telegram', 'httpx')),
+}
+
+
+def make_render_context(index, rng):
+    """构造一个用户的个性化渲染数据"""
+    def text(length):
+        return ''.join(rng.choice(string.ascii_letters + ' ') for _ in range(length))
+
+    date_info = {
+        'date': '2025年10月07日', 'weekday': '星期二',
+        'day_of_year': 280, 'total_days': 365,
+        'progress_percent': 76.7, 'progress_bar': '█' * 15 + '░' * 5,
+        'solar_term': '' if index % 15 else '寒露',
+        'next_solar_term': '寒露', 'days_to_next_term': 1,
+        'lunar_date': '乙巳蛇年 八月十六',
+    }
+    repo = f"user{index}/{text(8)}"
+    github_activity = {
+        'prs': [{'action': '创建了', 'title': text(40), 'repo': repo, 'url': ''}
+                for _ in range(rng.randint(0, 3))],
+        'issues': [{'action': '创建了', 'title': text(40), 'repo': repo, 'url': ''}
+                   for _ in range(rng.randint(0, 2))],
+        'commits': [{'message': text(60), 'repo': repo} for _ in range(rng.randint(0, 6))],
+    }
+    poem = {'content': '海内存知己，天涯若比邻。', 'author': '王勃', 'title': '送杜少府之任蜀州'}
+    return date_info, github_activity, poem, index % 3
+
+
+def legacy_concat_render(date_info, github_activity, poem, github_days_back):
+    """旧版 generate_report 的字符串拼接写法（无转义），作为对照组"""
+    report = f"<b>📅 每日报告</b>\n\n"
+    report += f"📆 <b>{date_info['date']} {date_info['weekday']}</b>\n"
+    if date_info['solar_term']:
+        report += f"🌸 节气：{date_info['solar_term']}\n"
+    else:
+        report += f"🌿 距离{date_info['next_solar_term']}还有 {date_info['days_to_next_term']} 天\n"
+    if date_info['lunar_date']:
+        report += f"🏮 农历：{date_info['lunar_date']}\n"
+    report += "\n"
+    report += f"今天是今年的第 <b>{date_info['day_of_year']}</b> 天\n"
+    report += f"<code>{date_info['progress_bar']}</code> {date_info['progress_percent']}% ({date_info['day_of_year']}/{date_info['total_days']})\n\n"
+    if github_days_back == 0:
+        date_text = "今天"
+    elif github_days_back == 1:
+        date_text = "昨天"
+    else:
+        date_text = f"{github_days_back}天前"
+    report += f"<b>💻 GitHub ({date_text})：</b>\n"
+    has_activity = False
+    for pr in github_activity.get('prs', []):
+        report += f"• {pr['action']} PR: {pr['title']} ({pr['repo']})\n"
+        has_activity = True
+    for issue in github_activity.get('issues', []):
+        report += f"• {issue['action']} Issue: {issue['title']} ({issue['repo']})\n"
+        has_activity = True
+    for commit in github_activity.get('commits', []):
+        report += f"• 提交了: {commit['message']} ({commit['repo']})\n"
+        has_activity = True
+    if not has_activity:
+        if github_activity.get('error'):
+            report += "• GitHub 数据获取失败\n"
+        else:
+            report += f"• {date_text}没有 GitHub 活动\n"
+    report += "\n"
+    report += "<b>📜 今天的一句诗:</b>\n"
+    report += f"<i>{poem['content']}</i>\n"
+    if poem.get('author') and poem.get('title'):
+        report += f"—— {poem['author']}《{poem['title']}》\n"
+    return report
+
+
+def legacy_escaped_render(date_info, github_activity, poem, github_days_back):
+    """旧版拼接写法 + 对外部数据做 html.escape：与新模板功能对等的对照组"""
+    def esc(item):
+        return {key: html.escape(str(value), quote=False) for key, value in item.items()}
+    github_activity = {key: [esc(item) for item in github_activity[key]]
+                       for key in ('prs', 'issues', 'commits')}
+    return legacy_concat_render(date_info, github_activity, esc(poem), github_days_back)
+
+
+def touch_data(date_info, github_activity, poem, github_days_back):
+    """只遍历数据、不拼接字符串：渲染耗时的下限"""
+    total = 0
+    for value in date_info.values():
+        total += len(str(value))
+    for key in ('prs', 'issues', 'commits'):
+        for item in github_activity[key]:
+            for value in item.values():
+                total += len(value)
+    for value in poem.values():
+        total += len(value)
+    return total
+
+
+def time_per_call(func, contexts, rounds=5):
+    """每份的平均耗时（µs），取几轮中最快的一轮，减少机器抖动的影响"""
+    best = float('inf')
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for context in contexts:
+            func(*context)
+        best = min(best, time.perf_counter() - start)
+    return best / len(contexts) * 1e6
+
+
+def bench_render(args):
+    rng = random.Random(42)
+    contexts = [make_render_context(i, rng) for i in range(args.reports)]
+
+    # 不含特殊字符时，新模板与旧写法输出必须一致
+    for context in contexts[:100]:
+        if render_advanced_report(*context) != legacy_concat_render(*context):
+            print("❌ 模板渲染结果与旧版不一致")
+            return 1
+
+    data_us = time_per_call(touch_data, contexts)
+    template_us = time_per_call(render_advanced_report, contexts)
+    legacy_us = time_per_call(legacy_concat_render, contexts)
+    legacy_escaped_us = time_per_call(legacy_escaped_render, contexts)
+
+    print(f"📊 渲染 {args.reports} 份个性化日报（每份平均耗时）")
+    print(f"   仅遍历数据:        {data_us:8.2f} µs")
+    print(f"   编译模板 + join:   {template_us:8.2f} µs  (含 HTML 转义)")
+    print(f"   旧版字符串拼接:    {legacy_us:8.2f} µs  (无转义，有 HTML 注入问题)")
+    print(f"   旧版拼接 + 转义:   {legacy_escaped_us:8.2f} µs")
+    # 数据遍历只是 len()，不做任何格式化，是达不到的下限；与功能对等的对照组比较才有意义
+    print(f"   模板 / 旧版拼接 + 转义 = {template_us / legacy_escaped_us:.2f}x，"
+          f"模板 / 旧版拼接 = {template_us / legacy_us:.2f}x，模板 / 数据遍历 = {template_us / data_us:.2f}x")
+    return 0
+
+
+class FakeBot:
+    """本地 Telegram Bot 桩：只记录消息，可模拟发送延迟"""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.sent = 0
+
+    async def send_message(self, chat_id, text, **kwargs):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        self.sent += 1
+        return {'message_id': self.sent, 'chat_id': chat_id}
+
+
+def make_github_events(username, rng, count=30):
+    """构造 /users/{username}/events 的响应数据（集中在今天和昨天）"""
+    now = datetime.utcnow()
+    events = []
+    for i in range(count):
+        created = now - timedelta(hours=rng.randint(0, 47))
+        repo = {'name': f"{username}/repo{i % 4}"}
+        kind = rng.choice(['PushEvent', 'PushEvent', 'PullRequestEvent', 'IssuesEvent', 'WatchEvent'])
+        if kind == 'PushEvent':
+            payload = {'commits': [{'message': f"Fix bug #{i}-{j} in module"} for j in range(rng.randint(1, 3))]}
+        elif kind == 'PullRequestEvent':
+            payload = {'action': rng.choice(['opened', 'closed']),
+                       'pull_request': {'title': f"Improve <feature> {i}", 'html_url': f"https://github.com/{repo['name']}/pull/{i}"}}
+        elif kind == 'IssuesEvent':
+            payload = {'action': 'opened',
+                       'issue': {'title': f"Issue & question {i}", 'html_url': f"https://github.com/{repo['name']}/issues/{i}"}}
+        else:
+            payload = {'action': 'started'}
+        events.append({'type': kind, 'repo': repo, 'payload': payload,
+                       'created_at': created.strftime('%Y-%m-%dT%H:%M:%SZ')})
+    events.sort(key=lambda event: event['created_at'], reverse=True)
+    # 与 GitHub 一致：事件 id 随时间递增
+    for i, event in enumerate(events):
+        event['id'] = str(10 ** 10 - i)
+    return events
+
+
+def make_contributions(username, rng):
+    """构造一个用户的 contributionsCollection"""
+    return {'contributionsCollection': {
+        'pullRequestContributions': {'nodes': [
+            {'pullRequest': {'title': f"Improve <feature> {i}", 'url': f"https://github.com/{username}/repo/pull/{i}",
+                             'repository': {'nameWithOwner': f"{username}/repo{i % 4}"}}}
+            for i in range(rng.randint(0, 2))]},
+        'issueContributions': {'nodes': [
+            {'issue': {'title': f"Issue & question {i}", 'url': f"https://github.com/{username}/repo/issues/{i}",
+                       'repository': {'nameWithOwner': f"{username}/repo{i % 4}"}}}
+            for i in range(rng.randint(0, 1))]},
+        'commitContributionsByRepository': [
+            {'repository': {'nameWithOwner': f"{username}/repo{i}"},
+             'contributions': {'nodes': [{'commitCount': rng.randint(1, 5)}]}}
+            for i in range(rng.randint(0, 3))],
+    }}
+
+
+def make_github_transport(latency=0.0, seed=7):
+    """本地 GitHub API 桩（httpx.MockTransport）：REST 事件接口（支持 ETag）和 GraphQL 接口
+
+    transport.calls 记录各接口收到的请求数。
+    """
+    import httpx
+
+    rng = random.Random(seed)
+    payloads = {}
+    calls = {'rest': 0, 'graphql': 0}
+
+    async def handler(request):
+        if latency:
+            await asyncio.sleep(latency)
+        parts = request.url.path.strip('/').split('/')
+        if request.url.path == '/graphql' and request.method == 'POST':
+            calls['graphql'] += 1
+            variables = json.loads(request.content)['variables']
+            data = {key: make_contributions(value, rng) for key, value in variables.items()
+                    if key not in ('from', 'to')}
+            return httpx.Response(200, json={'data': data})
+        if len(parts) == 3 and parts[0] == 'users' and parts[2] == 'events':
+            calls['rest'] += 1
+            username = parts[1]
+            if username not in payloads:
+                payloads[username] = make_github_events(username, rng)
+            etag = f'"{username}-v1"'
+            if request.headers.get('If-None-Match') == etag:
+                return httpx.Response(304, headers={'ETag': etag})
+            return httpx.Response(200, json=payloads[username], headers={'ETag': etag})
+        return httpx.Response(404, json={'message': 'Not Found'})
+
+    transport = httpx.MockTransport(handler)
+    transport.calls = calls
+    return transport
+
+
+def percentiles(samples):
+    ordered = sorted(samples)
+
+    def rank(p):
+        return ordered[min(len(ordered) - 1, max(0, int(round(p / 100 * len(ordered))) - 1))]
+
+    return {
+        'p50': round(rank(50), 3),
+        'p95': round(rank(95), 3),
+        'p99': round(rank(99), 3),
+        'mean': round(sum(ordered) / len(ordered), 3),
+    }
+
+
+async def bench_report_latency(client, iterations):
+    """generate_report 端到端延迟（毫秒）以及各段平均耗时（微秒）"""
+    from advanced_report import DailyReportGenerator
+
+    latencies = []
+    sections = {'date_info': 0.0, 'github_activity': 0.0, 'poem': 0.0, 'render': 0.0}
+    for i in range(iterations):
+        username = f"user{i % 50}"
+        start = time.perf_counter()
+        generator = DailyReportGenerator(username=username, http_client=client, chat_id=str(i))
+        # 测的是完整生成流程，不走日报缓存
+        await generator.generate_report(1, use_cache=False)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+        # 分段计时（单独再跑一遍，避免影响端到端数据）
+        t0 = time.perf_counter()
+        date_info = generator.get_date_info()
+        t1 = time.perf_counter()
+        github_activity = await generator.get_github_activity(1)
+        t2 = time.perf_counter()
+        poem = generator.get_daily_poem()
+        t3 = time.perf_counter()
+        render_advanced_report(date_info, github_activity, poem, 1)
+        t4 = time.perf_counter()
+        sections['date_info'] += t1 - t0
+        sections['github_activity'] += t2 - t1
+        sections['poem'] += t3 - t2
+        sections['render'] += t4 - t3
+
+    section_us = {name: round(total / iterations * 1e6, 2) for name, total in sections.items()}
+    return percentiles(latencies), section_us
+
+
+async def bench_fanout(client, users, workers, send_latency):
+    """批量推送吞吐量（不受 Telegram 限速约束，测的是本身的处理能力）"""
+    from fanout import FanoutSender
+
+    bot = FakeBot(latency=send_latency)
+    sender = FanoutSender(bot, workers=workers, global_rate=1e9, group_rate=1e9, http_client=client)
+    recipients = [{'chat_id': str(100000 + i), 'github_username': f"user{i % 500}"} for i in range(users)]
+    stats = await sender.run(recipients)
+    return {
+        'users': users,
+        'sent': stats['sent'],
+        'failed': stats['failed'],
+        'elapsed_s': stats['elapsed'],
+        'throughput': stats['throughput'],
+    }
+
+
+async def run_suite(args):
+    from github_cache import GitHubResponseCache, get_default_cache, set_default_cache
+    from http_pool import create_client
+    from event_store import EventStore, set_event_store
+    from report_cache import ReportCache, get_report_cache, set_report_cache
+    from resilience import set_last_good
+
+    results = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'settings': {'iterations': args.iterations, 'users': args.users, 'workers': args.workers,
+                     'github_latency_ms': args.github_latency_ms, 'send_latency_ms': args.send_latency_ms},
+    }
+    with tempfile.TemporaryDirectory() as cache_dir:
+        set_default_cache(GitHubResponseCache(os.path.join(cache_dir, 'github')))
+        set_report_cache(ReportCache(os.path.join(cache_dir, 'reports')))
+        set_event_store(EventStore(os.path.join(cache_dir, 'events.sqlite3')))
+        set_last_good(ReportCache(os.path.join(cache_dir, 'last_good'), source='last_good'))
+        transport = make_github_transport(latency=args.github_latency_ms / 1000)
+        client = create_client(transport=transport)
+        try:
+            latency, sections = await bench_report_latency(client, args.iterations)
+            results['report_latency_ms'] = latency
+            results['sections_us'] = sections
+
+            results['fanout'] = {}
+            for users in args.users:
+                results['fanout'][str(users)] = await bench_fanout(
+                    client, users, args.workers, args.send_latency_ms / 1000)
+        finally:
+            await client.aclose()
+        results['github_cache'] = get_default_cache().stats()
+        results['report_cache'] = get_report_cache().stats()
+    return results
+
+
+def lookup_metrics(results, path):
+    """按 'a.b.c' 路径取值，'*' 匹配所有子键，返回 {完整路径: 值}"""
+    nodes = {'': results}
+    for key in path.split('.'):
+        expanded = {}
+        for prefix, node in nodes.items():
+            if not isinstance(node, dict):
+                continue
+            keys = node.keys() if key == '*' else [key]
+            for sub in keys:
+                if sub in node:
+                    expanded[f"{prefix}.{sub}" if prefix else sub] = node[sub]
+        nodes = expanded
+    return nodes
+
+
+def compare_with_baseline(results, baseline, tolerance):
+    """返回超过容差的退化项列表"""
+    regressions = []
+    for path, higher_is_better in BASELINE_METRICS:
+        current = lookup_metrics(results, path)
+        previous = lookup_metrics(baseline, path)
+        for name, value in current.items():
+            base = previous.get(name)
+            if not base:
+                continue
+            change = (value - base) / base
+            if (higher_is_better and change < -tolerance) or (not higher_is_better and change > tolerance):
+                regressions.append((name, base, value, change))
+    return regressions
+
+
+def bench_suite(args):
+    results = asyncio.run(run_suite(args))
+
+    print("📊 日报生成延迟 (ms): " + ", ".join(f"{k}={v}" for k, v in results['report_latency_ms'].items()))
+    print("🧩 各段平均耗时 (µs): " + ", ".join(f"{k}={v}" for k, v in results['sections_us'].items()))
+    for users, stats in results['fanout'].items():
+        print(f"📨 批量推送 {users:>6} 用户: {stats['throughput']} 条/秒 (耗时 {stats['elapsed_s']} 秒，失败 {stats['failed']})")
+
+    return save_and_check(results, args)
+
+
+def save_and_check(results, args):
+    """写入结果，按需保存基线或与基线比较，返回退出码"""
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"💾 结果已写入 {args.output}")
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"💾 基线已保存到 {args.save_baseline}")
+
+    if args.baseline:
+        if not os.path.exists(args.baseline):
+            print(f"⚠️ 基线文件不存在: {args.baseline}")
+            return 0
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare_with_baseline(results, baseline, args.tolerance)
+        if regressions:
+            print(f"❌ 性能退化超过 {args.tolerance:.0%}:")
+            for name, base, value, change in regressions:
+                print(f"   {name}: {base} -> {value} ({change:+.1%})")
+            return 1
+        print(f"✅ 与基线相比没有超过 {args.tolerance:.0%} 的退化")
+    return 0
+
+
+def parse_importtime(stderr):
+    """解析 -X importtime 输出，返回 [(模块, 累计微秒, 缩进层级)]"""
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        modules.append((name.strip(), int(cumulative), depth))
+    return modules
+
+
+def bench_startup(args):
+    """子进程测量冷启动耗时；另跑一次 -X importtime 统计导入明细"""
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, METRICS_FORMAT='none')
+    results = {'startup_ms': {}, 'import_ms': {}, 'slowest_imports_ms': {}, 'forbidden_imports': {}}
+
+    for name, (command, forbidden) in STARTUP_COMMANDS.items():
+        samples = []
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, *command], cwd=base_dir, env=env,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+            samples.append((time.perf_counter() - start) * 1000)
+        results['startup_ms'][name] = percentiles(samples)
+
+        proc = subprocess.run([sys.executable, '-X', 'importtime', *command], cwd=base_dir, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, check=True)
+        modules = parse_importtime(proc.stderr)
+        top_level = [(module, cumulative) for module, cumulative, depth in modules if depth == 0]
+        results['import_ms'][name] = round(sum(cumulative for _, cumulative in top_level) / 1000, 3)
+        results['slowest_imports_ms'][name] = {
+            module: round(cumulative / 1000, 3)
+            for module, cumulative in sorted(top_level, key=lambda item: -item[1])[:5]
+        }
+        loaded = {module for module, _, _ in modules}
+        results['forbidden_imports'][name] = sorted(module for module in forbidden if module in loaded)
+
+    for name, stats in results['startup_ms'].items():
+        slowest = ', '.join(f"{module}={ms}" for module, ms in results['slowest_imports_ms'][name].items())
+        print(f"🚀 {name:<16} p50={stats['p50']} ms, p95={stats['p95']} ms，导入 {results['import_ms'][name]} ms ({slowest})")
+
+    exit_code = save_and_check(results, args)
+    violations = {name: modules for name, modules in results['forbidden_imports'].items() if modules}
+    if violations:
+        print("❌ 快速路径加载了不该加载的模块:")
+        for name, modules in violations.items():
+            print(f"   {name}: {', '.join(modules)}")
+        return 1
+    return exit_code
+
+
+async def run_sources(args):
+    """同样的接收者分别走 REST 和 GraphQL，统计 API 请求数和批量推送耗时"""
+    from event_store import EventStore, set_event_store
+    from fanout import FanoutSender
+    from github_cache import GitHubResponseCache, set_default_cache
+    from github_graphql import GraphQLContributionSource, set_graphql_source
+    from http_pool import create_client
+    from report_cache import ReportCache, set_report_cache
+    from resilience import reset_breakers, set_last_good
+
+    recipients = [{'chat_id': str(100000 + i), 'github_username': f"user{i}"} for i in range(args.users)]
+    results = {'users': args.users, 'batch_size': args.batch_size}
+    for source in ('rest', 'graphql'):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            set_default_cache(GitHubResponseCache(os.path.join(cache_dir, 'github')))
+            set_report_cache(ReportCache(os.path.join(cache_dir, 'reports')))
+            set_event_store(EventStore(os.path.join(cache_dir, 'events.sqlite3')))
+            set_last_good(ReportCache(os.path.join(cache_dir, 'last_good'), source='last_good'))
+            reset_breakers()
+            set_graphql_source(GraphQLContributionSource('bench-token', batch_size=args.batch_size)
+                               if source == 'graphql' else None)
+            transport = make_github_transport(latency=args.github_latency_ms / 1000)
+            client = create_client(transport=transport)
+            try:
+                sender = FanoutSender(FakeBot(), workers=args.workers, global_rate=1e9, group_rate=1e9,
+                                      http_client=client)
+                stats = await sender.run(recipients)
+            finally:
+                await client.aclose()
+                set_graphql_source(None)
+        results[source] = {
+            'api_requests': transport.calls[source],
+            'elapsed_s': stats['elapsed'],
+            'throughput': stats['throughput'],
+            'failed': stats['failed'],
+        }
+    return results
+
+
+def bench_sources(args):
+    results = asyncio.run(run_sources(args))
+    for source in ('rest', 'graphql'):
+        stats = results[source]
+        print(f"🐙 {source:<8} API 请求 {stats['api_requests']:>6} 次，耗时 {stats['elapsed_s']} 秒，"
+              f"{stats['throughput']} 条/秒，失败 {stats['failed']}")
+    saved = results['rest']['api_requests'] / max(results['graphql']['api_requests'], 1)
+    print(f"📉 GraphQL 请求数为 REST 的 1/{saved:.0f}")
+    return save_and_check(results, args)
+
+
+def sharded_worker_setup(cache_dir):
+    """分片工作进程：缓存和事件库指向本次基准的临时目录"""
+    from event_store import EventStore, set_event_store
+    from github_cache import GitHubResponseCache, set_default_cache
+    from report_cache import ReportCache, set_report_cache
+    from resilience import set_last_good
+
+    set_default_cache(GitHubResponseCache(os.path.join(cache_dir, 'github')))
+    set_report_cache(ReportCache(os.path.join(cache_dir, 'reports')))
+    set_event_store(EventStore(os.path.join(cache_dir, 'events.sqlite3')))
+    set_last_good(ReportCache(os.path.join(cache_dir, 'last_good'), source='last_good'))
+
+
+def sharded_worker_client(latency):
+    """分片工作进程的 HTTP 客户端：连到本地 GitHub 桩"""
+    from http_pool import create_client
+    return create_client(transport=make_github_transport(latency=latency))
+
+
+async def run_sharded(args):
+    """同样的接收者分别用 1..N 个进程生成，主进程统一发送给 Bot 桩"""
+    from sharded_fanout import ShardedFanout
+
+    recipients = [{'chat_id': str(100000 + i), 'github_username': f"user{i % 500}"} for i in range(args.users)]
+    results = {'users': args.users, 'cpu_count': os.cpu_count(), 'sharded': {}}
+    for processes in args.processes:
+        # 每种进程数用新的缓存目录，后一轮不会命中前一轮的日报缓存
+        with tempfile.TemporaryDirectory() as cache_dir:
+            sender = ShardedFanout(FakeBot(), processes=processes, workers=args.workers, shard_size=args.shard_size,
+                                   global_rate=1e9, group_rate=1e9,
+                                   setup=functools.partial(sharded_worker_setup, cache_dir),
+                                   client_factory=functools.partial(sharded_worker_client,
+                                                                    args.github_latency_ms / 1000))
+            stats = await sender.run(recipients)
+        results['sharded'][str(processes)] = {
+            'shards': stats['shards'],
+            'elapsed_s': stats['elapsed'],
+            'throughput': stats['throughput'],
+            'failed': stats['failed'],
+        }
+    return results
+
+
+def bench_sharded(args):
+    results = asyncio.run(run_sharded(args))
+    single = None
+    for processes, stats in results['sharded'].items():
+        single = single or stats['throughput']
+        print(f"🧵 {processes:>3} 个进程: {stats['throughput']} 条/秒 (耗时 {stats['elapsed_s']} 秒，"
+              f"{stats['shards']} 个分片，失败 {stats['failed']})，加速 {stats['throughput'] / single:.2f}x")
+    print(f"   本机 CPU 核数: {results['cpu_count']}")
+    return save_and_check(results, args)
+
+
+def parse_users(value):
+    return [int(part) for part in value.split(',') if part]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="日报机器人性能基准")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    render_parser = subparsers.add_parser('render', help="模板渲染微基准")
+    render_parser.add_argument('--reports', type=int, default=10000, help="渲染的日报数量")
+    render_parser.set_defaults(func=bench_render)
+
+    suite_parser = subparsers.add_parser('suite', help="端到端基准（本地桩，不联网）")
+    suite_parser.add_argument('--iterations', type=int, default=200, help="测量 generate_report 延迟的次数")
+    suite_parser.add_argument('--users', type=parse_users, default=[1, 100, 10000], help="批量推送的用户数，逗号分隔")
+    suite_parser.add_argument('--workers', type=int, default=32, help="批量推送并发数")
+    suite_parser.add_argument('--github-latency-ms', type=float, default=0.0, help="GitHub 桩模拟的网络延迟")
+    suite_parser.add_argument('--send-latency-ms', type=float, default=0.0, help="Bot 桩模拟的发送延迟")
+    suite_parser.add_argument('--output', default=BENCH_OUTPUT, help="结果 JSON 文件")
+    suite_parser.add_argument('--baseline', help="与这个基线文件比较，退化超过容差时失败")
+    suite_parser.add_argument('--save-baseline', help="把本次结果保存为基线")
+    suite_parser.add_argument('--tolerance', type=float, default=0.25, help="允许的退化比例，默认 0.25")
+    suite_parser.set_defaults(func=bench_suite)
+
+    startup_parser = subparsers.add_parser('startup', help="启动时间基准（-X importtime）")
+    startup_parser.add_argument('--runs', type=int, default=10, help="每条命令运行的次数")
+    startup_parser.add_argument('--output', default=STARTUP_OUTPUT, help="结果 JSON 文件")
+    startup_parser.add_argument('--baseline', help="与这个基线文件比较，退化超过容差时失败")
+    startup_parser.add_argument('--save-baseline', help="把本次结果保存为基线")
+    startup_parser.add_argument('--tolerance', type=float, default=0.25, help="允许的退化比例，默认 0.25")
+    startup_parser.set_defaults(func=bench_startup)
+
+    sources_parser = subparsers.add_parser('sources', help="REST 与批量 GraphQL 数据源对比（本地桩）")
+    sources_parser.add_argument('--users', type=int, default=1000, help="接收者（GitHub 用户）数量")
+    sources_parser.add_argument('--batch-size', type=int, default=50, help="GraphQL 每个请求的用户数")
+    sources_parser.add_argument('--workers', type=int, default=32, help="批量推送并发数")
+    sources_parser.add_argument('--github-latency-ms', type=float, default=50.0, help="GitHub 桩模拟的网络延迟")
+    sources_parser.add_argument('--output', default=SOURCES_OUTPUT, help="结果 JSON 文件")
+    sources_parser.add_argument('--baseline', help="与这个基线文件比较，退化超过容差时失败")
+    sources_parser.add_argument('--save-baseline', help="把本次结果保存为基线")
+    sources_parser.add_argument('--tolerance', type=float, default=0.25, help="允许的退化比例，默认 0.25")
+    sources_parser.set_defaults(func=bench_sources)
+
+    cpu_count = os.cpu_count() or 1
+    sharded_parser = subparsers.add_parser('sharded', help="多进程分片生成的吞吐量（本地桩）")
+    sharded_parser.add_argument('--users', type=int, default=5000, help="接收者数量")
+    sharded_parser.add_argument('--processes', type=parse_users, default=sorted({1, 2, cpu_count}),
+                                help="依次测量的进程数，逗号分隔，默认 1,2,CPU 核数")
+    sharded_parser.add_argument('--shard-size', type=int, default=200, help="每个分片的接收者数")
+    sharded_parser.add_argument('--workers', type=int, default=32, help="发送并发数及每个进程内的生成并发数")
+    sharded_parser.add_argument('--github-latency-ms', type=float, default=0.0, help="GitHub 桩模拟的网络延迟")
+    sharded_parser.add_argument('--output', default=SHARDED_OUTPUT, help="结果 JSON 文件")
+    sharded_parser.add_argument('--baseline', help="与这个基线文件比较，退化超过容差时失败")
+    sharded_parser.add_argument('--save-baseline', help="把本次结果保存为基线")
+    sharded_parser.add_argument('--tolerance', type=float, default=0.25, help="允许的退化比例，默认 0.25")
+    sharded_parser.set_defaults(func=bench_sharded)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+"""
+创建 Telegram Bot 实例
+通过 TELEGRAM_API_BASE 可以把所有脚本指向本地的 Bot API 替身（见 fake_telegram.py），
+用于压测和集成测试，避免打到真实的 api.telegram.org 触发 Flood control。
+
+环境变量：
+    TELEGRAM_API_BASE    Bot API 地址，默认 https://api.telegram.org
+    TELEGRAM_POOL_SIZE   Bot 的 HTTP 连接数，默认 8（与批量推送的并发数一致）
+"""
+
+import os
+
+from telegram import Bot
+from telegram.request import HTTPXRequest
+
+TELEGRAM_API_BASE = os.getenv('TELEGRAM_API_BASE', 'https://api.telegram.org')
+TELEGRAM_POOL_SIZE = int(os.getenv('TELEGRAM_POOL_SIZE', '8'))
+
+
+def create_bot(token, base_url=None, connection_pool_size=TELEGRAM_POOL_SIZE):
+    """创建指向 base_url（默认 TELEGRAM_API_BASE）的 Bot"""
+    base = (base_url or TELEGRAM_API_BASE).rstrip('/')
+    # python-telegram-bot 默认只有 1 个连接，并发发送时会排队甚至 pool timeout
+    request = HTTPXRequest(connection_pool_size=connection_pool_size)
+    return Bot(
+        token=token,
+        base_url=f"{base}/bot",
+        base_file_url=f"{base}/file/bot",
+        request=request
+    )
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+常驻进程模式
+进程常驻，Bot、HTTP 连接池、节气表、诗词库索引保持预热；每个 chat 在自己时区的发送时间推送日报。
+
+调度用一个按下次触发时间排序的小顶堆：只需等待堆顶到期，时间复杂度 O(log N)。
+修改某个 chat 的计划时不去堆里查找旧条目，而是给该 chat 的版本号加 1，
+旧条目出堆时发现版本号不符直接丢弃（惰性删除）。
+
+接收者配置（与 fanout.py 相同，额外支持 send_time、timezone）：
+    {"chat_id": "-1002587693096", "github_username": "jackyrwj",
+     "send_time": "09:00", "timezone": "Asia/Shanghai"}
+
+运行中修改接收者文件会自动生效（每 DAEMON_RELOAD_INTERVAL 秒检查一次，或发送 SIGHUP 立即重新加载）。
+
+用法:
+    python daemon.py [recipients.json]
+    python daemon.py [recipients.json] --list     只列出接下来的发送计划
+"""
+
+import argparse
+import asyncio
+import heapq
+import itertools
+import os
+import signal
+import time
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+import metrics
+from advanced_report import BOT_TOKEN, CHAT_ID
+from bot_client import create_bot
+from fanout import FANOUT_WORKERS, FanoutSender, load_recipients
+from http_pool import close_shared_client
+
+# --- 配置 ---
+DAEMON_SEND_TIME = os.getenv('DAEMON_SEND_TIME', '09:00')
+DAEMON_TIMEZONE = os.getenv('DAEMON_TIMEZONE', 'Asia/Shanghai')
+DAEMON_RELOAD_INTERVAL = float(os.getenv('DAEMON_RELOAD_INTERVAL', '30'))
+
+
+def next_fire_time(send_time, timezone, after=None):
+    """send_time（当地时间 HH:MM 或 HH:MM:SS）在 after 之后的下一次触发时刻，返回 UTC 时间戳"""
+    tz = ZoneInfo(timezone)
+    hour, minute, second = (int(part) for part in (send_time.split(':') + ['0'])[:3])
+    local_now = datetime.fromtimestamp(time.time() if after is None else after, tz)
+    day = local_now.date()
+    while True:
+        # 按日期重新组合，夏令时切换当天也是当地的 send_time
+        candidate = datetime(day.year, day.month, day.day, hour, minute, second, tzinfo=tz)
+        if candidate > local_now:
+            return candidate.timestamp()
+        day += timedelta(days=1)
+
+
+def recipient_schedule(recipient):
+    return (recipient.get('send_time') or DAEMON_SEND_TIME, recipient.get('timezone') or DAEMON_TIMEZONE)
+
+
+class ReportScheduler:
+    """按 chat 当地时间触发日报的调度器"""
+
+    def __init__(self, sender, recipients_path=None):
+        self.sender = sender
+        self.recipients_path = recipients_path
+        # (触发时间戳, 序号, chat_id, 版本号)
+        self.heap = []
+        self.recipients = {}
+        self.versions = {}
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._in_flight = 0
+        self._slots = asyncio.Semaphore(sender.workers)
+        self._mtime = None
+        self._stopped = False
+
+    def schedule(self, recipient, after=None):
+        """加入或更新一个 chat 的计划"""
+        chat_id = str(recipient['chat_id'])
+        send_time, timezone = recipient_schedule(recipient)
+        fire_at = next_fire_time(send_time, timezone, after)
+        version = self.versions.get(chat_id, 0) + 1
+        self.versions[chat_id] = version
+        self.recipients[chat_id] = dict(recipient, timezone=timezone)
+        heapq.heappush(self.heap, (fire_at, next(self._seq), chat_id, version))
+        self._wakeup.set()
+        return fire_at
+
+    def unschedule(self, chat_id):
+        """取消一个 chat 的计划（堆里的旧条目之后出堆时丢弃）"""
+        chat_id = str(chat_id)
+        self.recipients.pop(chat_id, None)
+        self.versions[chat_id] = self.versions.get(chat_id, 0) + 1
+        self._wakeup.set()
+
+    def update(self, recipients):
+        """用新的接收者列表替换当前计划，只重排有变化的 chat"""
+        incoming = {str(recipient['chat_id']): recipient for recipient in recipients}
+        for chat_id in list(self.recipients):
+            if chat_id not in incoming:
+                self.unschedule(chat_id)
+        changed = 0
+        for chat_id, recipient in incoming.items():
+            current = self.recipients.get(chat_id)
+            if current is None or current != dict(recipient, timezone=recipient_schedule(recipient)[1]):
+                self.schedule(recipient)
+                changed += 1
+        return changed
+
+    def _peek(self):
+        """堆顶的有效条目（顺带丢弃已失效的条目）"""
+        while self.heap:
+            _, _, chat_id, version = self.heap[0]
+            if self.versions.get(chat_id) == version and chat_id in self.recipients:
+                return self.heap[0]
+            heapq.heappop(self.heap)
+        return None
+
+    def upcoming(self, limit=10):
+        """接下来的发送计划 [(时间戳, chat_id)]"""
+        valid = [(fire_at, chat_id) for fire_at, _, chat_id, version in self.heap
+                 if self.versions.get(chat_id) == version and chat_id in self.recipients]
+        return heapq.nsmallest(limit, valid)
+
+    def reload(self):
+        """重新读取接收者文件，返回变化的 chat 数量"""
+        recipients = load_recipients(self.recipients_path) or [{'chat_id': CHAT_ID}]
+        changed = self.update(recipients)
+        if changed:
+            print(f"🔄 已加载 {len(self.recipients)} 个接收者，{changed} 个计划有变化")
+        return changed
+
+    def _config_mtime(self):
+        path = self.recipients_path or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config.json')
+        try:
+            return os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    async def watch(self, interval=DAEMON_RELOAD_INTERVAL):
+        """定期检查接收者文件是否修改"""
+        self._mtime = self._config_mtime()
+        while not self._stopped:
+            await asyncio.sleep(interval)
+            mtime = self._config_mtime()
+            if mtime != self._mtime:
+                self._mtime = mtime
+                try:
+                    self.reload()
+                except (OSError, ValueError) as e:
+                    print(f"⚠️ 重新加载接收者失败，继续使用旧计划: {e}")
+
+    async def fire(self, recipient):
+        """发送一个 chat 的日报；一批发送结束后导出一次指标
+
+        每批开始时清空指标，导出的每一行是这一批的数据，而不是进程启动以来的累计。
+        """
+        if self._in_flight == 0:
+            metrics.metrics.reset()
+        self._in_flight += 1
+        try:
+            async with self._slots:
+                await self.sender.deliver(recipient)
+            self.sender.stats['sent'] += 1
+            print(f"✅ 已发送 {recipient['chat_id']} ({recipient['timezone']})")
+        except Exception as e:
+            self.sender.stats['failed'] += 1
+            print(f"❌ 发送到 {recipient['chat_id']} 失败: {e}")
+        finally:
+            self._in_flight -= 1
+            if self._in_flight == 0:
+                metrics.export_run()
+
+    async def run(self):
+        """主循环：等待堆顶到期，触发后按下一天重新入堆"""
+        tasks = set()
+        while not self._stopped:
+            self._wakeup.clear()
+            entry = self._peek()
+            delay = entry[0] - time.time() if entry else None
+            if delay is None or delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            fire_at, _, chat_id, _ = heapq.heappop(self.heap)
+            recipient = self.recipients[chat_id]
+            # 从本次触发时间之后计算下一次，避免同一分钟内重复触发
+            self.schedule(recipient, after=fire_at)
+            task = asyncio.create_task(self.fire(recipient))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stop(self):
+        self._stopped = True
+        self._wakeup.set()
+
+
+async def run_daemon(recipients_path=None, workers=FANOUT_WORKERS):
+    bot = create_bot(BOT_TOKEN, connection_pool_size=workers)
+    sender = FanoutSender(bot, workers=workers)
+    scheduler = ReportScheduler(sender, recipients_path)
+    scheduler.reload()
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, scheduler.stop)
+    if hasattr(signal, 'SIGHUP'):
+        loop.add_signal_handler(signal.SIGHUP, scheduler.reload)
+
+    print(f"🕘 常驻进程已启动，{len(scheduler.recipients)} 个接收者")
+    for fire_at, chat_id in scheduler.upcoming(5):
+        print(f"   {chat_id}: {datetime.fromtimestamp(fire_at).astimezone().isoformat(timespec='minutes')}")
+
+    watcher = asyncio.create_task(scheduler.watch())
+    try:
+        async with bot:
+            await scheduler.run()
+    finally:
+        watcher.cancel()
+        await sender.delivery.close()
+        await close_shared_client()
+        metrics.export_run()
+        print(f"👋 常驻进程退出：成功 {sender.stats['sent']}，失败 {sender.stats['failed']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='日报常驻进程')
+    parser.add_argument('recipients', nargs='?', help='接收者 JSON 文件，默认使用 config.json 中的 recipients')
+    parser.add_argument('--workers', type=int, default=FANOUT_WORKERS, help='同时生成/发送的日报数')
+    parser.add_argument('--list', action='store_true', help='只列出接下来的发送计划')
+    args = parser.parse_args()
+
+    if args.list:
+        recipients = load_recipients(args.recipients) or [{'chat_id': CHAT_ID}]
+        plans = sorted(((next_fire_time(*recipient_schedule(r)), r) for r in recipients), key=lambda plan: plan[0])
+        for fire_at, recipient in plans:
+            send_time, timezone = recipient_schedule(recipient)
+            local = datetime.fromtimestamp(fire_at, ZoneInfo(timezone))
+            print(f"{recipient['chat_id']}: {local.isoformat(timespec='minutes')} ({timezone} {send_time})")
+        return
+
+    asyncio.run(run_daemon(args.recipients, args.workers))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,23 +1,36 @@
 import asyncio
 import os
-import requests
-import random
 from datetime import datetime, timedelta
-from telegram import Bot
-from telegram.constants import ParseMode
 import json
 
+import metrics
+from bot_client import create_bot
+from delivery import DeliveryQueue
+from http_pool import close_shared_client, get_shared_client
+from poem_corpus import pick_poem
+from report_template import render_daily_report
+from run_log import get_run_log, load_goals
+
 # --- 配置 ---
 BOT_TOKEN = os.getenv('BOT_TOKEN', "8226079704:AAHuBWHZphave2xwU_A6ELI3M3IsZOfwZQ4")
 CHAT_ID = os.getenv('CHAT_ID', "-1002587693096")
 GITHUB_TOKEN = os.getenv('GITHUB_TOKEN', '')  # 可选：用于访问 GitHub API
 GH_USERNAME = os.getenv('GH_USERNAME', '')  # 你的 GitHub 用户名
 
+def load_config_running():
+    """config.json 中的 running 段"""
+    try:
+        with open('config.json', 'r', encoding='utf-8') as f:
+            return json.load(f).get('running', {})
+    except (FileNotFoundError, ValueError):
+        return {}
+
 class DailyReportGenerator:
     def __init__(self):
         self.current_time = datetime.now()
         self.start_of_year = datetime(self.current_time.year, 1, 1)
         
+    @metrics.timed('date_info')
     def get_time_stats(self):
         """获取时间统计信息"""
         # 计算今天是今年的第几天
@@ -39,6 +52,7 @@ class DailyReportGenerator:
             'progress_bar': progress_bar
         }
     
+    @metrics.timed('github_activity')
     async def get_github_activity(self):
         """获取 GitHub 活动信息"""
         if not GH_USERNAME:
@@ -51,9 +65,12 @@ class DailyReportGenerator:
             
             # 获取最近的事件
             events_url = f"https://api.github.com/users/{GH_USERNAME}/events"
-            response = requests.get(events_url, headers=headers, timeout=10)
+            response = await get_shared_client().get(events_url, headers=headers, timeout=10)
+            metrics.inc('requests', source='github')
+            metrics.inc('bytes', len(response.content), source='github')
             
             if response.status_code != 200:
+                metrics.inc('errors', source='github')
                 return {"prs": [], "issues": [], "commits": []}
             
             events = response.json()
@@ -91,32 +108,24 @@ class DailyReportGenerator:
             
         except Exception as e:
             print(f"获取 GitHub 活动失败: {e}")
+            metrics.inc('errors', source='github')
             return {"prs": [], "issues": [], "commits": []}
     
     def get_running_stats(self):
-        """获取跑步统计（示例数据，可以接入真实的运动 API）"""
-        # 这里使用示例数据，你可以接入 Strava、Nike Run Club 等 API
-        return {
-            'yesterday': False,  # 昨天是否跑步
-            'month_distance': round(random.uniform(40, 80), 1),  # 本月跑步距离
-            'year_distance': round(random.uniform(800, 1200), 2),  # 今年跑步距离
-        }
+        """获取跑步统计：从跑步日志的汇总里直接读取（python run_log.py add 记录跑步）"""
+        stats = get_run_log().stats(self.current_time.date(), load_goals())
+        if stats['last_run_date'] is None:
+            # 还没有跑步记录时沿用 config.json 里手填的累计距离
+            running = load_config_running()
+            stats['month_distance'] = running.get('month_distance', 0)
+            stats['year_distance'] = running.get('year_distance', 0)
+            stats['month_progress'] = round(stats['month_distance'] / stats['monthly_goal'] * 100, 1) if stats['monthly_goal'] else 0.0
+            stats['year_progress'] = round(stats['year_distance'] / stats['yearly_goal'] * 100, 1) if stats['yearly_goal'] else 0.0
+        return stats
     
     def get_daily_poem(self):
         """获取每日诗词"""
-        poems = [
-            {"content": "携壶酌流霞，搴菊泛寒荣。", "author": "李白", "title": "九日龙山饮"},
-            {"content": "山重水复疑无路，柳暗花明又一村。", "author": "陆游", "title": "游山西村"},
-            {"content": "海内存知己，天涯若比邻。", "author": "王勃", "title": "送杜少府之任蜀州"},
-            {"content": "落红不是无情物，化作春泥更护花。", "author": "龚自珍", "title": "己亥杂诗"},
-            {"content": "会当凌绝顶，一览众山小。", "author": "杜甫", "title": "望岳"},
-            {"content": "长风破浪会有时，直挂云帆济沧海。", "author": "李白", "title": "行路难"},
-            {"content": "问君能有几多愁，恰似一江春水向东流。", "author": "李煜", "title": "虞美人"},
-            {"content": "春花秋月何时了，往事知多少。", "author": "李煜", "title": "虞美人"},
-            {"content": "但愿人长久，千里共婵娟。", "author": "苏轼", "title": "水调歌头"},
-            {"content": "人生如梦，一尊还酹江月。", "author": "苏轼", "title": "念奴娇·赤壁怀古"},
-        ]
-        return random.choice(poems)
+        return pick_poem(CHAT_ID, self.current_time.date())
     
     async def generate_report(self):
         """生成完整的日报"""
@@ -125,53 +134,14 @@ class DailyReportGenerator:
         running_stats = self.get_running_stats()
         poem = self.get_daily_poem()
         
-        # 构建报告文本
-        report = f"<b>📅 今日日报</b>\n\n"
-        
-        # 时间信息
-        report += f"今天的起床时间是--{time_stats['wake_time']}。\n\n"
-        report += "起床啦。\n\n"
-        report += f"今天是今年的第 {time_stats['day_of_year']} 天。\n\n"
-        report += f"<code>{time_stats['progress_bar']}</code> {time_stats['progress_percent']}% ({time_stats['day_of_year']}/{time_stats['total_days']})\n\n"
-        
-        # GitHub 活动
-        report += "<b>📊 GitHub：</b>\n\n"
-        if github_activity['prs'] or github_activity['issues'] or github_activity['commits']:
-            for pr in github_activity['prs']:
-                action_text = "创建了" if pr['action'] == 'opened' else "更新了"
-                report += f"• {action_text} PR: {pr['title']} ({pr['repo']})\n"
-            
-            for issue in github_activity['issues']:
-                action_text = "创建了" if issue['action'] == 'opened' else "更新了"
-                report += f"• {action_text} Issue: {issue['title']} ({issue['repo']})\n"
-            
-            for commit in github_activity['commits'][:3]:  # 最多显示3个提交
-                report += f"• 提交了: {commit['message'][:50]}... ({commit['repo']})\n"
-        else:
-            report += "• 昨天没有 GitHub 活动\n"
-        
-        report += "\n"
-        
-        # 跑步统计
-        report += "<b>🏃 Run：</b>\n\n"
-        if not running_stats['yesterday']:
-            report += "• 昨天没跑\n"
-        else:
-            report += "• 昨天跑了步 ✅\n"
-        
-        report += f"• 本月跑了 {running_stats['month_distance']} 公里\n"
-        report += f"• 今年跑了 {running_stats['year_distance']} 公里\n\n"
-        
-        # 每日诗词
-        report += "<b>📜 今天的一句诗:</b>\n\n"
-        report += f"<i>{poem['content']}</i>\n"
-        report += f"—— {poem['author']}《{poem['title']}》"
-        
-        return report
+        with metrics.span('render'):
+            return render_daily_report(time_stats, github_activity, running_stats, poem)
 
 async def send_daily_report():
     """发送日报"""
-    bot = Bot(token=BOT_TOKEN)
+    bot = create_bot(BOT_TOKEN)
+    # 日报和错误通知走同一个队列：按顺序发送，429 时等待，超长日报自动拆分
+    delivery = DeliveryQueue(bot, workers=1)
     
     try:
         # 生成日报
@@ -179,11 +149,7 @@ async def send_daily_report():
         report = await generator.generate_report()
         
         # 发送消息
-        await bot.send_message(
-            chat_id=CHAT_ID,
-            text=report,
-            parse_mode=ParseMode.HTML
-        )
+        await delivery.send(CHAT_ID, report)
         
         print("✅ 日报发送成功！")
         
@@ -192,9 +158,13 @@ async def send_daily_report():
         # 发送错误通知
         try:
             error_msg = f"⚠️ 日报生成失败\n错误信息: {str(e)}"
-            await bot.send_message(chat_id=CHAT_ID, text=error_msg)
-        except:
+            await delivery.send(CHAT_ID, error_msg, parse_mode=None)
+        except Exception:
             pass
+    finally:
+        await delivery.close()
+        await close_shared_client()
+        metrics.export_run()
 
 if __name__ == '__main__':
     asyncio.run(send_daily_report())
@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""
+消息投递队列
+所有发往 Telegram 的消息都通过这个队列发送：
+- N 个 worker 从 asyncio 队列取任务并发发送，同一个 chat 的消息严格按提交顺序发出
+  （一个 chat 同一时间只有一个任务在发送，日报分段、之后的错误通知不会乱序）
+- 全局约 30 条/秒、同一个群组约 20 条/分钟的令牌桶限速
+- 遇到 429 (RetryAfter) 按服务器给出的时间暂停所有发送后重试，错误通知也走这里，不会再次触发限速
+- 超过 4096 字符的消息在行、单词边界处拆成多条，不会切断 HTML 标签或实体，
+  跨段的 <b>、<i>、<a> 等标签在段尾闭合、下一段开头重新打开
+
+用法:
+    async with DeliveryQueue(bot, workers=4) as delivery:
+        await delivery.send(chat_id, report)                     # 等待所有分段发送完成
+        delivery.submit(chat_id, "⚠️ 出错了", parse_mode=None)   # 不等待，返回 Future
+"""
+
+import asyncio
+import os
+import re
+import time
+from collections import deque
+
+from telegram.constants import ParseMode
+from telegram.error import RetryAfter
+
+import metrics
+
+# --- 配置 ---
+DELIVERY_WORKERS = int(os.getenv('DELIVERY_WORKERS', '4'))
+GLOBAL_RATE = 30      # 全局：每秒最多 30 条
+GROUP_RATE = 20       # 群组：每分钟最多 20 条
+MAX_RETRIES = 3       # 单条消息遇到 429 最多重试次数
+# Telegram 单条消息的长度上限（按 UTF-16 计）
+TELEGRAM_MESSAGE_LIMIT = 4096
+
+TAG_RE = re.compile(r'<(/?)([a-zA-Z-]+)[^>]*>')
+# HTML 标签、实体、空白、单词；拆分只发生在这些片段之间
+ATOM_RE = re.compile(r'<[^>]*>|&#?\w+;|\s+|[^\s<&]+|[<&]')
+
+
+class RateLimiter:
+    """令牌桶限速器：每 per 秒最多 rate 次"""
+
+    def __init__(self, rate, per=1.0):
+        self.rate = rate
+        self.per = per
+        self.tokens = float(rate)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """获取一个令牌，不够时等待"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate / self.per)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) * self.per / self.rate)
+
+
+def is_group_chat(chat_id):
+    """群组和频道的 chat_id 是负数"""
+    return str(chat_id).startswith('-')
+
+
+def message_length(text):
+    """Telegram 按 UTF-16 码元计算长度（emoji 算 2）"""
+    return len(text.encode('utf-16-le')) // 2
+
+
+def _update_tags(stack, piece):
+    """按 piece 中的标签更新打开的标签栈 [(标签名, 开始标签)]"""
+    for match in TAG_RE.finditer(piece):
+        closing, name = match.group(1), match.group(2).lower()
+        if not closing:
+            stack.append((name, match.group(0)))
+        elif stack and stack[-1][0] == name:
+            stack.pop()
+    return stack
+
+
+def _closers(stack):
+    return ''.join(f'</{name}>' for name, _ in reversed(stack))
+
+
+def _drop_long_tags(text, max_length):
+    """去掉超过 max_length 的开始标签及对应的结束标签，只保留其中的文字
+
+    例如 href 极长的 <a>：标签本身不能拆开，原样发出会让这一段超过长度上限，
+    下一段开头重新打开它也一样；去掉链接、保留链接文字，每段才能都在上限之内。
+    """
+    parts = []
+    position = 0
+    stack = []
+    for match in TAG_RE.finditer(text):
+        closing, name = match.group(1), match.group(2).lower()
+        if not closing:
+            drop = message_length(match.group(0)) > max_length
+            stack.append((name, drop))
+        elif stack and stack[-1][0] == name:
+            drop = stack.pop()[1]
+        else:
+            drop = False
+        if drop:
+            parts.append(text[position:match.start()])
+            position = match.end()
+    parts.append(text[position:])
+    return ''.join(parts)
+
+
+def _pieces(line, limit):
+    """单独一行都放不下时，拆成标签、实体、空白和单词；过长的单词再按字符拆"""
+    for atom in ATOM_RE.findall(line):
+        if message_length(atom) <= limit // 2 or atom.startswith('<'):
+            yield atom
+        else:
+            step = limit // 4
+            for start in range(0, len(atom), step):
+                yield atom[start:start + step]
+
+
+def split_message(text, limit=TELEGRAM_MESSAGE_LIMIT, html=True):
+    """把过长的消息拆成不超过 limit 的多段
+
+    优先在换行处拆分，一行放不下时在空白处拆分；html=True 时不会切断标签或实体，
+    并在段尾补上闭合标签、在下一段开头重新打开。
+    """
+    if message_length(text) <= limit:
+        return [text]
+    if html:
+        # 标签不可拆分，且会在每一段开头重新打开，必须远小于上限
+        text = _drop_long_tags(text, limit // 8)
+
+    chunks = []
+    stack = []
+    current = []
+    current_length = 0
+    has_content = False
+
+    def flush():
+        nonlocal current, current_length, has_content
+        body = ''.join(current)
+        if not html or TAG_RE.sub('', body).strip():
+            chunks.append(body + _closers(stack) if html else body)
+        # 下一段先重新打开还没闭合的标签
+        current = [tag for _, tag in stack] if html else []
+        current_length = message_length(''.join(current))
+        has_content = False
+
+    def add(piece):
+        nonlocal current_length, has_content
+        after = _update_tags(list(stack), piece) if html else stack
+        length = message_length(piece)
+        if has_content and current_length + length + message_length(_closers(after)) > limit:
+            flush()
+        current.append(piece)
+        current_length += length
+        has_content = True
+        stack[:] = after
+
+    for line in text.splitlines(keepends=True):
+        # 整行（加上重新打开的标签和闭合标签）一段都放不下，才在行内拆分
+        reserve = message_length(''.join(tag for _, tag in stack) + _closers(_update_tags(list(stack), line)))
+        if message_length(line) + reserve <= limit:
+            add(line)
+        else:
+            for piece in _pieces(line, limit):
+                add(piece)
+    flush()
+    return chunks
+
+
+class DeliveryJob:
+    """一条待发送的消息（可能拆成多段）"""
+
+    def __init__(self, chat_id, text, kwargs, future):
+        self.chat_id = chat_id
+        self.text = text
+        self.kwargs = kwargs
+        self.future = future
+
+
+class DeliveryQueue:
+    """按 chat 保序、带限速和 429 重试的并发投递队列"""
+
+    def __init__(self, bot, workers=DELIVERY_WORKERS, global_rate=GLOBAL_RATE, group_rate=GROUP_RATE,
+                 limit=TELEGRAM_MESSAGE_LIMIT):
+        self.bot = bot
+        self.workers = workers
+        self.group_rate = group_rate
+        self.limit = limit
+        self.global_limiter = RateLimiter(global_rate, 1.0)
+        self.group_limiters = {}
+        # 收到 429 后全局暂停到这个时间点
+        self.paused_until = 0.0
+        self.stats = {'sent': 0, 'failed': 0, 'retries': 0, 'parts': 0}
+        # 有任务的 chat 才会出现在队列里；每个 chat 的任务按提交顺序排在自己的 deque 中
+        self._queue = None
+        self._pending = {}
+        self._tasks = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    def get_group_limiter(self, chat_id):
+        key = str(chat_id)
+        if key not in self.group_limiters:
+            self.group_limiters[key] = RateLimiter(self.group_rate, 60.0)
+        return self.group_limiters[key]
+
+    async def wait_if_paused(self):
+        delay = self.paused_until - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def _start(self):
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    def submit(self, chat_id, text, parse_mode=ParseMode.HTML, disable_web_page_preview=True):
+        """提交一条消息，返回 Future（结果为各分段的 Message 列表）"""
+        self._start()
+        future = asyncio.get_running_loop().create_future()
+        kwargs = {'parse_mode': parse_mode, 'disable_web_page_preview': disable_web_page_preview}
+        key = str(chat_id)
+        jobs = self._pending.get(key)
+        if jobs is None:
+            # chat 当前空闲，放进队列等 worker 领取
+            self._pending[key] = deque([DeliveryJob(chat_id, text, kwargs, future)])
+            self._queue.put_nowait(key)
+        else:
+            jobs.append(DeliveryJob(chat_id, text, kwargs, future))
+        return future
+
+    async def send(self, chat_id, text, **kwargs):
+        """提交并等待发送完成，失败时抛出最后一次的异常"""
+        return await self.submit(chat_id, text, **kwargs)
+
+    async def _worker(self):
+        while True:
+            key = await self._queue.get()
+            jobs = self._pending[key]
+            job = jobs.popleft()
+            try:
+                messages = await self._deliver(job)
+            except Exception as e:
+                self.stats['failed'] += 1
+                if not job.future.done():
+                    job.future.set_exception(e)
+            else:
+                if not job.future.done():
+                    job.future.set_result(messages)
+            finally:
+                # 同一个 chat 还有任务就排到队尾（不占着 worker），否则标记为空闲
+                if jobs:
+                    self._queue.put_nowait(key)
+                else:
+                    del self._pending[key]
+                self._queue.task_done()
+
+    async def _deliver(self, job):
+        """按顺序发送一个任务的所有分段；某段失败时后面的分段不再发送"""
+        parts = split_message(job.text, self.limit, html=job.kwargs['parse_mode'] == ParseMode.HTML)
+        if len(parts) > 1:
+            self.stats['parts'] += len(parts)
+            metrics.inc('split_messages', source='telegram')
+        return [await self._send_part(job.chat_id, part, job.kwargs) for part in parts]
+
+    async def _send_part(self, chat_id, text, kwargs):
+        """按限速规则发送一段，429 时按服务器给出的时间等待后重试"""
+        for attempt in range(MAX_RETRIES + 1):
+            if is_group_chat(chat_id):
+                await self.get_group_limiter(chat_id).acquire()
+            await self.wait_if_paused()
+            await self.global_limiter.acquire()
+            try:
+                with metrics.span('send_message', source='telegram'):
+                    message = await self.bot.send_message(chat_id=chat_id, text=text, **kwargs)
+                metrics.inc('requests', source='telegram')
+                metrics.inc('bytes', len(text.encode('utf-8')), source='telegram')
+                self.stats['sent'] += 1
+                return message
+            except RetryAfter as e:
+                if attempt == MAX_RETRIES:
+                    raise
+                self.stats['retries'] += 1
+                metrics.inc('retries', source='telegram')
+                self.paused_until = max(self.paused_until, time.monotonic() + float(e.retry_after))
+                print(f"⏳ 触发限速，{e.retry_after} 秒后重试 (chat {chat_id})")
+
+    async def join(self):
+        """等待已提交的消息全部发送完"""
+        if self._queue is not None:
+            await self._queue.join()
+
+    async def close(self):
+        """发送完已提交的消息后停止 worker；之后再提交会重新启动"""
+        if self._queue is None:
+            return
+        await self._queue.join()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._queue = None
+        self._tasks = []
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+周报 / 月报
+汇总一周（ISO 周，周一到周日）或一个月的 GitHub 和跑步数据：
+- GitHub：各仓库的提交、PR、Issue 数，活跃天数，连续活跃天数
+- 跑步：本周 / 本月距离与目标、次数、用时，连续跑步天数
+
+数据都来自每天推送时增量更新的汇总，不扫描原始事件或跑步记录：
+GitHub 读事件库的每日汇总表（event_store.py），跑步读跑步日志的周/月汇总（run_log.py）。
+每个用户一次汇总查询，为几千个用户生成月报每人只需要毫秒级。
+
+与日报一样统计截至昨天的数据：周一早上推送上周（周一到周日）的周报，每月 1 日推送上个月的月报。
+
+用法:
+    python digest.py weekly [--date YYYY-MM-DD] [--dry-run]   周报（包含 --date 的那一周，默认昨天）
+    python digest.py monthly [--date YYYY-MM-DD] [--dry-run]  月报
+    python digest.py auto                                     昨天是周日就发周报，是月末就发月报
+    python digest.py monthly --recipients recipients.json     为接收者文件中的每个 chat 生成
+
+接收者文件中 "running": true 的 chat 才包含跑步部分（跑步日志只有一份）；不传接收者文件时发给 CHAT_ID 并包含跑步。
+"""
+
+import argparse
+import os
+import time
+from datetime import date, datetime, timedelta
+
+from advanced_report import BOT_TOKEN, CHAT_ID, DailyReportGenerator
+from event_store import get_event_store
+from report_template import render_digest
+from run_log import format_duration, get_run_log, load_goals
+
+DIGEST_KINDS = ('weekly', 'monthly')
+# 周报、月报里最多列出的仓库数
+DIGEST_REPOS = int(os.getenv('DIGEST_REPOS', '10'))
+
+
+def digest_period(kind, day):
+    """包含 day 的那一周 / 那个月：(开始日期, 结束日期)"""
+    if kind == 'weekly':
+        start = day - timedelta(days=day.weekday())
+        return start, start + timedelta(days=6)
+    start = day.replace(day=1)
+    following = date(start.year + start.month // 12, start.month % 12 + 1, 1)
+    return start, following - timedelta(days=1)
+
+
+def due_digests(day):
+    """day 是周日或月末时，返回当天结束的周期"""
+    kinds = []
+    if day.weekday() == 6:
+        kinds.append('weekly')
+    if (day + timedelta(days=1)).day == 1:
+        kinds.append('monthly')
+    return kinds
+
+
+def github_digest(store, username, start, end, limit=DIGEST_REPOS):
+    """从每日汇总表读取 [start, end] 的 GitHub 统计"""
+    repos, days = store.activity_between(username, start, end) if username else ({}, [])
+    items = sorted(({'repo': repo, 'commits': c, 'prs': p, 'issues': i} for repo, (c, p, i) in repos.items()),
+                   key=lambda item: (-(item['commits'] + item['prs'] + item['issues']), item['repo']))
+    return {
+        'commits': sum(item['commits'] for item in items),
+        'prs': sum(item['prs'] for item in items),
+        'issues': sum(item['issues'] for item in items),
+        'active_days': len(days),
+        'days': (end - start).days + 1,
+        'streak': store.active_streak(username, end) if username and days else 0,
+        'repos': items[:limit],
+    }
+
+
+def running_digest(run_log, kind, end, goals):
+    """从跑步日志的周 / 月汇总读取距离和目标进度"""
+    period, goal_key, period_text = ('week', 'weekly_goal', '这周') if kind == 'weekly' else ('month', 'monthly_goal', '这个月')
+    distance, duration, runs = run_log.total(period, end)
+    goal = goals[goal_key]
+    return {
+        'period_text': period_text,
+        'distance': round(distance, 2),
+        'goal': goal,
+        'progress': round(distance / goal * 100, 1) if goal else 0.0,
+        'runs': runs,
+        'duration': format_duration(duration),
+        'streak': run_log.streak(end),
+    }
+
+
+def build_digest(kind, day, username, store=None, run_log=None, goals=None, include_running=True):
+    """生成 day 所在周 / 月的周报或月报数据"""
+    if kind not in DIGEST_KINDS:
+        raise ValueError(kind)
+    start, end = digest_period(kind, day)
+    if kind == 'weekly':
+        iso_year, iso_week, _ = start.isocalendar()
+        title = f"{iso_year}年第{iso_week}周总结"
+    else:
+        title = f"{start.year}年{start.month}月总结"
+    digest = {
+        'kind': kind,
+        'title': title,
+        'start_text': f"{start.month}月{start.day}日",
+        'end_text': f"{end.month}月{end.day}日",
+        'github': github_digest(store or get_event_store(), username, start, end),
+    }
+    if include_running:
+        digest['running'] = running_digest(run_log or get_run_log(), kind, end, goals or load_goals())
+    return digest
+
+
+def build_digests(kind, day, recipients, store=None, run_log=None, goals=None):
+    """为每个接收者生成周报 / 月报，返回 [(chat_id, 文本)]；同一个用户只查询一次"""
+    store = store or get_event_store()
+    run_log = run_log or get_run_log()
+    goals = goals or load_goals()
+    default_username = DailyReportGenerator().get_github_username()
+    rendered = {}
+    results = []
+    for recipient in recipients:
+        username = recipient.get('github_username') or default_username
+        include_running = recipient.get('running', False)
+        key = (username, include_running)
+        if key not in rendered:
+            rendered[key] = render_digest(build_digest(kind, day, username, store, run_log, goals, include_running))
+        results.append((recipient['chat_id'], rendered[key]))
+    return results
+
+
+async def send_digests(messages):
+    from bot_client import create_bot
+    from delivery import DeliveryQueue
+
+    bot = create_bot(BOT_TOKEN)
+    async with bot:
+        async with DeliveryQueue(bot) as delivery:
+            futures = [delivery.submit(chat_id, text) for chat_id, text in messages]
+            for (chat_id, _), future in zip(messages, futures):
+                try:
+                    await future
+                except Exception as e:
+                    print(f"❌ 发送到 {chat_id} 失败: {e}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='周报 / 月报', epilog='示例: python digest.py weekly --dry-run')
+    parser.add_argument('kind', choices=DIGEST_KINDS + ('auto',), help='weekly=周报, monthly=月报, auto=按昨天的日期决定')
+    parser.add_argument('--date', type=date.fromisoformat, help='统计包含这一天的周 / 月，默认昨天')
+    parser.add_argument('--recipients', help='接收者 JSON 文件（与 fanout.py 相同），默认只发给 CHAT_ID')
+    parser.add_argument('--dry-run', action='store_true', help='只打印，不发送')
+    args = parser.parse_args(argv)
+
+    day = args.date or (datetime.now() - timedelta(days=1)).date()
+    kinds = due_digests(day) if args.kind == 'auto' else [args.kind]
+    if not kinds:
+        print(f"📭 {day.isoformat()} 不是周日或月末，不需要发送周报 / 月报")
+        return 0
+
+    if args.recipients:
+        from fanout import load_recipients
+        recipients = load_recipients(args.recipients)
+    else:
+        recipients = [{'chat_id': CHAT_ID, 'running': True}]
+
+    messages = []
+    for kind in kinds:
+        start = time.perf_counter()
+        messages += build_digests(kind, day, recipients)
+        elapsed = time.perf_counter() - start
+        print(f"📊 {kind} 生成 {len(recipients)} 份，每份 {elapsed / max(len(recipients), 1) * 1000:.2f} ms")
+
+    if args.dry_run:
+        for chat_id, text in messages:
+            print(f"--- {chat_id} ---")
+            print(text)
+        return 0
+
+    import asyncio
+    asyncio.run(send_digests(messages))
+    print(f"✅ 已发送 {len(messages)} 份周报 / 月报")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
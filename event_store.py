@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+GitHub 事件本地存储（SQLite）
+增量同步 /users/{user}/events：从第一页开始翻页，遇到已经存过的事件 id 就停止，按 id 去重。
+之后按日期查询直接走 (user, created_at) 索引，不再受第一页 30 条的限制，也不需要再请求 API。
+
+GitHub 事件 id 随时间递增，所以“已存的最大 id”就是上次同步到的位置。
+事件 API 最多只返回最近 300 条（90 天内），第一次同步时会翻完这 3 页。
+
+写入新事件时顺带更新按 (用户, 日期, 仓库) 的每日汇总（提交、PR、Issue 数），
+周报、月报（digest.py）直接读汇总，不再扫描原始事件。
+
+用法:
+    python event_store.py sync <user>                          同步一次
+    python event_store.py query <user> YYYY-MM-DD [YYYY-MM-DD]  查询日期范围内的事件（UTC 日期）
+"""
+
+import json
+import os
+import sqlite3
+import time
+from datetime import date, datetime, timedelta, timezone
+
+import metrics
+from github_cache import get_default_cache
+from resilience import UpstreamError
+
+EVENT_STORE_PATH = os.getenv('EVENT_STORE_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'events.sqlite3'))
+EVENTS_PER_PAGE = 100
+# GitHub 事件 API 最多 300 条
+MAX_PAGES = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id         INTEGER PRIMARY KEY,
+    user       TEXT NOT NULL,
+    type       TEXT NOT NULL,
+    repo       TEXT,
+    created_at TEXT NOT NULL,
+    event      TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_events_user_created ON events (user, created_at);
+CREATE TABLE IF NOT EXISTS daily_activity (
+    user    TEXT NOT NULL,
+    day     TEXT NOT NULL,
+    repo    TEXT NOT NULL,
+    commits INTEGER NOT NULL DEFAULT 0,
+    prs     INTEGER NOT NULL DEFAULT 0,
+    issues  INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user, day, repo)
+);
+CREATE TABLE IF NOT EXISTS sync_state (
+    user          TEXT PRIMARY KEY,
+    last_event_id INTEGER NOT NULL,
+    synced_at     REAL NOT NULL
+);
+"""
+
+
+def rollup_counts(events):
+    """事件 -> {(UTC 日期, 仓库): [提交数, 新建 PR 数, 新建 Issue 数]}"""
+    counts = {}
+    for event in events:
+        payload = event.get('payload') or {}
+        if event['type'] == 'PushEvent':
+            column, amount = 0, len(payload.get('commits') or [])
+        elif event['type'] == 'PullRequestEvent' and payload.get('action') == 'opened':
+            column, amount = 1, 1
+        elif event['type'] == 'IssuesEvent' and payload.get('action') == 'opened':
+            column, amount = 2, 1
+        else:
+            continue
+        if amount:
+            key = (event['created_at'][:10], (event.get('repo') or {}).get('name') or '')
+            counts.setdefault(key, [0, 0, 0])[column] += amount
+    return counts
+
+
+def activity_counts(activity):
+    """GraphQL 数据源整理好的一天活动 -> {仓库: [提交数, PR 数, Issue 数]}"""
+    counts = {}
+    for column, items in enumerate((activity.get('commits', []), activity.get('prs', []), activity.get('issues', []))):
+        for item in items:
+            counts.setdefault(item['repo'], [0, 0, 0])[column] += item.get('count', 1)
+    return counts
+
+
+def day_bounds(start_day, end_day=None):
+    """[start_day 00:00Z, end_day 次日 00:00Z) 对应的 created_at 字符串区间"""
+    end_day = end_day or start_day
+    return f"{start_day.isoformat()}T00:00:00Z", f"{(end_day + timedelta(days=1)).isoformat()}T00:00:00Z"
+
+
+def consecutive_days(days, day):
+    """days 按日期倒序；截至 day 的连续天数（day 当天不在其中时从前一天算起）"""
+    expected = day
+    streak = 0
+    for current in days:
+        if current == expected:
+            streak += 1
+        elif streak == 0 and current == expected - timedelta(days=1):
+            # 今天还没有活动，不打断昨天为止的连续记录
+            streak = 1
+            expected = current
+        else:
+            break
+        expected -= timedelta(days=1)
+    return streak
+
+
+class EventStore:
+    """按用户存储 GitHub 事件"""
+
+    def __init__(self, path=EVENT_STORE_PATH):
+        self.path = path
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.db = sqlite3.connect(path)
+        # WAL + NORMAL：提交时不 fsync，断电最多丢最后几次同步，下次同步会补回
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.executescript(SCHEMA)
+        # 汇总表是后加的：已有事件但还没有汇总时从事件重新计算一次
+        if (self.db.execute('SELECT 1 FROM events LIMIT 1').fetchone()
+                and not self.db.execute('SELECT 1 FROM daily_activity LIMIT 1').fetchone()):
+            self.rebuild_rollups()
+
+    def close(self):
+        self.db.close()
+
+    def last_event_id(self, user):
+        row = self.db.execute('SELECT last_event_id FROM sync_state WHERE user = ?', (user,)).fetchone()
+        return row[0] if row else 0
+
+    def synced_at(self, user):
+        """上次成功同步的时间戳，从未同步过返回 None"""
+        row = self.db.execute('SELECT synced_at FROM sync_state WHERE user = ?', (user,)).fetchone()
+        return row[0] if row else None
+
+    def add_events(self, user, events):
+        """写入一批事件（按 id 去重）并更新每日汇总，返回新增数量"""
+        if not events:
+            return 0
+        ids = [int(event['id']) for event in events]
+        placeholders = ','.join('?' * len(ids))
+        existing = {row[0] for row in self.db.execute(f'SELECT id FROM events WHERE id IN ({placeholders})', ids)}
+        # 已经入库的事件不能再计入汇总
+        fresh = {event_id: event for event_id, event in zip(ids, events) if event_id not in existing}
+        if not fresh:
+            return 0
+        rows = [(event_id, user, event['type'], event.get('repo', {}).get('name'),
+                 event['created_at'], json.dumps(event, ensure_ascii=False)) for event_id, event in fresh.items()]
+        with self.db:
+            self.db.executemany('INSERT OR IGNORE INTO events VALUES (?, ?, ?, ?, ?, ?)', rows)
+            self._add_rollups(user, rollup_counts(fresh.values()))
+        return len(rows)
+
+    def _add_rollups(self, user, counts):
+        self.db.executemany(
+            'INSERT INTO daily_activity VALUES (?, ?, ?, ?, ?, ?) '
+            'ON CONFLICT(user, day, repo) DO UPDATE SET commits = commits + excluded.commits, '
+            'prs = prs + excluded.prs, issues = issues + excluded.issues',
+            [(user, day, repo, *values) for (day, repo), values in counts.items()]
+        )
+
+    def rebuild_rollups(self):
+        """从全部事件重新计算每日汇总"""
+        with self.db:
+            self.db.execute('DELETE FROM daily_activity')
+            users = [row[0] for row in self.db.execute('SELECT DISTINCT user FROM events')]
+            for user in users:
+                events = [json.loads(row[0]) for row in self.db.execute('SELECT event FROM events WHERE user = ?', (user,))]
+                self._add_rollups(user, rollup_counts(events))
+
+    def set_day_activity(self, user, day, counts):
+        """用一整天的结果覆盖某天的汇总（GraphQL 数据源没有原始事件，直接给出每个仓库的数量）
+
+        counts: {仓库: [提交数, PR 数, Issue 数]}
+        """
+        with self.db:
+            self.db.execute('DELETE FROM daily_activity WHERE user = ? AND day = ?', (user, day.isoformat()))
+            self._add_rollups(user, {(day.isoformat(), repo): values for repo, values in counts.items()})
+
+    def activity_between(self, user, start_day, end_day):
+        """[start_day, end_day] 内的汇总：({仓库: [提交, PR, Issue]}, 有活动的日期列表)"""
+        rows = self.db.execute(
+            'SELECT day, repo, commits, prs, issues FROM daily_activity WHERE user = ? AND day >= ? AND day <= ?',
+            (user, start_day.isoformat(), end_day.isoformat())
+        ).fetchall()
+        repos = {}
+        days = set()
+        for day, repo, commits, prs, issues in rows:
+            total = repos.setdefault(repo, [0, 0, 0])
+            total[0] += commits
+            total[1] += prs
+            total[2] += issues
+            days.add(day)
+        return repos, sorted(days)
+
+    def active_streak(self, user, day):
+        """截至 day（含）连续有 GitHub 活动的天数；day 当天没有活动时从前一天算起"""
+        rows = self.db.execute(
+            'SELECT DISTINCT day FROM daily_activity WHERE user = ? AND day <= ? ORDER BY day DESC LIMIT 400',
+            (user, day.isoformat())
+        )
+        return consecutive_days([date.fromisoformat(row[0]) for row in rows], day)
+
+    def mark_synced(self, user, last_event_id):
+        with self.db:
+            self.db.execute(
+                'INSERT INTO sync_state VALUES (?, ?, ?) '
+                'ON CONFLICT(user) DO UPDATE SET last_event_id = MAX(last_event_id, excluded.last_event_id), '
+                'synced_at = excluded.synced_at',
+                (user, last_event_id, time.time())
+            )
+
+    async def sync(self, client, user, headers=None, token='', timeout=10):
+        """增量同步一个用户的事件，返回新增数量
+
+        翻页直到遇到已存过的事件 id、某页不满或到达 API 上限；
+        第一页走 ETag 条件请求，没有新事件时 GitHub 返回 304，不计入限额。
+        """
+        last_id = self.last_event_id(user)
+        newest_id = last_id
+        added = 0
+        for page in range(1, MAX_PAGES + 1):
+            url = f"https://api.github.com/users/{user}/events?per_page={EVENTS_PER_PAGE}&page={page}"
+            status_code, events = await get_default_cache().get_json(
+                client, url, headers=headers, token=token, timeout=timeout
+            )
+            if status_code != 200:
+                raise UpstreamError(f"GitHub API 返回状态码: {status_code}", status_code)
+            if not events:
+                break
+            ids = [int(event['id']) for event in events]
+            # 不大于 last_id 的事件上次已经入库，不必再序列化写入
+            fresh = [event for event, event_id in zip(events, ids) if event_id > last_id]
+            if fresh:
+                added += self.add_events(user, fresh)
+            newest_id = max(newest_id, max(ids))
+            if min(ids) <= last_id or len(events) < EVENTS_PER_PAGE:
+                break
+        self.mark_synced(user, newest_id)
+        metrics.inc('events_ingested', added, source='github')
+        return added
+
+    def events_between(self, user, start_day, end_day=None):
+        """[start_day, end_day] 内（UTC 日期）的全部事件，按时间倒序"""
+        start, end = day_bounds(start_day, end_day)
+        rows = self.db.execute(
+            'SELECT event FROM events WHERE user = ? AND created_at >= ? AND created_at < ? '
+            'ORDER BY created_at DESC, id DESC',
+            (user, start, end)
+        )
+        return [json.loads(row[0]) for row in rows]
+
+    def covers(self, user, day):
+        """上次同步是否晚于 day 结束，即 day 的事件已经完整入库"""
+        synced_at = self.synced_at(user)
+        if synced_at is None:
+            return False
+        day_end = datetime.combine(day + timedelta(days=1), datetime.min.time(), tzinfo=timezone.utc)
+        return synced_at >= day_end.timestamp()
+
+
+_default_store = None
+
+
+def get_event_store():
+    """进程内共享的事件存储"""
+    global _default_store
+    if _default_store is None:
+        _default_store = EventStore()
+    return _default_store
+
+
+def set_event_store(store):
+    """替换共享实例（测试、基准测试中指向临时数据库）"""
+    global _default_store
+    _default_store = store
+
+
+if __name__ == '__main__':
+    import asyncio
+    import sys
+
+    if len(sys.argv) >= 3 and sys.argv[1] == 'sync':
+        from http_pool import close_shared_client, get_shared_client
+
+        async def run_sync(user):
+            token = os.getenv('GITHUB_TOKEN', '')
+            headers = {'Authorization': f'token {token}'} if token else {}
+            try:
+                return await get_event_store().sync(get_shared_client(), user, headers=headers, token=token)
+            finally:
+                await close_shared_client()
+
+        print(f"✅ 新增 {asyncio.run(run_sync(sys.argv[2]))} 个事件")
+    elif len(sys.argv) >= 4 and sys.argv[1] == 'query':
+        start_day = date.fromisoformat(sys.argv[3])
+        end_day = date.fromisoformat(sys.argv[4]) if len(sys.argv) > 4 else start_day
+        for event in get_event_store().events_between(sys.argv[2], start_day, end_day):
+            print(f"{event['created_at']}  {event['type']:<20} {event.get('repo', {}).get('name', '')}")
+    else:
+        print("用法:")
+        print("  python event_store.py sync <user>")
+        print("  python event_store.py query <user> YYYY-MM-DD [YYYY-MM-DD]")
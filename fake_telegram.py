@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""
+本地 Telegram Bot API 替身
+实现项目用到的接口：getMe、sendMessage、getUpdates、editMessageText、sendPhoto，
+可以注入固定延迟、429 (retry_after) 和服务端错误，用于压测和集成测试。
+
+把 TELEGRAM_API_BASE 指向它即可，不需要改任何脚本：
+    python fake_telegram.py serve --port 8081 --latency-ms 50 --retry-after-rate 0.01
+    TELEGRAM_API_BASE=http://127.0.0.1:8081 python advanced_report.py
+
+压测批量推送（进程内启动替身，用真实的 Bot 和 FanoutSender 发送）：
+    python fake_telegram.py stress --messages 10000 --workers 32
+
+控制接口（独立运行时使用）：
+    GET  /_fake/stats     请求统计
+    POST /_fake/updates   注入一条消息，供 getUpdates 返回，JSON: {"chat_id": 1, "text": "/start"}
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import deque
+from email.parser import BytesParser
+from email.policy import default as email_policy
+from urllib.parse import parse_qsl
+
+BOT_USER = {'id': 10000001, 'is_bot': True, 'first_name': 'FakeBot', 'username': 'fake_daily_bot'}
+FAKE_TOKEN = '10000001:FAKE-TOKEN'
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 429: 'Too Many Requests',
+           500: 'Internal Server Error'}
+# 与真实 Bot API 一样拒绝超过 4096 字符的消息
+MESSAGE_LIMIT = 4096
+
+
+def chat_info(chat_id):
+    """按 chat_id 的形式推断 chat 类型（负数为群组，-100 开头为超级群组）"""
+    try:
+        chat_id = int(chat_id)
+    except (TypeError, ValueError):
+        # @channel 形式的用户名
+        return {'id': -1000000000000 - abs(hash(chat_id)) % 10 ** 9, 'type': 'channel', 'username': str(chat_id).lstrip('@')}
+    if chat_id > 0:
+        return {'id': chat_id, 'type': 'private', 'first_name': f'User{chat_id}'}
+    if str(chat_id).startswith('-100'):
+        return {'id': chat_id, 'type': 'supergroup', 'title': f'Group{chat_id}'}
+    return {'id': chat_id, 'type': 'group', 'title': f'Group{chat_id}'}
+
+
+def parse_params(headers, body):
+    """解析 python-telegram-bot 发来的表单（urlencoded 或 multipart）"""
+    content_type = headers.get('content-type', '')
+    if content_type.startswith('application/json'):
+        return json.loads(body or b'{}')
+    if content_type.startswith('multipart/form-data'):
+        message = BytesParser(policy=email_policy).parsebytes(
+            f'Content-Type: {content_type}\r\n\r\n'.encode('latin-1') + body
+        )
+        params = {}
+        for part in message.iter_parts():
+            name = part.get_param('name', header='content-disposition')
+            if part.get_filename():
+                params[name] = {'filename': part.get_filename(), 'size': len(part.get_payload(decode=True) or b'')}
+            else:
+                params[name] = part.get_content()
+        return params
+    return dict(parse_qsl(body.decode('utf-8'), keep_blank_values=True))
+
+
+class FakeTelegramServer:
+    """基于 asyncio 的最小 HTTP/1.1 服务，支持 keep-alive"""
+
+    def __init__(self, host='127.0.0.1', port=0, latency_ms=0.0, retry_after_rate=0.0,
+                 retry_after=1, error_rate=0.0, seed=None):
+        self.host = host
+        self.port = port
+        self.latency = latency_ms / 1000
+        self.retry_after_rate = retry_after_rate
+        self.retry_after = retry_after
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.stats = {'requests': 0, 'ok': 0, 'rate_limited': 0, 'errors': 0, 'methods': {}}
+        # 只保留最近的消息，压测时不占用过多内存
+        self.messages = deque(maxlen=1000)
+        self.updates = []
+        # 有新消息时唤醒长轮询中的 getUpdates
+        self._new_update = asyncio.Event()
+        self._forced = deque()
+        self._message_id = 0
+        self._server = None
+
+    @property
+    def base_url(self):
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    # --- 测试辅助 ---
+
+    def push_update(self, chat_id, text, username='tester', first_name='Tester'):
+        """注入一条用户消息，之后由 getUpdates 返回"""
+        self._message_id += 1
+        user = {'id': abs(int(chat_id)), 'is_bot': False, 'first_name': first_name, 'username': username}
+        self.updates.append({
+            'update_id': len(self.updates) + 1,
+            'message': {'message_id': self._message_id, 'date': int(time.time()), 'chat': chat_info(chat_id),
+                        'from': user, 'text': text}
+        })
+        self._new_update.set()
+
+    def fail_next(self, count=1, error_code=429, retry_after=None):
+        """让接下来的 count 个 API 请求失败（429 或其他错误码）"""
+        for _ in range(count):
+            self._forced.append((error_code, retry_after if retry_after is not None else self.retry_after))
+
+    # --- HTTP ---
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, path, _ = request_line.decode('latin-1').split(' ', 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get('content-length', 0) or 0))
+
+                status, payload = await self.dispatch(method, path, headers, body)
+                data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+                writer.write(
+                    f"HTTP/1.1 {status} {REASONS.get(status, 'Error')}\r\n"
+                    f"Content-Type: application/json\r\n"
+                    f"Content-Length: {len(data)}\r\n\r\n".encode('latin-1') + data
+                )
+                await writer.drain()
+                if headers.get('connection', '').lower() == 'close':
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def dispatch(self, method, path, headers, body):
+        """处理一次请求，返回 (HTTP 状态码, JSON)"""
+        path = path.split('?', 1)[0]
+        if path == '/_fake/stats':
+            return 200, self.stats
+        if path == '/_fake/updates' and method == 'POST':
+            update = json.loads(body or b'{}')
+            self.push_update(update.get('chat_id', 1), update.get('text', '/start'))
+            return 200, {'ok': True}
+
+        parts = path.strip('/').split('/')
+        if len(parts) != 2 or not parts[0].startswith('bot'):
+            return 404, {'ok': False, 'error_code': 404, 'description': 'Not Found'}
+        api_method = parts[1].lower()
+
+        self.stats['requests'] += 1
+        self.stats['methods'][api_method] = self.stats['methods'].get(api_method, 0) + 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        failure = self._next_failure()
+        if failure:
+            return failure
+
+        handler = getattr(self, f'api_{api_method}', None)
+        if handler is None:
+            return 404, {'ok': False, 'error_code': 404, 'description': 'Not Found: method not found'}
+        params = parse_params(headers, body)
+        if api_method != 'getme' and api_method != 'getupdates' and 'chat_id' not in params:
+            self.stats['errors'] += 1
+            return 400, {'ok': False, 'error_code': 400, 'description': 'Bad Request: chat_id is empty'}
+        if api_method == 'getupdates':
+            await self._wait_for_updates(params)
+        if api_method == 'sendmessage' and len(params.get('text', '').encode('utf-16-le')) // 2 > MESSAGE_LIMIT:
+            self.stats['errors'] += 1
+            return 400, {'ok': False, 'error_code': 400, 'description': 'Bad Request: message is too long'}
+        self.stats['ok'] += 1
+        return 200, {'ok': True, 'result': handler(params)}
+
+    async def _wait_for_updates(self, params):
+        """长轮询：没有新消息时最多等待 timeout 秒"""
+        offset = int(params.get('offset') or 0)
+        deadline = time.monotonic() + float(params.get('timeout') or 0)
+        while not any(update['update_id'] >= offset for update in self.updates):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            self._new_update.clear()
+            try:
+                await asyncio.wait_for(self._new_update.wait(), remaining)
+            except asyncio.TimeoutError:
+                return
+
+    def _next_failure(self):
+        if self._forced:
+            error_code, retry_after = self._forced.popleft()
+        elif self.retry_after_rate and self.random.random() < self.retry_after_rate:
+            error_code, retry_after = 429, self.retry_after
+        elif self.error_rate and self.random.random() < self.error_rate:
+            error_code, retry_after = 500, None
+        else:
+            return None
+
+        if error_code == 429:
+            self.stats['rate_limited'] += 1
+            return 429, {'ok': False, 'error_code': 429,
+                         'description': f'Too Many Requests: retry after {retry_after}',
+                         'parameters': {'retry_after': retry_after}}
+        self.stats['errors'] += 1
+        return error_code, {'ok': False, 'error_code': error_code,
+                            'description': REASONS.get(error_code, 'Error')}
+
+    # --- Bot API ---
+
+    def _message(self, chat_id, **fields):
+        self._message_id += 1
+        message = {'message_id': self._message_id, 'date': int(time.time()),
+                   'chat': chat_info(chat_id), 'from': BOT_USER, **fields}
+        self.messages.append(message)
+        return message
+
+    def api_getme(self, params):
+        return BOT_USER
+
+    def api_sendmessage(self, params):
+        return self._message(params['chat_id'], text=params.get('text', ''))
+
+    def api_editmessagetext(self, params):
+        return {'message_id': int(params.get('message_id', 0)), 'date': int(time.time()),
+                'edit_date': int(time.time()), 'chat': chat_info(params['chat_id']),
+                'from': BOT_USER, 'text': params.get('text', '')}
+
+    def api_sendphoto(self, params):
+        photo = {'file_id': f'photo{self._message_id + 1}', 'file_unique_id': f'p{self._message_id + 1}',
+                 'width': 1280, 'height': 720}
+        return self._message(params['chat_id'], photo=[photo], caption=params.get('caption'))
+
+    def api_getupdates(self, params):
+        offset = int(params.get('offset') or 0)
+        return [update for update in self.updates if update['update_id'] >= offset]
+
+
+async def run_stress(args):
+    """进程内启动替身，用真实 Bot + FanoutSender 发送 N 条消息"""
+    from bot_client import create_bot
+    from fanout import FanoutSender
+
+    class StaticReportSender(FanoutSender):
+        """不生成日报，直接发送固定文本，只压测投递链路"""
+
+        async def deliver(self, recipient):
+            await self.send(recipient['chat_id'], args.text)
+
+    server = FakeTelegramServer(latency_ms=args.latency_ms, retry_after_rate=args.retry_after_rate,
+                                retry_after=args.retry_after, error_rate=args.error_rate, seed=args.seed)
+    async with server:
+        bot = create_bot(FAKE_TOKEN, base_url=server.base_url, connection_pool_size=args.workers)
+        sender = StaticReportSender(bot, workers=args.workers,
+                                    global_rate=args.global_rate or 1e9, group_rate=1e9)
+        recipients = [{'chat_id': str(index + 1)} for index in range(args.messages)]
+        async with bot:
+            stats = await sender.run(recipients)
+
+    print(f"✅ 压测完成: 成功 {stats['sent']}/{stats['total']}，失败 {stats['failed']}，重试 {stats['retries']} 次")
+    print(f"📈 耗时 {stats['elapsed']} 秒，吞吐量 {stats['throughput']} 条/秒")
+    print(f"🧪 替身统计: {json.dumps(server.stats, ensure_ascii=False)}")
+    return stats
+
+
+async def serve(args):
+    server = FakeTelegramServer(args.host, args.port, latency_ms=args.latency_ms,
+                                retry_after_rate=args.retry_after_rate, retry_after=args.retry_after,
+                                error_rate=args.error_rate, seed=args.seed)
+    await server.start()
+    print(f"🧪 Bot API 替身已启动: {server.base_url}")
+    print(f"   export TELEGRAM_API_BASE={server.base_url}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.close()
+
+
+def add_fault_arguments(parser):
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='每个请求的固定延迟')
+    parser.add_argument('--retry-after-rate', type=float, default=0.0, help='返回 429 的概率')
+    parser.add_argument('--retry-after', type=int, default=1, help='429 中的 retry_after 秒数')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='返回 500 的概率')
+    parser.add_argument('--seed', type=int, default=None, help='随机种子，便于复现')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='本地 Telegram Bot API 替身')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    serve_parser = subparsers.add_parser('serve', help='启动替身服务')
+    serve_parser.add_argument('--host', default='127.0.0.1')
+    serve_parser.add_argument('--port', type=int, default=8081)
+    add_fault_arguments(serve_parser)
+
+    stress_parser = subparsers.add_parser('stress', help='进程内压测批量推送')
+    stress_parser.add_argument('--messages', type=int, default=10000)
+    stress_parser.add_argument('--workers', type=int, default=32)
+    stress_parser.add_argument('--global-rate', type=float, default=0, help='全局限速（条/秒），0 表示不限速')
+    stress_parser.add_argument('--text', default='<b>📅 每日报告</b>\n压测消息')
+    add_fault_arguments(stress_parser)
+
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args) if args.command == 'serve' else run_stress(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+批量推送（多用户 fan-out）
+为每个接收者生成个性化日报，通过投递队列（delivery.py）并发发送：
+- 全局约 30 条/秒
+- 同一个群组约 20 条/分钟
+- 遇到 429 (RetryAfter) 按服务器给出的时间等待后重试，而不是整批失败
+- 超过 4096 字符的日报按 HTML 安全的边界拆成多条，按顺序发出
+- 每发完一个 chat 记入发送日志（send_journal.py）；中途退出后重新运行，已发过的 chat 会跳过
+
+接收者列表来自 config.json 的 "recipients" 字段，或者命令行传入的 JSON 文件：
+[
+  {"chat_id": "-1002587693096", "github_username": "jackyrwj", "github_days_back": 1}
+]
+"""
+
+import asyncio
+import json
+import os
+import sys
+import time
+
+import metrics
+from bot_client import create_bot
+from advanced_report import BOT_TOKEN, DailyReportGenerator
+from delivery import GLOBAL_RATE, GROUP_RATE, DeliveryQueue
+from github_cache import get_default_cache
+from github_graphql import get_graphql_source
+from http_pool import close_shared_client, get_pool_stats, get_shared_client
+from send_journal import get_send_journal, message_ids
+
+# --- 配置 ---
+FANOUT_WORKERS = int(os.getenv('FANOUT_WORKERS', '8'))
+
+
+def load_recipients(path=None):
+    """加载接收者列表"""
+    if path:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    config_path = os.path.join(os.path.dirname(__file__), 'config.json')
+    try:
+        with open(config_path, 'r', encoding='utf-8') as f:
+            return json.load(f).get('recipients', [])
+    except FileNotFoundError:
+        return []
+
+
+def make_generator(recipient, http_client=None):
+    """按接收者的用户名、chat 和时区创建日报生成器"""
+    return DailyReportGenerator(
+        username=recipient.get('github_username'),
+        http_client=http_client,
+        chat_id=recipient['chat_id'],
+        timezone=recipient.get('timezone')
+    )
+
+
+async def prefetch_github(recipients, http_client=None):
+    """GraphQL 数据源：按日期分组，批量预取所有接收者的 GitHub 活动，返回请求数"""
+    source = get_graphql_source()
+    if source is None:
+        return 0
+    users_by_day = {}
+    for recipient in recipients:
+        generator = make_generator(recipient, http_client)
+        day = generator.github_target_date(recipient.get('github_days_back', 1))
+        users_by_day.setdefault(day, set()).add(generator.get_github_username())
+    client = http_client or get_shared_client()
+    requests = 0
+    for day, users in users_by_day.items():
+        requests += await source.prefetch(client, users, day)
+    return requests
+
+
+class FanoutSender:
+    """带限速的批量日报发送器"""
+
+    def __init__(self, bot, workers=FANOUT_WORKERS, global_rate=GLOBAL_RATE, group_rate=GROUP_RATE,
+                 http_client=None, journal=None):
+        """
+        Args:
+            journal (SendJournal): 发送日志；传入时跳过已发送的 chat，并记录发送结果和死信
+        """
+        self.bot = bot
+        self.workers = workers
+        self.http_client = http_client
+        self.journal = journal
+        self.delivery = DeliveryQueue(bot, workers=workers, global_rate=global_rate, group_rate=group_rate)
+        self.stats = {'sent': 0, 'failed': 0, 'retries': 0, 'skipped': 0}
+
+    async def send(self, chat_id, text):
+        """通过投递队列发送：限速、429 重试、超长拆分都在队列里处理"""
+        return await self.delivery.send(chat_id, text)
+
+    def make_generator(self, recipient):
+        return make_generator(recipient, self.http_client)
+
+    async def prefetch_github(self, recipients):
+        return await prefetch_github(recipients, self.http_client)
+
+    def is_done(self, recipient):
+        """发送日志里这个 chat 今天的日报是否已经发过"""
+        report_date = self.make_generator(recipient).current_time.date()
+        return self.journal.is_done(recipient['chat_id'], report_date, recipient.get('github_days_back', 1))
+
+    async def deliver(self, recipient):
+        """为一个接收者生成并发送日报（所有接收者共用同一个 HTTP 连接池）"""
+        generator = self.make_generator(recipient)
+        days_back = recipient.get('github_days_back', 1)
+        report = None
+        try:
+            report = await generator.generate_report(days_back)
+            messages = await self.send(recipient['chat_id'], report)
+        except Exception as e:
+            if self.journal is not None:
+                # 记为死信；已经生成的正文一起保存，补发时不用重新生成
+                self.journal.record_failed(recipient['chat_id'], generator.current_time.date(), e, text=report,
+                                           days_back=days_back, recipient=recipient)
+            raise
+        if self.journal is not None:
+            self.journal.record_sent(recipient['chat_id'], generator.current_time.date(), message_ids(messages),
+                                     days_back)
+
+    async def worker(self, queue):
+        while True:
+            recipient = await queue.get()
+            try:
+                await self.deliver(recipient)
+                self.stats['sent'] += 1
+            except Exception as e:
+                self.stats['failed'] += 1
+                print(f"❌ 发送到 {recipient.get('chat_id')} 失败: {e}")
+            finally:
+                queue.task_done()
+
+    async def run(self, recipients):
+        """并发发送给所有接收者，返回统计信息"""
+        start = time.monotonic()
+        pending = recipients
+        if self.journal is not None:
+            # 从上次中断的地方继续：已发送的 chat 不再生成、不再发送
+            pending = [recipient for recipient in recipients if not self.is_done(recipient)]
+            self.stats['skipped'] = len(recipients) - len(pending)
+            if self.stats['skipped']:
+                print(f"⏭️ 发送日志中已有 {self.stats['skipped']} 个 chat 发送成功，跳过")
+        queue = asyncio.Queue()
+        for recipient in pending:
+            queue.put_nowait(recipient)
+
+        tasks = []
+        try:
+            await self.prefetch_github(pending)
+            tasks = [asyncio.create_task(self.worker(queue))
+                     for _ in range(min(self.workers, max(len(pending), 1)))]
+            await queue.join()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await self.delivery.close()
+            if self.journal is not None:
+                self.journal.close()
+        elapsed = time.monotonic() - start
+
+        self.stats['retries'] = self.delivery.stats['retries']
+        self.stats['total'] = len(recipients)
+        self.stats['elapsed'] = round(elapsed, 3)
+        self.stats['throughput'] = round(self.stats['sent'] / elapsed, 2) if elapsed > 0 else 0.0
+        return self.stats
+
+
+async def send_to_all(recipients, workers=FANOUT_WORKERS):
+    """批量发送日报"""
+    sender = FanoutSender(create_bot(BOT_TOKEN, connection_pool_size=workers), workers=workers,
+                          journal=get_send_journal())
+    try:
+        stats = await sender.run(recipients)
+    finally:
+        await close_shared_client()
+        metrics.export_run()
+    print(f"✅ 批量推送完成: 成功 {stats['sent']}/{stats['total']}，失败 {stats['failed']}，"
+          f"跳过 {stats['skipped']}，重试 {stats['retries']} 次")
+    if stats['failed']:
+        print("📮 失败的日报已记为死信，可用 python send_journal.py replay 补发")
+    print(f"📈 耗时 {stats['elapsed']} 秒，吞吐量 {stats['throughput']} 条/秒")
+    cache_stats = get_default_cache().stats()
+    print(f"🗄️ GitHub 缓存: 命中 {cache_stats['hits']}，未命中 {cache_stats['misses']}")
+    pool_stats = get_pool_stats()
+    print(f"🔌 HTTP 连接: 新建 {pool_stats['connections_opened']} 个，复用 {pool_stats['connections_reused']} 次")
+    return stats
+
+
+if __name__ == '__main__':
+    # python fanout.py [recipients.json]
+    recipients = load_recipients(sys.argv[1] if len(sys.argv) > 1 else None)
+    if not recipients:
+        print("❌ 没有找到接收者，请在 config.json 中配置 recipients 或传入 JSON 文件")
+        sys.exit(1)
+    asyncio.run(send_to_all(recipients))
@@ -8,12 +8,13 @@
 
 import asyncio
 import os
-from telegram import Bot
+
+from bot_client import create_bot
 
 BOT_TOKEN = os.getenv('BOT_TOKEN', "8226079704:AAHuBWHZphave2xwU_A6ELI3M3IsZOfwZQ4")
 
 async def get_updates():
-    bot = Bot(token=BOT_TOKEN)
+    bot = create_bot(BOT_TOKEN)
     
     try:
         print("正在获取最近的消息...")
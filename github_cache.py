@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+GitHub API 条件请求缓存（ETag / If-None-Match）
+把响应体连同 ETag、Last-Modified 保存到磁盘，下次请求时带上条件头。
+GitHub 返回 304 时直接复用缓存内容，且 304 不计入 API 限额。
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+
+import metrics
+
+CACHE_DIR = os.getenv('GITHUB_CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'github'))
+
+
+class GitHubResponseCache:
+    """以 URL + token 为键的磁盘响应缓存"""
+
+    def __init__(self, cache_dir=CACHE_DIR):
+        self.cache_dir = cache_dir
+        self.hits = 0
+        self.misses = 0
+
+    def cache_key(self, url, token=''):
+        # token 只参与哈希，不会明文写入磁盘
+        return hashlib.sha256(f"{url}\n{token}".encode('utf-8')).hexdigest()
+
+    def cache_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def load(self, key):
+        """读取缓存条目，不存在或损坏时返回 None"""
+        try:
+            with open(self.cache_path(key), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def save(self, key, url, etag, last_modified, body):
+        """原子地写入缓存条目"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        entry = {'url': url, 'etag': etag, 'last_modified': last_modified, 'body': body}
+        # 每次写入用唯一的临时文件：多个进程（sharded_fanout.py）同时写同一条目时不会互相覆盖
+        with tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=self.cache_dir, suffix='.tmp',
+                                         delete=False) as f:
+            json.dump(entry, f, ensure_ascii=False)
+        try:
+            os.replace(f.name, self.cache_path(key))
+        except OSError:
+            os.unlink(f.name)
+            raise
+
+    async def get_json(self, client, url, headers=None, token='', timeout=10):
+        """发送条件请求，返回 (状态码, JSON 数据)
+
+        304 时返回 (200, 缓存数据)，调用方无需区分是否命中缓存。
+        """
+        key = self.cache_key(url, token)
+        entry = self.load(key)
+        request_headers = dict(headers or {})
+        if entry:
+            if entry.get('etag'):
+                request_headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                request_headers['If-Modified-Since'] = entry['last_modified']
+
+        response = await client.get(url, headers=request_headers, timeout=timeout)
+        metrics.inc('requests', source='github')
+        metrics.inc('bytes', len(response.content), source='github')
+
+        if response.status_code == 304 and entry:
+            self.hits += 1
+            metrics.inc('cache_hits', source='github')
+            return 200, entry['body']
+
+        self.misses += 1
+        metrics.inc('cache_misses', source='github')
+        if response.status_code != 200:
+            return response.status_code, None
+
+        body = response.json()
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if etag or last_modified:
+            self.save(key, url, etag, last_modified, body)
+        return 200, body
+
+    def stats(self):
+        """命中统计"""
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 3) if total else 0.0
+        }
+
+
+_default_cache = None
+
+
+def get_default_cache():
+    """进程内共享的缓存实例（批量推送时统计累计）"""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = GitHubResponseCache()
+    return _default_cache
+
+
+def set_default_cache(cache):
+    """替换共享缓存实例（基准测试中指向临时目录）"""
+    global _default_cache
+    _default_cache = cache
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+GitHub GraphQL 数据源（批量）
+REST 方式每个用户至少一个请求；GraphQL 用别名把多个用户放进同一个查询：
+
+    query($from: DateTime!, $to: DateTime!, $u0: String!, $u1: String!) {
+      u0: user(login: $u0) { ...Contributions }
+      u1: user(login: $u1) { ...Contributions }
+    }
+
+一次请求取回 GRAPHQL_BATCH_SIZE 个用户某一天的 contributionsCollection，
+转换成与 REST 相同的 {"prs", "issues", "commits"} 结构。多用户部署时 API 请求数约为用户数 / 批大小。
+
+与 REST 的差异：contributionsCollection 只提供每个仓库的提交数量，不含提交信息，
+提交条目显示为“N 个 commit”；PR 只统计当天创建的。
+
+环境变量：
+    GITHUB_SOURCE        rest（默认）或 graphql；GraphQL 必须设置 GITHUB_TOKEN
+    GRAPHQL_BATCH_SIZE   每个请求包含的用户数，默认 50
+    GRAPHQL_RESULT_TTL   结果缓存的秒数，默认 300；获取失败的结果不缓存
+"""
+
+import os
+import time
+from datetime import datetime, timedelta
+
+import metrics
+from resilience import UpstreamError, call_with_retries
+
+GRAPHQL_URL = 'https://api.github.com/graphql'
+GITHUB_SOURCE = os.getenv('GITHUB_SOURCE', 'rest')
+GITHUB_TOKEN = os.getenv('GITHUB_TOKEN', '')
+GRAPHQL_BATCH_SIZE = int(os.getenv('GRAPHQL_BATCH_SIZE', '50'))
+# 结果缓存多久（秒）：够一次批量推送从预取用到生成，常驻进程里今天的数据也会定期刷新
+GRAPHQL_RESULT_TTL = float(os.getenv('GRAPHQL_RESULT_TTL', '300'))
+# 同时进行的批量请求数
+GRAPHQL_CONCURRENCY = 4
+
+CONTRIBUTIONS_FRAGMENT = """
+fragment Contributions on User {
+  contributionsCollection(from: $from, to: $to) {
+    pullRequestContributions(first: 20) {
+      nodes { pullRequest { title url repository { nameWithOwner } } }
+    }
+    issueContributions(first: 20) {
+      nodes { issue { title url repository { nameWithOwner } } }
+    }
+    commitContributionsByRepository(maxRepositories: 10) {
+      repository { nameWithOwner }
+      contributions(first: 1) { nodes { commitCount } }
+    }
+  }
+}
+"""
+
+
+def build_query(count):
+    """count 个用户的批量查询；用户名通过变量传入，不拼接进查询文本"""
+    params = ', '.join(f'$u{i}: String!' for i in range(count))
+    fields = '\n'.join(f'  u{i}: user(login: $u{i}) {{ ...Contributions }}' for i in range(count))
+    return f"query($from: DateTime!, $to: DateTime!, {params}) {{\n{fields}\n}}\n{CONTRIBUTIONS_FRAGMENT}"
+
+
+def to_activity(user_data, day):
+    """把一个用户的 contributionsCollection 转换成 REST 路径相同的结构"""
+    if user_data is None:
+        # 用户不存在或无权访问
+        return {"prs": [], "issues": [], "commits": [], "error": True}
+    collection = user_data['contributionsCollection']
+    activity = {"prs": [], "issues": [], "commits": [], "date": day.strftime('%Y-%m-%d')}
+    for node in collection['pullRequestContributions']['nodes']:
+        pr = node['pullRequest']
+        activity['prs'].append({'action': '创建了', 'title': pr['title'],
+                                'repo': pr['repository']['nameWithOwner'], 'url': pr['url']})
+    for node in collection['issueContributions']['nodes']:
+        issue = node['issue']
+        activity['issues'].append({'action': '创建了', 'title': issue['title'],
+                                   'repo': issue['repository']['nameWithOwner'], 'url': issue['url']})
+    for item in collection['commitContributionsByRepository']:
+        count = sum(node['commitCount'] for node in item['contributions']['nodes'])
+        if count:
+            activity['commits'].append({'message': f"{count} 个 commit",
+                                        'repo': item['repository']['nameWithOwner'], 'count': count})
+    return activity
+
+
+class GraphQLContributionSource:
+    """按 (用户, 日期) 缓存结果的批量数据源
+
+    只缓存成功的结果，且只保留 result_ttl 秒：常驻进程和交互模式里今天的活动会更新，
+    一次临时错误也不会让这一天一直取不到数据。
+    """
+
+    def __init__(self, token, batch_size=GRAPHQL_BATCH_SIZE, url=GRAPHQL_URL, result_ttl=GRAPHQL_RESULT_TTL):
+        self.token = token
+        self.batch_size = batch_size
+        self.url = url
+        self.result_ttl = result_ttl
+        self.requests = 0
+        # (用户, 日期) -> (获取时间, 活动)
+        self._results = {}
+
+    def _cached(self, user, day):
+        entry = self._results.get((user, day))
+        if entry is None:
+            return None
+        if time.monotonic() - entry[0] > self.result_ttl:
+            del self._results[(user, day)]
+            return None
+        return entry[1]
+
+    def _store(self, user, day, activity):
+        if not activity.get('error'):
+            self._results[(user, day)] = (time.monotonic(), activity)
+
+    def expire(self):
+        """丢掉过期的结果，进程常驻时内存不会随天数和用户数一直增长"""
+        now = time.monotonic()
+        for key in [key for key, (fetched_at, _) in self._results.items() if now - fetched_at > self.result_ttl]:
+            del self._results[key]
+
+    async def fetch_batch(self, client, users, day, timeout=10):
+        """一个请求取回一批用户某一天的活动，返回 {用户: 活动}"""
+        start = datetime(day.year, day.month, day.day)
+        variables = {'from': start.strftime('%Y-%m-%dT%H:%M:%SZ'),
+                     'to': (start + timedelta(days=1)).strftime('%Y-%m-%dT%H:%M:%SZ')}
+        for index, user in enumerate(users):
+            variables[f'u{index}'] = user
+
+        response = await client.post(
+            self.url,
+            json={'query': build_query(len(users)), 'variables': variables},
+            headers={'Authorization': f'bearer {self.token}'},
+            timeout=timeout
+        )
+        self.requests += 1
+        metrics.inc('requests', source='github_graphql')
+        metrics.inc('bytes', len(response.content), source='github_graphql')
+        if response.status_code != 200:
+            raise UpstreamError(f"GitHub GraphQL 返回状态码: {response.status_code}", response.status_code)
+        payload = response.json()
+        if payload.get('data') is None and payload.get('errors'):
+            # 整个查询失败（例如 GitHub 临时出错），按上游错误处理，交给重试和熔断
+            raise UpstreamError(f"GitHub GraphQL 返回错误: {payload['errors'][0].get('message', '')}")
+        data = payload.get('data') or {}
+        return {user: to_activity(data.get(f'u{index}'), day) for index, user in enumerate(users)}
+
+    async def prefetch(self, client, users, day, timeout=10):
+        """批量取回还没有结果的用户；每批带重试和熔断，失败只打印，之后按需单独请求（或用上次成功的结果）"""
+        # asyncio 导入较慢，advanced_report.py --help 等路径不需要它
+        import asyncio
+
+        self.expire()
+        missing = sorted({user for user in users if user and self._cached(user, day) is None})
+        batches = [missing[i:i + self.batch_size] for i in range(0, len(missing), self.batch_size)]
+        semaphore = asyncio.Semaphore(GRAPHQL_CONCURRENCY)
+
+        async def run(batch):
+            async with semaphore:
+                try:
+                    results = await call_with_retries(
+                        'github_graphql',
+                        lambda attempt_timeout: self.fetch_batch(client, batch, day, min(timeout, attempt_timeout))
+                    )
+                except Exception as e:
+                    print(f"⚠️ GraphQL 批量获取失败 ({len(batch)} 个用户): {e}")
+                    metrics.inc('errors', source='github_graphql')
+                    return
+                for user, activity in results.items():
+                    self._store(user, day, activity)
+
+        await asyncio.gather(*(run(batch) for batch in batches))
+        return len(batches)
+
+    async def get_activity(self, client, user, day, timeout=10):
+        """某个用户某一天的活动；没有预取（或已过期）时单独请求一次"""
+        activity = self._cached(user, day)
+        if activity is None:
+            activity = (await self.fetch_batch(client, [user], day, timeout))[user]
+            self._store(user, day, activity)
+        return activity
+
+
+_default_source = None
+_warned = False
+
+
+def get_graphql_source():
+    """GITHUB_SOURCE=graphql 且设置了 token 时返回共享实例，否则返回 None（使用 REST）"""
+    global _default_source, _warned
+    if _default_source is None and GITHUB_SOURCE == 'graphql':
+        if GITHUB_TOKEN:
+            _default_source = GraphQLContributionSource(GITHUB_TOKEN)
+        elif not _warned:
+            _warned = True
+            print("⚠️ GraphQL 需要 GITHUB_TOKEN，改用 REST")
+    return _default_source
+
+
+def set_graphql_source(source):
+    """替换共享实例（基准测试中指向桩）；传入 None 恢复按环境变量选择"""
+    global _default_source
+    _default_source = source
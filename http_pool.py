@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+共享 HTTP 连接池
+所有数据源（GitHub、批量推送中的每个用户……）共用同一个 httpx.AsyncClient：
+- keep-alive 复用 TCP+TLS 连接，避免每次请求重新握手
+- 总连接数和单个 host 的并发连接数都有上限
+- 超时可通过环境变量配置
+- 统计新建连接数和复用次数
+
+环境变量：
+    HTTP_TIMEOUT            单次请求总超时（秒），默认 10
+    HTTP_CONNECT_TIMEOUT    建立连接超时（秒），默认 5
+    HTTP_MAX_CONNECTIONS    连接池总连接数，默认 100
+    HTTP_MAX_PER_HOST       单个 host 的并发连接数，默认 10
+    HTTP_KEEPALIVE_EXPIRY   空闲连接保留时间（秒），默认 30
+"""
+
+import asyncio
+import os
+from urllib.parse import urlsplit
+
+import httpx
+
+HTTP_TIMEOUT = float(os.getenv('HTTP_TIMEOUT', '10'))
+HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', '5'))
+HTTP_MAX_CONNECTIONS = int(os.getenv('HTTP_MAX_CONNECTIONS', '100'))
+HTTP_MAX_PER_HOST = int(os.getenv('HTTP_MAX_PER_HOST', '10'))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv('HTTP_KEEPALIVE_EXPIRY', '30'))
+
+USER_AGENT = 'Daily-Report-Bot'
+
+
+class PoolStats:
+    """连接统计"""
+
+    def __init__(self):
+        self.requests = 0
+        self.connections_opened = 0
+        self.tls_handshakes = 0
+
+    def as_dict(self):
+        return {
+            'requests': self.requests,
+            'connections_opened': self.connections_opened,
+            'connections_reused': max(self.requests - self.connections_opened, 0),
+            'tls_handshakes': self.tls_handshakes
+        }
+
+
+class _ReleasingStream(httpx.AsyncByteStream):
+    """响应体读完（关闭）后才释放 host 并发名额"""
+
+    def __init__(self, stream, release):
+        self._stream = stream
+        self._release = release
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self):
+        try:
+            await self._stream.aclose()
+        finally:
+            self._release()
+
+
+class PooledTransport(httpx.AsyncBaseTransport):
+    """在 httpx 连接池外加一层：单 host 并发限制 + 连接统计"""
+
+    def __init__(self, limits, max_per_host=HTTP_MAX_PER_HOST, stats=None, transport=None):
+        self._transport = transport or httpx.AsyncHTTPTransport(limits=limits)
+        self._max_per_host = max_per_host
+        self._host_semaphores = {}
+        self.stats = stats or PoolStats()
+
+    def _semaphore(self, host):
+        if host not in self._host_semaphores:
+            self._host_semaphores[host] = asyncio.Semaphore(self._max_per_host)
+        return self._host_semaphores[host]
+
+    async def _trace(self, event_name, info):
+        # httpcore 的 trace 事件：只有新建连接时才会出现 connect_tcp / start_tls
+        if event_name == 'connection.connect_tcp.complete':
+            self.stats.connections_opened += 1
+        elif event_name == 'connection.start_tls.complete':
+            self.stats.tls_handshakes += 1
+
+    async def handle_async_request(self, request):
+        semaphore = self._semaphore(urlsplit(str(request.url)).netloc)
+        await semaphore.acquire()
+        released = False
+
+        def release():
+            nonlocal released
+            if not released:
+                released = True
+                semaphore.release()
+
+        outer_trace = request.extensions.get('trace')
+
+        async def trace(event_name, info):
+            await self._trace(event_name, info)
+            if outer_trace is not None:
+                await outer_trace(event_name, info)
+
+        request.extensions['trace'] = trace
+        try:
+            response = await self._transport.handle_async_request(request)
+        except BaseException:
+            release()
+            raise
+        # 只统计拿到响应的请求，连接失败的请求不算作复用
+        self.stats.requests += 1
+        if isinstance(response.stream, httpx.ByteStream):
+            # 响应体已在内存中（本地桩等），httpx 不会再关闭这个流，直接释放
+            release()
+        else:
+            response.stream = _ReleasingStream(response.stream, release)
+        return response
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+
+def create_client(transport=None, stats=None):
+    """创建带连接池的 AsyncClient（transport 可替换成本地桩，用于测试和基准）"""
+    limits = httpx.Limits(
+        max_connections=HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=HTTP_MAX_CONNECTIONS,
+        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY
+    )
+    timeout = httpx.Timeout(HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT)
+    return httpx.AsyncClient(
+        transport=PooledTransport(limits, stats=stats, transport=transport),
+        timeout=timeout,
+        headers={'User-Agent': USER_AGENT}
+    )
+
+
+# 进程内共享的客户端；httpx 客户端绑定事件循环，所以按循环区分
+_shared_client = None
+_shared_loop = None
+_stats = PoolStats()
+
+
+def get_shared_client():
+    """获取当前事件循环上的共享客户端"""
+    global _shared_client, _shared_loop
+    loop = asyncio.get_running_loop()
+    if _shared_client is None or _shared_client.is_closed or _shared_loop is not loop:
+        _shared_client = create_client(stats=_stats)
+        _shared_loop = loop
+    return _shared_client
+
+
+async def close_shared_client():
+    """关闭共享客户端（进程退出前调用）"""
+    global _shared_client, _shared_loop
+    if _shared_client is not None:
+        await _shared_client.aclose()
+    _shared_client = None
+    _shared_loop = None
+
+
+def get_pool_stats():
+    """连接统计：请求数、新建连接数、复用次数"""
+    return _stats.as_dict()
@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+交互模式（长轮询）
+Bot 不只定时推送，也能回答命令：
+
+    /report [today|yesterday|N]   日报，默认统计昨天的 GitHub 活动
+    /today                        今天的 GitHub 活动
+    /yesterday                    昨天的 GitHub 活动
+    /github N                     N 天前的 GitHub 活动
+    /help                         命令列表
+
+- 回复按 (chat, 天数) 缓存在内存里，BOT_RESPONSE_TTL 秒内重复的命令直接返回；
+  /today 不读日报缓存（report_cache.py），缓存过期后一定重新获取当天的活动
+- 同时到达的相同请求合并成一次生成（single-flight），群里多人同时发 /report 只请求一次 GitHub
+- GitHub 很慢时不让用户等：BOT_REPLY_DEADLINE 秒内没生成完，先用上次成功的数据回复，
+  完整结果在后台继续生成，出来后更新缓存，下一次命令拿到的就是新数据
+- 回复经过投递队列（delivery.py）发送：同一 chat 保序、429 重试、超长拆分
+
+接收者文件（与 fanout.py 相同）中的 github_username、timezone 会用于对应 chat 的命令。
+
+用法:
+    python interactive_bot.py [recipients.json] [--workers N]
+
+环境变量：
+    BOT_RESPONSE_TTL     回复缓存时间（秒），默认 300
+    BOT_REPLY_DEADLINE   等待完整结果的时间（秒），默认 0.8
+    BOT_POLL_TIMEOUT     长轮询等待时间（秒），默认 30
+"""
+
+import argparse
+import asyncio
+import os
+import signal
+import time
+
+from telegram.error import NetworkError, RetryAfter
+
+import metrics
+from advanced_report import BOT_TOKEN, DailyReportGenerator, parse_days_back
+from bot_client import create_bot
+from delivery import DELIVERY_WORKERS, DeliveryQueue
+from fanout import load_recipients
+from http_pool import close_shared_client
+from resilience import Deadline
+
+# --- 配置 ---
+BOT_RESPONSE_TTL = float(os.getenv('BOT_RESPONSE_TTL', '300'))
+BOT_REPLY_DEADLINE = float(os.getenv('BOT_REPLY_DEADLINE', '0.8'))
+BOT_POLL_TIMEOUT = int(os.getenv('BOT_POLL_TIMEOUT', '30'))
+# 用了旧数据的回复只缓存这么久，之后重新生成
+STALE_RESPONSE_TTL = 30
+# 事件 API 只保留 90 天内的事件
+MAX_DAYS_BACK = 90
+
+HELP_TEXT = (
+    "<b>📅 日报 Bot</b>\n\n"
+    "/report — 日报（昨天的 GitHub 活动）\n"
+    "/today — 今天的 GitHub 活动\n"
+    "/yesterday — 昨天的 GitHub 活动\n"
+    "/github N — N 天前的 GitHub 活动\n"
+)
+
+
+def parse_command(text):
+    """'/github 3' -> 3，'/today' -> 0；/start、/help 和参数错误返回 'help'，其他消息返回 None"""
+    if not text or not text.startswith('/'):
+        return None
+    parts = text.split()
+    # 群里的命令可能带 @bot 用户名
+    command = parts[0][1:].split('@', 1)[0].lower()
+    argument = parts[1].lower() if len(parts) > 1 else None
+    if command in ('start', 'help'):
+        return 'help'
+    if command in ('today', 'yesterday'):
+        return parse_days_back(command)
+    if command in ('report', 'github'):
+        try:
+            days_back = parse_days_back(argument)
+        except ValueError:
+            return 'help'
+        return days_back if days_back <= MAX_DAYS_BACK else 'help'
+    return None
+
+
+class ResponseCache:
+    """带 TTL 的回复缓存，并把同时到达的相同请求合并成一次生成"""
+
+    def __init__(self, ttl=BOT_RESPONSE_TTL, max_entries=10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # 键 -> (过期时间, 回复)
+        self.entries = {}
+        # 键 -> 正在生成的任务
+        self.inflight = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def get_fresh(self, key):
+        entry = self.entries.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            return entry[1]
+        return None
+
+    def set(self, key, text, ttl=None):
+        if len(self.entries) >= self.max_entries:
+            now = time.monotonic()
+            self.entries = {k: v for k, v in self.entries.items() if v[0] > now}
+            while len(self.entries) >= self.max_entries:
+                # dict 按插入顺序，先删最早写入的
+                del self.entries[next(iter(self.entries))]
+        self.entries.pop(key, None)
+        self.entries[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), text)
+
+    async def get(self, key, produce):
+        """命中缓存直接返回；否则等待正在进行的同一请求，或调用 produce() -> (回复, 缓存秒数)"""
+        text = self.get_fresh(key)
+        if text is not None:
+            self.hits += 1
+            metrics.inc('cache_hits', source='bot_reply')
+            return text
+        task = self.inflight.get(key)
+        if task is None:
+            self.misses += 1
+            metrics.inc('cache_misses', source='bot_reply')
+            task = self.inflight[key] = asyncio.create_task(self._fill(key, produce))
+        else:
+            self.coalesced += 1
+            metrics.inc('coalesced', source='bot_reply')
+        # 某个等待者被取消时不影响共享的任务
+        return await asyncio.shield(task)
+
+    async def _fill(self, key, produce):
+        try:
+            text, ttl = await produce()
+            self.set(key, text, ttl)
+            return text
+        finally:
+            self.inflight.pop(key, None)
+
+
+class InteractiveBot:
+    """长轮询收取命令，生成日报并回复"""
+
+    def __init__(self, bot, recipients=None, workers=DELIVERY_WORKERS, reply_deadline=BOT_REPLY_DEADLINE,
+                 poll_timeout=BOT_POLL_TIMEOUT, cache=None, http_client=None):
+        self.bot = bot
+        self.http_client = http_client
+        self.recipients = {str(recipient['chat_id']): recipient for recipient in recipients or []}
+        self.delivery = DeliveryQueue(bot, workers=workers)
+        self.reply_deadline = reply_deadline
+        self.poll_timeout = poll_timeout
+        self.cache = cache or ResponseCache()
+        self.stats = {'commands': 0, 'replied': 0, 'failed': 0, 'degraded': 0}
+        self._background = set()
+        self._stopped = False
+
+    def make_generator(self, chat_id):
+        recipient = self.recipients.get(str(chat_id), {})
+        return DailyReportGenerator(
+            username=recipient.get('github_username'),
+            http_client=self.http_client,
+            chat_id=str(chat_id),
+            timezone=recipient.get('timezone')
+        )
+
+    async def answer(self, chat_id, days_back):
+        """某个 chat 某个天数的日报回复（缓存 + single-flight）"""
+        key = (str(chat_id), days_back)
+
+        # 已经过去的日期不会再变，可以用日报缓存；今天的回复只由上面的 BOT_RESPONSE_TTL 控制
+        use_cache = days_back > 0
+
+        async def produce():
+            generator = self.make_generator(chat_id)
+            task = asyncio.create_task(generator.generate_report(days_back, use_cache=use_cache))
+            done, _ = await asyncio.wait({task}, timeout=self.reply_deadline)
+            if task in done:
+                return task.result(), STALE_RESPONSE_TTL if generator.degraded else None
+
+            # GitHub 慢：完整结果在后台继续生成，先用上次成功的数据回复
+            self.stats['degraded'] += 1
+            self._finish_in_background(key, task, generator)
+            fallback = self.make_generator(chat_id)
+            text = await fallback.generate_report(days_back, use_cache=use_cache, deadline=Deadline(0))
+            return text, STALE_RESPONSE_TTL
+
+        return await self.cache.get(key, produce)
+
+    def _finish_in_background(self, key, task, generator):
+        """后台生成完成后用完整结果更新缓存"""
+        self._background.add(task)
+
+        def done(task):
+            self._background.discard(task)
+            if task.cancelled() or task.exception() is not None:
+                return
+            if not generator.degraded:
+                self.cache.set(key, task.result())
+
+        task.add_done_callback(done)
+
+    async def handle(self, update):
+        """处理一条消息；不是命令的消息忽略"""
+        message = update.message
+        if message is None or not message.text:
+            return
+        request = parse_command(message.text)
+        if request is None:
+            return
+        self.stats['commands'] += 1
+        chat_id = message.chat.id
+        start = time.perf_counter()
+        try:
+            text = HELP_TEXT if request == 'help' else await self.answer(chat_id, request)
+            await self.delivery.send(chat_id, text)
+            self.stats['replied'] += 1
+        except Exception as e:
+            self.stats['failed'] += 1
+            print(f"❌ 回复 {chat_id} 失败: {e}")
+        finally:
+            metrics.observe('command_reply', time.perf_counter() - start)
+
+    async def poll(self):
+        """长轮询 getUpdates，每条消息单独起一个任务处理，慢请求不会挡住后面的命令"""
+        offset = None
+        tasks = set()
+        while not self._stopped:
+            try:
+                updates = await self.bot.get_updates(offset=offset, timeout=self.poll_timeout,
+                                                     allowed_updates=['message'])
+            except RetryAfter as e:
+                await asyncio.sleep(float(e.retry_after))
+                continue
+            except NetworkError as e:
+                print(f"⚠️ 获取消息失败，稍后重试: {e}")
+                await asyncio.sleep(1)
+                continue
+            for update in updates:
+                offset = update.update_id + 1
+                task = asyncio.create_task(self.handle(update))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stop(self):
+        self._stopped = True
+
+    async def close(self):
+        """等待后台生成和待发送的回复完成"""
+        if self._background:
+            await asyncio.gather(*self._background, return_exceptions=True)
+        await self.delivery.close()
+
+
+async def run_bot(recipients_path=None, workers=DELIVERY_WORKERS):
+    bot = create_bot(BOT_TOKEN, connection_pool_size=workers + 1)
+    interactive = InteractiveBot(bot, load_recipients(recipients_path), workers=workers)
+
+    loop = asyncio.get_running_loop()
+    poller = None
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, lambda: (interactive.stop(), poller and poller.cancel()))
+
+    print("🤖 交互模式已启动，发送 /help 查看命令")
+    try:
+        async with bot:
+            poller = asyncio.create_task(interactive.poll())
+            try:
+                await poller
+            except asyncio.CancelledError:
+                pass
+            await interactive.close()
+    finally:
+        await close_shared_client()
+        metrics.export_run()
+        cache = interactive.cache
+        print(f"👋 交互模式退出：命令 {interactive.stats['commands']} 条，"
+              f"缓存命中 {cache.hits}，合并 {cache.coalesced}，降级 {interactive.stats['degraded']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='日报 Bot 交互模式（长轮询）')
+    parser.add_argument('recipients', nargs='?', help='接收者 JSON 文件，默认使用 config.json 中的 recipients')
+    parser.add_argument('--workers', type=int, default=DELIVERY_WORKERS, help='同时发送回复的数量')
+    args = parser.parse_args()
+    asyncio.run(run_bot(args.recipients, args.workers))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+离线农历计算
+使用 1900-2100 年的压缩月长表，把公历日期换算为农历，无需联网。
+
+每一年用一个整数表示：
+- 低 4 位：闰哪个月（0 表示无闰月）
+- 第 5-16 位：正月到腊月是否为大月（30 天），从高位到低位
+- 第 17 位：闰月是否为大月
+"""
+
+import bisect
+from datetime import date
+
+# 1900-2100 年农历数据
+LUNAR_INFO = [
+    0x04bd8, 0x04ae0, 0x0a570, 0x054d5, 0x0d260, 0x0d950, 0x16554, 0x056a0, 0x09ad0, 0x055d2,
+    0x04ae0, 0x0a5b6, 0x0a4d0, 0x0d250, 0x1d255, 0x0b540, 0x0d6a0, 0x0ada2, 0x095b0, 0x14977,
+    0x04970, 0x0a4b0, 0x0b4b5, 0x06a50, 0x06d40, 0x1ab54, 0x02b60, 0x09570, 0x052f2, 0x04970,
+    0x06566, 0x0d4a0, 0x0ea50, 0x16a95, 0x05ad0, 0x02b60, 0x186e3, 0x092e0, 0x1c8d7, 0x0c950,
+    0x0d4a0, 0x1d8a6, 0x0b550, 0x056a0, 0x1a5b4, 0x025d0, 0x092d0, 0x0d2b2, 0x0a950, 0x0b557,
+    0x06ca0, 0x0b550, 0x15355, 0x04da0, 0x0a5b0, 0x14573, 0x052b0, 0x0a9a8, 0x0e950, 0x06aa0,
+    0x0aea6, 0x0ab50, 0x04b60, 0x0aae4, 0x0a570, 0x05260, 0x0f263, 0x0d950, 0x05b57, 0x056a0,
+    0x096d0, 0x04dd5, 0x04ad0, 0x0a4d0, 0x0d4d4, 0x0d250, 0x0d558, 0x0b540, 0x0b6a0, 0x195a6,
+    0x095b0, 0x049b0, 0x0a974, 0x0a4b0, 0x0b27a, 0x06a50, 0x06d40, 0x0af46, 0x0ab60, 0x09570,
+    0x04af5, 0x04970, 0x064b0, 0x074a3, 0x0ea50, 0x06b58, 0x05ac0, 0x0ab60, 0x096d5, 0x092e0,
+    0x0c960, 0x0d954, 0x0d4a0, 0x0da50, 0x07552, 0x056a0, 0x0abb7, 0x025d0, 0x092d0, 0x0cab5,
+    0x0a950, 0x0b4a0, 0x0baa4, 0x0ad50, 0x055d9, 0x04ba0, 0x0a5b0, 0x15176, 0x052b0, 0x0a930,
+    0x07954, 0x06aa0, 0x0ad50, 0x05b52, 0x04b60, 0x0a6e6, 0x0a4e0, 0x0d260, 0x0ea65, 0x0d530,
+    0x05aa0, 0x076a3, 0x096d0, 0x04afb, 0x04ad0, 0x0a4d0, 0x1d0b6, 0x0d250, 0x0d520, 0x0dd45,
+    0x0b5a0, 0x056d0, 0x055b2, 0x049b0, 0x0a577, 0x0a4b0, 0x0aa50, 0x1b255, 0x06d20, 0x0ada0,
+    0x14b63, 0x09370, 0x049f8, 0x04970, 0x064b0, 0x168a6, 0x0ea50, 0x06b20, 0x1a6c4, 0x0aae0,
+    0x092e0, 0x0d2e3, 0x0c960, 0x0d557, 0x0d4a0, 0x0da50, 0x05d55, 0x056a0, 0x0a6d0, 0x055d4,
+    0x052d0, 0x0a9b8, 0x0a950, 0x0b4a0, 0x0b6a6, 0x0ad50, 0x055a0, 0x0aba4, 0x0a5b0, 0x052b0,
+    0x0b273, 0x06930, 0x07337, 0x06aa0, 0x0ad50, 0x14b55, 0x04b60, 0x0a570, 0x054e4, 0x0d160,
+    0x0e968, 0x0d520, 0x0daa0, 0x16aa6, 0x056d0, 0x04ae0, 0x0a9d4, 0x0a2d0, 0x0d150, 0x0f252,
+    0x0d520,
+]
+
+# 农历 1900 年正月初一对应的公历日期
+BASE_DATE = date(1900, 1, 31)
+MIN_YEAR = 1900
+MAX_YEAR = MIN_YEAR + len(LUNAR_INFO) - 1
+
+HEAVENLY_STEMS = '甲乙丙丁戊己庚辛壬癸'
+EARTHLY_BRANCHES = '子丑寅卯辰巳午未申酉戌亥'
+ZODIAC_ANIMALS = '鼠牛虎兔龙蛇马羊猴鸡狗猪'
+LUNAR_MONTHS = ['正月', '二月', '三月', '四月', '五月', '六月',
+                '七月', '八月', '九月', '十月', '冬月', '腊月']
+LUNAR_DAYS = ['初一', '初二', '初三', '初四', '初五', '初六', '初七', '初八', '初九', '初十',
+              '十一', '十二', '十三', '十四', '十五', '十六', '十七', '十八', '十九', '二十',
+              '廿一', '廿二', '廿三', '廿四', '廿五', '廿六', '廿七', '廿八', '廿九', '三十']
+
+# 平均朔望月长度，用于直接估算月份下标
+SYNODIC_MONTH = 29.530588
+
+# 月份表（首次使用时构建）：每个农历月的起始日序号、所属年份、月份、是否闰月
+_month_starts = []
+_month_info = []
+
+
+def year_months(year):
+    """返回某个农历年的月份列表 [(月份, 是否闰月, 天数), ...]"""
+    info = LUNAR_INFO[year - MIN_YEAR]
+    leap = info & 0xf
+    months = []
+    for month in range(1, 13):
+        months.append((month, False, 30 if info & (0x10000 >> month) else 29))
+        if month == leap:
+            months.append((month, True, 30 if info & 0x10000 else 29))
+    return months
+
+
+def _build_month_table():
+    ordinal = BASE_DATE.toordinal()
+    for year in range(MIN_YEAR, MAX_YEAR + 1):
+        for month, is_leap, days in year_months(year):
+            _month_starts.append(ordinal)
+            _month_info.append((year, month, is_leap))
+            ordinal += days
+    # 哨兵：最后一个月的结束位置
+    _month_starts.append(ordinal)
+
+
+def ganzhi_year(year):
+    """农历年的干支，如 2025 -> 乙巳"""
+    return HEAVENLY_STEMS[(year - 4) % 10] + EARTHLY_BRANCHES[(year - 4) % 12]
+
+
+def zodiac(year):
+    """农历年的生肖"""
+    return ZODIAC_ANIMALS[(year - 4) % 12]
+
+
+def solar_to_lunar(solar_date):
+    """公历转农历
+
+    Args:
+        solar_date (date | datetime): 公历日期，范围 1900-01-31 到 2100 年农历年末
+
+    Returns:
+        dict: year, month, day, is_leap, ganzhi, zodiac
+    """
+    if not _month_starts:
+        _build_month_table()
+
+    ordinal = solar_date.toordinal()
+    if not _month_starts[0] <= ordinal < _month_starts[-1]:
+        raise ValueError(f"超出农历表范围: {solar_date}")
+
+    # 按平均月长估算下标，再向前/后微调（最多一两步）
+    index = int((ordinal - _month_starts[0]) / SYNODIC_MONTH)
+    index = min(index, len(_month_info) - 1)
+    while _month_starts[index] > ordinal:
+        index -= 1
+    while _month_starts[index + 1] <= ordinal:
+        index += 1
+
+    year, month, is_leap = _month_info[index]
+    return {
+        'year': year,
+        'month': month,
+        'day': ordinal - _month_starts[index] + 1,
+        'is_leap': is_leap,
+        'ganzhi': ganzhi_year(year),
+        'zodiac': zodiac(year)
+    }
+
+
+def lunar_to_solar(year, month, day, is_leap=False):
+    """农历转公历"""
+    if not _month_starts:
+        _build_month_table()
+    first = bisect.bisect_left(_month_info, (year, 0, False))
+    for index in range(first, min(first + 13, len(_month_info))):
+        if _month_info[index] == (year, month, is_leap):
+            return date.fromordinal(_month_starts[index] + day - 1)
+    raise ValueError(f"无效的农历日期: {year}-{'闰' if is_leap else ''}{month}-{day}")
+
+
+def format_lunar(solar_date):
+    """格式化农历日期，如：乙巳蛇年 闰六月初一"""
+    lunar = solar_to_lunar(solar_date)
+    month_name = ('闰' if lunar['is_leap'] else '') + LUNAR_MONTHS[lunar['month'] - 1]
+    return f"{lunar['ganzhi']}{lunar['zodiac']}年 {month_name}{LUNAR_DAYS[lunar['day'] - 1]}"
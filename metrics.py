@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+运行指标
+记录日报流水线各环节的耗时（span）和计数器（请求数、字节数、重试、缓存命中、错误），
+每次运行结束时导出为：
+- Prometheus 文本文件（node_exporter textfile collector 格式），每次覆盖
+- JSON Lines，每次运行追加一行，便于长期绘图
+
+环境变量：
+    METRICS_DIR      导出目录，默认 .metrics/
+    METRICS_FORMAT   导出格式，逗号分隔：prometheus,jsonl（默认两者都导出），none 表示不导出
+"""
+
+import functools
+import json
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+METRICS_DIR = os.getenv('METRICS_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.metrics'))
+METRICS_FORMAT = os.getenv('METRICS_FORMAT', 'prometheus,jsonl')
+METRIC_PREFIX = 'daily_report'
+# 与 inspect.iscoroutinefunction 的判断相同；不导入 inspect，可少约 10ms 启动时间
+CO_COROUTINE = 0x0080
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key):
+    if not key:
+        return ''
+    return '{' + ','.join(f'{name}="{value}"' for name, value in key) + '}'
+
+
+class Metrics:
+    """进程内的指标注册表"""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.started_at = time.time()
+        # (名称, 标签) -> 值
+        self.counters = {}
+        # (名称, 标签) -> [次数, 总耗时, 最大耗时]
+        self.spans = {}
+
+    def inc(self, name, value=1, **labels):
+        """计数器加 value"""
+        key = (name, _label_key(labels))
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        """记录一次耗时"""
+        key = (name, _label_key(labels))
+        stat = self.spans.get(key)
+        if stat is None:
+            self.spans[key] = [1, seconds, seconds]
+        else:
+            stat[0] += 1
+            stat[1] += seconds
+            stat[2] = max(stat[2], seconds)
+
+    @contextmanager
+    def span(self, name, **labels):
+        """计时代码块（块内可以 await）；出现异常时同时记一次 errors"""
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.inc('errors', span=name, **labels)
+            raise
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def timed(self, name, **labels):
+        """装饰器：为整个函数计时，同步函数和协程函数都可以使用"""
+        def decorator(func):
+            if func.__code__.co_flags & CO_COROUTINE:
+                @functools.wraps(func)
+                async def async_wrapper(*args, **kwargs):
+                    with self.span(name, **labels):
+                        return await func(*args, **kwargs)
+                return async_wrapper
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(name, **labels):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def snapshot(self, gauges=None):
+        """当前指标的 dict 形式"""
+        return {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'duration_seconds': round(time.time() - self.started_at, 3),
+            'spans': [
+                {'name': name, 'labels': dict(labels), 'count': count,
+                 'total_seconds': round(total, 6), 'max_seconds': round(peak, 6)}
+                for (name, labels), (count, total, peak) in sorted(self.spans.items())
+            ],
+            'counters': [
+                {'name': name, 'labels': dict(labels), 'value': value}
+                for (name, labels), value in sorted(self.counters.items())
+            ],
+            'gauges': gauges or {},
+        }
+
+    def to_prometheus(self, gauges=None):
+        """Prometheus 文本格式"""
+        lines = []
+        span_names = sorted({name for name, _ in self.spans})
+        for name in span_names:
+            metric = f"{METRIC_PREFIX}_{name}_seconds"
+            lines.append(f"# TYPE {metric} summary")
+            for (span_name, labels), (count, total, _) in sorted(self.spans.items()):
+                if span_name == name:
+                    lines.append(f"{metric}_sum{_format_labels(labels)} {total:.6f}")
+                    lines.append(f"{metric}_count{_format_labels(labels)} {count}")
+            lines.append(f"# TYPE {metric}_max gauge")
+            for (span_name, labels), (_, _, peak) in sorted(self.spans.items()):
+                if span_name == name:
+                    lines.append(f"{metric}_max{_format_labels(labels)} {peak:.6f}")
+
+        counter_names = sorted({name for name, _ in self.counters})
+        for name in counter_names:
+            metric = f"{METRIC_PREFIX}_{name}_total"
+            lines.append(f"# TYPE {metric} counter")
+            for (counter_name, labels), value in sorted(self.counters.items()):
+                if counter_name == name:
+                    lines.append(f"{metric}{_format_labels(labels)} {value}")
+
+        for name, value in sorted((gauges or {}).items()):
+            metric = f"{METRIC_PREFIX}_{name}"
+            lines.append(f"# TYPE {metric} gauge")
+            lines.append(f"{metric} {value}")
+
+        lines.append(f"# TYPE {METRIC_PREFIX}_last_run_timestamp_seconds gauge")
+        lines.append(f"{METRIC_PREFIX}_last_run_timestamp_seconds {int(time.time())}")
+        return '\n'.join(lines) + '\n'
+
+
+metrics = Metrics()
+inc = metrics.inc
+observe = metrics.observe
+span = metrics.span
+timed = metrics.timed
+
+
+def _collect_gauges():
+    """运行结束时顺带导出连接池统计"""
+    try:
+        from http_pool import get_pool_stats
+    except ImportError:
+        return {}
+    return {f"http_{name}": value for name, value in get_pool_stats().items()}
+
+
+def export_run(directory=METRICS_DIR, formats=METRICS_FORMAT):
+    """导出本次运行的指标，返回写入的文件列表"""
+    formats = {fmt.strip() for fmt in formats.split(',') if fmt.strip()}
+    if not formats or 'none' in formats:
+        return []
+
+    os.makedirs(directory, exist_ok=True)
+    gauges = _collect_gauges()
+    written = []
+    if 'prometheus' in formats:
+        path = os.path.join(directory, f"{METRIC_PREFIX}.prom")
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(metrics.to_prometheus(gauges))
+        # 原子替换，避免采集器读到写了一半的文件
+        os.replace(tmp_path, path)
+        written.append(path)
+    if 'jsonl' in formats:
+        path = os.path.join(directory, f"{METRIC_PREFIX}.jsonl")
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(metrics.snapshot(gauges), ensure_ascii=False) + '\n')
+        written.append(path)
+    return written
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+诗词库
+支持十万首以上的诗词，存成紧凑的磁盘格式，按需读取，不把整个库加载进内存：
+
+    poems.dat        每首诗一行：内容\\t作者\\t标题\\t季节\\t节气（UTF-8）
+    poems.idx        8 字节头 + (N+1) 个 uint64 行偏移，mmap 后 O(1) 定位第 i 首
+    poems.fidx       筛选索引：按作者/季节/节气预先算好的诗词编号（uint32）
+    poems.fidx.json  筛选索引目录：{"author:李白": [起始位置, 数量], ...}
+
+选诗规则：对每个 (chat, 日期) 确定性地选出一首；同一个 chat 在整个库轮完一遍之前不会重复。
+做法是按天数轮转位置 p，再用 (chat, 第几轮) 作为种子的仿射置换 (a * p + b) mod N 映射到诗词编号。
+
+用法:
+    python poem_corpus.py build poems.jsonl [输出目录]    从 JSON Lines 构建诗词库
+    python poem_corpus.py pick <chat_id> [YYYY-MM-DD]     查看某天会选到哪首诗
+"""
+
+import hashlib
+import json
+import math
+import mmap
+import os
+import struct
+import sys
+from array import array
+from datetime import date
+
+CORPUS_DIR = os.getenv('POEM_CORPUS_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'poems'))
+
+INDEX_MAGIC = b'PIDX'
+INDEX_VERSION = 1
+HEADER = struct.Struct('<4sI')
+FIELDS = ('content', 'author', 'title', 'season', 'solar_term')
+# 轮转从这一天开始计数
+EPOCH = date(2000, 1, 1)
+
+# 没有构建诗词库时使用的内置诗词
+BUILTIN_POEMS = [
+    {"content": "携壶酌流霞，搴菊泛寒荣。", "author": "李白", "title": "九日龙山饮", "season": "秋"},
+    {"content": "山重水复疑无路，柳暗花明又一村。", "author": "陆游", "title": "游山西村", "season": "春"},
+    {"content": "海内存知己，天涯若比邻。", "author": "王勃", "title": "送杜少府之任蜀州"},
+    {"content": "落红不是无情物，化作春泥更护花。", "author": "龚自珍", "title": "己亥杂诗", "season": "春"},
+    {"content": "会当凌绝顶，一览众山小。", "author": "杜甫", "title": "望岳"},
+    {"content": "长风破浪会有时，直挂云帆济沧海。", "author": "李白", "title": "行路难"},
+    {"content": "问君能有几多愁，恰似一江春水向东流。", "author": "李煜", "title": "虞美人", "season": "春"},
+    {"content": "春花秋月何时了，往事知多少。", "author": "李煜", "title": "虞美人"},
+    {"content": "但愿人长久，千里共婵娟。", "author": "苏轼", "title": "水调歌头", "season": "秋"},
+    {"content": "人生如梦，一尊还酹江月。", "author": "苏轼", "title": "念奴娇·赤壁怀古"},
+    {"content": "采菊东篱下，悠然见南山。", "author": "陶渊明", "title": "饮酒", "season": "秋"},
+    {"content": "不畏浮云遮望眼，自缘身在最高层。", "author": "王安石", "title": "登飞来峰"},
+    {"content": "千里莺啼绿映红，水村山郭酒旗风。", "author": "杜牧", "title": "江南春", "season": "春"},
+    {"content": "停车坐爱枫林晚，霜叶红于二月花。", "author": "杜牧", "title": "山行", "season": "秋"},
+]
+
+
+def season_of(day):
+    """按月份划分季节"""
+    return '春夏秋冬'[((day.month - 3) % 12) // 3]
+
+
+def filter_keys(record):
+    """一首诗对应的筛选索引键"""
+    keys = []
+    for field, prefix in (('author', 'author'), ('season', 'season'), ('solar_term', 'term')):
+        if record.get(field):
+            keys.append(f"{prefix}:{record[field]}")
+    return keys
+
+
+class BuiltinCorpus:
+    """内存中的小诗词库（接口与 PoemCorpus 相同）"""
+
+    def __init__(self, poems=BUILTIN_POEMS):
+        self.poems = poems
+        self.filters = {}
+        for index, poem in enumerate(poems):
+            for key in filter_keys(poem):
+                self.filters.setdefault(key, []).append(index)
+
+    def __len__(self):
+        return len(self.poems)
+
+    def get(self, index):
+        return self.poems[index]
+
+    def postings(self, key):
+        return self.filters.get(key)
+
+
+class PoemCorpus:
+    """mmap 的磁盘诗词库"""
+
+    def __init__(self, directory=CORPUS_DIR):
+        self.directory = directory
+        self._files = []
+        self._data = self._map('poems.dat')
+        index = self._map('poems.idx')
+        magic, version = HEADER.unpack_from(index, 0)
+        if magic != INDEX_MAGIC or version != INDEX_VERSION:
+            raise ValueError(f"无效的诗词索引: {directory}")
+        self._offsets = memoryview(index)[HEADER.size:].cast('Q')
+        self._count = len(self._offsets) - 1
+
+        self._filter_dir = {}
+        self._postings = None
+        filter_dir_path = os.path.join(directory, 'poems.fidx.json')
+        if os.path.exists(filter_dir_path):
+            with open(filter_dir_path, 'r', encoding='utf-8') as f:
+                self._filter_dir = json.load(f)
+            if self._filter_dir:
+                self._postings = memoryview(self._map('poems.fidx')).cast('I')
+
+    def _map(self, name):
+        f = open(os.path.join(self.directory, name), 'rb')
+        self._files.append(f)
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __len__(self):
+        return self._count
+
+    def get(self, index):
+        """读取第 index 首诗（只读取这一行）"""
+        start, end = self._offsets[index], self._offsets[index + 1]
+        values = self._data[start:end].decode('utf-8').rstrip('\n').split('\t')
+        return {field: value for field, value in zip(FIELDS, values) if value}
+
+    def postings(self, key):
+        """筛选索引：满足条件的诗词编号（只读视图）"""
+        entry = self._filter_dir.get(key)
+        if entry is None:
+            return None
+        start, count = entry
+        return self._postings[start:start + count]
+
+
+def build_corpus(records, directory=CORPUS_DIR):
+    """从 dict 迭代器流式构建诗词库，返回诗词数量
+
+    没有任何记录时抛出 ValueError，不会覆盖已有的诗词库（空库无法轮转）。
+    """
+    os.makedirs(directory, exist_ok=True)
+    offsets = array('Q', [0])
+    filters = {}
+    count = 0
+    data_path = os.path.join(directory, 'poems.dat')
+    with open(f"{data_path}.tmp", 'wb') as data:
+        for record in records:
+            fields = [str(record.get(field, '')).replace('\t', ' ').replace('\n', ' ') for field in FIELDS]
+            line = ('\t'.join(fields) + '\n').encode('utf-8')
+            data.write(line)
+            offsets.append(offsets[-1] + len(line))
+            for key in filter_keys(record):
+                filters.setdefault(key, array('I')).append(count)
+            count += 1
+    if count == 0:
+        os.unlink(f"{data_path}.tmp")
+        raise ValueError("没有诗词记录，诗词库未构建")
+    os.replace(f"{data_path}.tmp", data_path)
+
+    with open(os.path.join(directory, 'poems.idx'), 'wb') as index:
+        index.write(HEADER.pack(INDEX_MAGIC, INDEX_VERSION))
+        offsets.tofile(index)
+
+    filter_dir = {}
+    position = 0
+    with open(os.path.join(directory, 'poems.fidx'), 'wb') as postings:
+        for key in sorted(filters):
+            filters[key].tofile(postings)
+            filter_dir[key] = [position, len(filters[key])]
+            position += len(filters[key])
+    with open(os.path.join(directory, 'poems.fidx.json'), 'w', encoding='utf-8') as f:
+        json.dump(filter_dir, f, ensure_ascii=False)
+    return count
+
+
+def rotation_index(chat_id, day, size):
+    """(chat, 日期) -> [0, size) 中的位置；同一 chat 连续 size 天内不重复"""
+    days = (day - EPOCH).days
+    cycle, position = divmod(days, size)
+    digest = hashlib.sha256(f"{chat_id}:{cycle}".encode('utf-8')).digest()
+    a = int.from_bytes(digest[:8], 'little') % size or 1
+    b = int.from_bytes(digest[8:16], 'little') % size
+    # a 必须与 size 互质，仿射变换才是置换
+    while math.gcd(a, size) != 1:
+        a = a % size + 1
+    return (a * position + b) % size
+
+
+_corpus = None
+
+
+def get_corpus():
+    """优先使用磁盘诗词库，没有构建或为空时回退到内置诗词"""
+    global _corpus
+    if _corpus is None:
+        if os.path.exists(os.path.join(CORPUS_DIR, 'poems.idx')):
+            _corpus = PoemCorpus(CORPUS_DIR)
+        if not _corpus:
+            _corpus = BuiltinCorpus()
+    return _corpus
+
+
+def pick_poem(chat_id, day, author=None, season=None, solar_term=None, corpus=None):
+    """为某个 chat 选出某天的诗词
+
+    可按作者、季节、节气筛选；没有满足条件的诗时忽略筛选条件。
+    """
+    corpus = corpus or get_corpus()
+    candidates = None
+    for key in (f"author:{author}" if author else None,
+                f"season:{season}" if season else None,
+                f"term:{solar_term}" if solar_term else None):
+        if key:
+            postings = corpus.postings(key)
+            if postings:
+                candidates = postings
+                break
+
+    if candidates is not None:
+        return corpus.get(candidates[rotation_index(chat_id, day, len(candidates))])
+    return corpus.get(rotation_index(chat_id, day, len(corpus)))
+
+
+def iter_jsonl(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) >= 3 and sys.argv[1] == 'build':
+        out_dir = sys.argv[3] if len(sys.argv) > 3 else CORPUS_DIR
+        try:
+            total = build_corpus(iter_jsonl(sys.argv[2]), out_dir)
+        except ValueError as e:
+            print(f"❌ {e}")
+            sys.exit(1)
+        print(f"✅ 已构建诗词库: {total} 首 -> {out_dir}")
+    elif len(sys.argv) >= 3 and sys.argv[1] == 'pick':
+        day = date.fromisoformat(sys.argv[3]) if len(sys.argv) > 3 else date.today()
+        poem = pick_poem(sys.argv[2], day)
+        print(f"{poem['content']}\n—— {poem.get('author', '')}《{poem.get('title', '')}》")
+    else:
+        print("用法:")
+        print("  python poem_corpus.py build poems.jsonl [输出目录]")
+        print("  python poem_corpus.py pick <chat_id> [YYYY-MM-DD]")
@@ -1,11 +1,12 @@
 import asyncio
-from telegram import Bot
 from telegram.constants import ParseMode
 import requests
 import random
 import os
 from datetime import datetime
 
+from bot_client import create_bot
+
 # --- 配置 ---
 # 从环境变量获取配置，如果没有则使用默认值（本地开发用）
 BOT_TOKEN = os.getenv('BOT_TOKEN', "8226079704:AAHuBWHZphave2xwU_A6ELI3M3IsZOfwZQ4")
@@ -22,7 +23,7 @@ def get_daily_poem():
 
 # --- 测试 Bot 连接的函数 ---
 async def test_bot():
-    bot = Bot(token=BOT_TOKEN)
+    bot = create_bot(BOT_TOKEN)
     try:
         # 获取 bot 信息
         bot_info = await bot.get_me()
@@ -44,7 +45,7 @@ async def test_bot():
 # --- 推送消息的主函数 ---
 async def push_poem():
     # 1. 初始化 Bot
-    bot = Bot(token=BOT_TOKEN)
+    bot = create_bot(BOT_TOKEN)
     
     try:
         # 2. 获取古诗数据
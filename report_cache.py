@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+日报缓存
+以 (GitHub 用户, 目标日期, github_days_back, 模板版本) 为键缓存各段的中间数据（日期信息、GitHub 活动），
+再加上 chat_id 缓存渲染好的完整日报：
+- 发送失败后重跑：同一个 chat 直接命中完整日报，不再请求 GitHub
+- 同一份日报发给多个 chat：命中中间数据，只需按 chat 选诗并渲染（微秒级）
+
+条目存成 JSON 文件，同时在内存里保留一份，超过 TTL 视为过期；
+今天的日报（github_days_back=0）当天还会有新活动，只缓存 REPORT_CACHE_TODAY_TTL，
+已经过去的日期才用长的 REPORT_CACHE_TTL；
+条目数或总大小超过上限时按最近写入时间淘汰最旧的条目。
+
+环境变量：
+    REPORT_CACHE_DIR          缓存目录，默认 .cache/reports
+    REPORT_CACHE_TTL          过期时间（秒），默认 43200（12 小时）
+    REPORT_CACHE_TODAY_TTL    今天的日报的过期时间（秒），默认 300
+    REPORT_CACHE_MAX_ENTRIES  最多保留的条目数，默认 5000
+    REPORT_CACHE_MAX_BYTES    最多占用的磁盘空间，默认 50MB
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import time
+from collections import OrderedDict
+
+import metrics
+from report_template import TEMPLATE_VERSION
+
+REPORT_CACHE_DIR = os.getenv('REPORT_CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'reports'))
+REPORT_CACHE_TTL = float(os.getenv('REPORT_CACHE_TTL', str(12 * 3600)))
+REPORT_CACHE_TODAY_TTL = float(os.getenv('REPORT_CACHE_TODAY_TTL', '300'))
+REPORT_CACHE_MAX_ENTRIES = int(os.getenv('REPORT_CACHE_MAX_ENTRIES', '5000'))
+REPORT_CACHE_MAX_BYTES = int(os.getenv('REPORT_CACHE_MAX_BYTES', str(50 * 1024 * 1024)))
+
+
+def report_key(user, day, github_days_back, chat_id=None):
+    """缓存键；不带 chat_id 时是各段中间数据，带 chat_id 时是渲染好的日报"""
+    parts = [str(user or ''), day.isoformat(), str(github_days_back), f"v{TEMPLATE_VERSION}"]
+    if chat_id is not None:
+        parts.append(str(chat_id))
+    return hashlib.sha256('|'.join(parts).encode('utf-8')).hexdigest()
+
+
+class ReportCache:
+    """带 TTL 和容量上限的日报缓存（内存 + 磁盘）"""
+
+    def __init__(self, cache_dir=REPORT_CACHE_DIR, ttl=REPORT_CACHE_TTL,
+                 max_entries=REPORT_CACHE_MAX_ENTRIES, max_bytes=REPORT_CACHE_MAX_BYTES, source='report'):
+        self.cache_dir = cache_dir
+        # 指标里的 source 标签，区分日报缓存和其他复用这个类的存储
+        self.source = source
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # 键 -> 条目，按写入顺序排列（最旧的在前）
+        self._memory = OrderedDict()
+        # 键 -> 文件大小；第一次写入时才扫描目录
+        self._sizes = None
+        self._total_bytes = 0
+
+    def cache_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key):
+        """读取未过期的条目，返回 value 或 None"""
+        entry = self._memory.get(key)
+        if entry is None:
+            try:
+                with open(self.cache_path(key), 'r', encoding='utf-8') as f:
+                    entry = json.load(f)
+            except (FileNotFoundError, ValueError):
+                entry = None
+
+        if entry is not None and time.time() - entry['created_at'] > entry.get('ttl', self.ttl):
+            self.delete(key)
+            entry = None
+
+        if entry is None:
+            self.misses += 1
+            metrics.inc('cache_misses', source=self.source)
+            return None
+        self.hits += 1
+        metrics.inc('cache_hits', source=self.source)
+        self._memory[key] = entry
+        return entry['value']
+
+    def peek(self, key):
+        """只看内存中的副本，不读磁盘、不计入命中统计"""
+        entry = self._memory.get(key)
+        return entry['value'] if entry is not None else None
+
+    def put(self, key, value, ttl=None):
+        """写入条目（原子替换），必要时淘汰最旧的条目；ttl 覆盖这一条的过期时间"""
+        self._load_index()
+        entry = {'created_at': time.time(), 'value': value}
+        if ttl is not None:
+            entry['ttl'] = ttl
+        data = json.dumps(entry, ensure_ascii=False)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # 每次写入用唯一的临时文件：分片工作进程、常驻进程和 cron 同时写同一条目时不会互相覆盖
+        with tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=self.cache_dir, suffix='.tmp',
+                                         delete=False) as f:
+            f.write(data)
+        try:
+            os.replace(f.name, self.cache_path(key))
+        except OSError:
+            os.unlink(f.name)
+            raise
+
+        self._total_bytes -= self._sizes.pop(key, 0)
+        self._sizes[key] = len(data.encode('utf-8'))
+        self._total_bytes += self._sizes[key]
+        self._memory.pop(key, None)
+        self._memory[key] = entry
+        self.evict()
+
+    def delete(self, key):
+        self._memory.pop(key, None)
+        if self._sizes is not None:
+            self._total_bytes -= self._sizes.pop(key, 0)
+        try:
+            os.remove(self.cache_path(key))
+        except FileNotFoundError:
+            pass
+
+    def evict(self):
+        """超过条目数或总大小上限时，从最旧的条目开始删除"""
+        while self._sizes and (len(self._sizes) > self.max_entries or self._total_bytes > self.max_bytes):
+            oldest = next(iter(self._sizes))
+            self.delete(oldest)
+            self.evictions += 1
+        # 内存中的副本不超过同样的条目数
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _load_index(self):
+        """扫描一次缓存目录，按修改时间建立淘汰顺序，顺带清掉过期条目"""
+        if self._sizes is not None:
+            return
+        self._sizes = OrderedDict()
+        self._total_bytes = 0
+        try:
+            files = [entry for entry in os.scandir(self.cache_dir)
+                     if entry.is_file() and entry.name.endswith('.json')]
+        except FileNotFoundError:
+            return
+        now = time.time()
+        for entry in sorted(files, key=lambda item: item.stat().st_mtime):
+            stat = entry.stat()
+            if now - stat.st_mtime > self.ttl:
+                os.remove(entry.path)
+                continue
+            self._sizes[entry.name[:-5]] = stat.st_size
+            self._total_bytes += stat.st_size
+
+    def stats(self):
+        """命中统计"""
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': round(self.hits / total, 3) if total else 0.0
+        }
+
+
+_default_cache = None
+
+
+def get_report_cache():
+    """进程内共享的日报缓存"""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ReportCache()
+    return _default_cache
+
+
+def set_report_cache(cache):
+    """替换共享缓存实例（基准测试中指向临时目录）"""
+    global _default_cache
+    _default_cache = cache
@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+日报模板渲染
+每个段落的模板在导入时编译一次，渲染时直接追加到列表缓冲区，最后 ''.join。
+所有字段默认做 HTML 转义（PR 标题里的 < 或 & 不会再破坏 ParseMode.HTML）；
+确定是可信 HTML 的字段用 {name|raw} 跳过转义。
+
+模板语法与 str.format 相同：{name}、{pr.title}（按 key 逐级取值）、{value:.1f}。
+编译时把模板转换成一个 Python 函数，渲染时没有逐字段的解释开销。
+"""
+
+import html
+from string import Formatter
+
+# 模板或布局变化时加 1，用于区分缓存中的旧报告
+TEMPLATE_VERSION = 3
+
+
+def escape(value):
+    """Telegram HTML 只需要转义 & < >；绝大多数字段不含这些字符，直接返回"""
+    if value.__class__ is not str:
+        value = str(value)
+    if '&' in value or '<' in value or '>' in value:
+        return html.escape(value, quote=False)
+    return value
+
+
+def _literal(text):
+    """把字面文本转成可以放进 f"..." 的源码"""
+    return (text.encode('unicode_escape').decode('ascii')
+            .replace('"', '\\"').replace('{', '{{').replace('}', '}}'))
+
+
+class Template:
+    """编译后的模板
+
+    解析一次模板源码，生成一个 f-string：字面文本原样内联，可信字段直接格式化。
+    需要转义的字段先在 f-string 里检查是否含 & < >，只有含这些字符时才调用 escape，
+    绝大多数字段没有函数调用开销；字段不是字符串时（TypeError）退回到逐个调用 escape。
+    render_into(buf, ctx) 追加一段，render_each(buf, items) 在一个函数里循环渲染整个列表。
+    第一次渲染时才编译，导入本模块（--help 等启动路径）不需要编译所有模板。
+    """
+
+    def __init__(self, source):
+        self.source = source
+
+    def __getattr__(self, name):
+        # 编译后 render_into / render_each 是实例属性，不会再走到这里
+        if name not in ('render_into', 'render_each'):
+            raise AttributeError(name)
+        self._compile()
+        return self.__dict__[name]
+
+    def _compile(self):
+        fast = []
+        safe = []
+        for literal, field, spec, conversion in Formatter().parse(self.source):
+            if literal:
+                fast.append(_literal(literal))
+                safe.append(_literal(literal))
+            if field is None:
+                continue
+            raw = field.endswith('|raw')
+            if raw:
+                field = field[:-4]
+            expr = 'ctx' + ''.join(f'[{key!r}]' for key in field.split('.'))
+            if raw:
+                part = f'{{{expr}:{spec}}}' if spec else f'{{{expr}}}'
+                fast.append(part)
+                safe.append(part)
+            elif spec:
+                part = f'{{escape(format({expr}, {spec!r}))}}'
+                fast.append(part)
+                safe.append(part)
+            else:
+                name = f'_v{len(fast)}'
+                fast.append(f"{{({name} if '&' not in ({name} := {expr}) and '<' not in {name} "
+                            f"and '>' not in {name} else escape({name}))}}")
+                safe.append(f'{{escape({expr})}}')
+        fast_text = 'f"' + ''.join(fast) + '"'
+        safe_text = 'f"' + ''.join(safe) + '"'
+        code = (f"def render_into(buf, ctx):\n"
+                f"    try:\n        buf.append({fast_text})\n"
+                f"    except TypeError:\n        buf.append({safe_text})\n"
+                f"def render_each(buf, items):\n    append = buf.append\n    for ctx in items:\n"
+                f"        try:\n            append({fast_text})\n"
+                f"        except TypeError:\n            append({safe_text})\n")
+        namespace = {'escape': escape}
+        exec(code, namespace)
+        self.render_into = namespace['render_into']
+        self.render_each = namespace['render_each']
+
+    def render(self, context):
+        buf = []
+        self.render_into(buf, context)
+        return ''.join(buf)
+
+
+# 日期、进度、节气等由程序自身生成的字段标记为 |raw；
+# 来自 GitHub、诗词库等外部数据的字段一律转义
+
+# --- 公共条目模板 ---
+PR_ITEM = Template("• {action} PR: {title} ({repo})\n")
+ISSUE_ITEM = Template("• {action} Issue: {title} ({repo})\n")
+COMMIT_ITEM = Template("• 提交了: {message} ({repo})\n")
+POEM_BODY = Template("<i>{content}</i>\n")
+
+# --- advanced_report 日报 ---
+ADVANCED_HEADER = Template(
+    "<b>📅 每日报告</b>\n\n"
+    "📆 <b>{date|raw} {weekday|raw}</b>\n"
+)
+ADVANCED_SOLAR_TERM = Template("🌸 节气：{solar_term|raw}\n")
+ADVANCED_NEXT_TERM = Template("🌿 距离{next_solar_term|raw}还有 {days_to_next_term|raw} 天\n")
+ADVANCED_LUNAR = Template("🏮 农历：{lunar_date|raw}\n")
+ADVANCED_PROGRESS = Template(
+    "\n今天是今年的第 <b>{day_of_year|raw}</b> 天\n"
+    "<code>{progress_bar|raw}</code> {progress_percent|raw}% ({day_of_year|raw}/{total_days|raw})\n\n"
+)
+ADVANCED_GITHUB_TITLE = Template("<b>💻 GitHub ({date_text|raw})：</b>\n")
+ADVANCED_GITHUB_EMPTY = Template("• {date_text|raw}没有 GitHub 活动\n")
+ADVANCED_POEM_TITLE = "<b>📜 今天的一句诗:</b>\n"
+ADVANCED_POEM_SOURCE = Template("—— {author}《{title}》\n")
+
+# --- daily_report 日报 ---
+DAILY_HEADER = Template(
+    "<b>📅 今日日报</b>\n\n"
+    "今天的起床时间是--{wake_time|raw}。\n\n"
+    "起床啦。\n\n"
+    "今天是今年的第 {day_of_year|raw} 天。\n\n"
+    "<code>{progress_bar|raw}</code> {progress_percent|raw}% ({day_of_year|raw}/{total_days|raw})\n\n"
+)
+DAILY_COMMIT_ITEM = Template("• 提交了: {message}... ({repo})\n")
+DAILY_RUNNING = Template(
+    "• 本周跑了 {week_distance|raw} 公里（目标 {weekly_goal|raw}，{week_progress|raw}%）\n"
+    "• 本月跑了 {month_distance|raw} 公里（目标 {monthly_goal|raw}，{month_progress|raw}%）\n"
+    "• 今年跑了 {year_distance|raw} 公里（目标 {yearly_goal|raw}，{year_progress|raw}%）\n\n"
+)
+DAILY_POEM_SOURCE = Template("—— {author}《{title}》")
+
+
+REVIEW_HEADER = Template(
+    "<b>📊 {title|raw}</b>\n\n"
+    "📅 {start|raw} ~ {end|raw}，共 {days|raw} 天\n\n"
+)
+REVIEW_GITHUB = Template(
+    "<b>💻 GitHub：</b>\n"
+    "• 活跃 {active_days|raw} 天，最长连续 {longest_streak|raw} 天\n"
+    "• 提交 {commits|raw} 次，PR {prs|raw} 个，Issue {issues|raw} 个\n"
+)
+REVIEW_BUSIEST = Template("• 最忙的一天：{busiest_day|raw}（{busiest_events|raw} 个事件）\n")
+REVIEW_REPO_ITEM = Template("  {repo}（{commits|raw} 次提交）\n")
+REVIEW_RUNNING = Template(
+    "<b>🏃 跑步：</b>\n"
+    "• 跑了 {runs|raw} 次，共 {distance|raw} 公里，用时 {duration|raw}\n"
+    "• 跑步 {run_days|raw} 天，最长一次 {longest|raw} 公里\n"
+)
+
+
+DIGEST_HEADER = Template("<b>📊 {title|raw}</b>\n📅 {start_text|raw} - {end_text|raw}\n\n")
+DIGEST_GITHUB = Template(
+    "<b>💻 GitHub：</b>\n"
+    "• 提交 {commits|raw} 次，PR {prs|raw} 个，Issue {issues|raw} 个\n"
+    "• 活跃 {active_days|raw}/{days|raw} 天，连续活跃 {streak|raw} 天\n"
+)
+DIGEST_REPO_ITEM = Template("  {repo}：{commits|raw} 次提交，{prs|raw} 个 PR，{issues|raw} 个 Issue\n")
+DIGEST_RUNNING = Template(
+    "<b>🏃 跑步：</b>\n"
+    "• {period_text|raw}跑了 {distance|raw} 公里（目标 {goal|raw}，{progress|raw}%）\n"
+    "• 跑步 {runs|raw} 次，用时 {duration|raw}，连续跑步 {streak|raw} 天\n"
+)
+
+
+def days_back_text(github_days_back):
+    if github_days_back == 0:
+        return "今天"
+    if github_days_back == 1:
+        return "昨天"
+    return f"{github_days_back}天前"
+
+
+def render_advanced_report(date_info, github_activity, poem, github_days_back=1):
+    """渲染 advanced_report 的日报"""
+    buf = []
+    ADVANCED_HEADER.render_into(buf, date_info)
+    if date_info['solar_term']:
+        ADVANCED_SOLAR_TERM.render_into(buf, date_info)
+    elif date_info.get('next_solar_term'):
+        ADVANCED_NEXT_TERM.render_into(buf, date_info)
+    if date_info['lunar_date']:
+        ADVANCED_LUNAR.render_into(buf, date_info)
+    ADVANCED_PROGRESS.render_into(buf, date_info)
+
+    # GitHub 活动
+    context = {'date_text': days_back_text(github_days_back)}
+    ADVANCED_GITHUB_TITLE.render_into(buf, context)
+    if github_activity.get('stale'):
+        buf.append("• ⚠️ GitHub 暂时无法访问，以下是上次获取的数据\n")
+    prs = github_activity.get('prs', [])
+    issues = github_activity.get('issues', [])
+    commits = github_activity.get('commits', [])
+    PR_ITEM.render_each(buf, prs)
+    ISSUE_ITEM.render_each(buf, issues)
+    COMMIT_ITEM.render_each(buf, commits)
+    if not (prs or issues or commits):
+        if github_activity.get('error'):
+            buf.append("• GitHub 数据获取失败\n")
+        else:
+            ADVANCED_GITHUB_EMPTY.render_into(buf, context)
+    buf.append("\n")
+
+    # 每日诗词
+    buf.append(ADVANCED_POEM_TITLE)
+    POEM_BODY.render_into(buf, poem)
+    if poem.get('author') and poem.get('title'):
+        ADVANCED_POEM_SOURCE.render_into(buf, poem)
+
+    return ''.join(buf)
+
+
+def render_daily_report(time_stats, github_activity, running_stats, poem):
+    """渲染 daily_report 的日报"""
+    buf = []
+    DAILY_HEADER.render_into(buf, time_stats)
+
+    # GitHub 活动
+    buf.append("<b>📊 GitHub：</b>\n\n")
+    if github_activity['prs'] or github_activity['issues'] or github_activity['commits']:
+        for pr in github_activity['prs']:
+            action = "创建了" if pr['action'] == 'opened' else "更新了"
+            PR_ITEM.render_into(buf, dict(pr, action=action))
+        for issue in github_activity['issues']:
+            action = "创建了" if issue['action'] == 'opened' else "更新了"
+            ISSUE_ITEM.render_into(buf, dict(issue, action=action))
+        for commit in github_activity['commits'][:3]:  # 最多显示3个提交
+            DAILY_COMMIT_ITEM.render_into(buf, {'message': commit['message'][:50], 'repo': commit['repo']})
+    else:
+        buf.append("• 昨天没有 GitHub 活动\n")
+    buf.append("\n")
+
+    # 跑步统计
+    buf.append("<b>🏃 Run：</b>\n\n")
+    buf.append("• 昨天跑了步 ✅\n" if running_stats['yesterday'] else "• 昨天没跑\n")
+    DAILY_RUNNING.render_into(buf, running_stats)
+
+    # 每日诗词
+    buf.append("<b>📜 今天的一句诗:</b>\n\n")
+    POEM_BODY.render_into(buf, poem)
+    DAILY_POEM_SOURCE.render_into(buf, poem)
+
+    return ''.join(buf)
+
+
+def render_review(summary):
+    """渲染一段时间（如一整年）的回顾"""
+    buf = []
+    REVIEW_HEADER.render_into(buf, summary)
+    github = summary['github']
+    REVIEW_GITHUB.render_into(buf, github)
+    if github['busiest_day']:
+        REVIEW_BUSIEST.render_into(buf, github)
+    if github['top_repos']:
+        buf.append("• 常用仓库：\n")
+        REVIEW_REPO_ITEM.render_each(buf, github['top_repos'])
+    buf.append("\n")
+    if summary['running']['runs']:
+        REVIEW_RUNNING.render_into(buf, summary['running'])
+    else:
+        buf.append("<b>🏃 跑步：</b>\n• 这段时间没有跑步记录\n")
+    return ''.join(buf)
+
+
+def render_digest(digest):
+    """渲染周报 / 月报"""
+    buf = []
+    DIGEST_HEADER.render_into(buf, digest)
+    github = digest['github']
+    if github['active_days']:
+        DIGEST_GITHUB.render_into(buf, github)
+        DIGEST_REPO_ITEM.render_each(buf, github['repos'])
+    else:
+        buf.append("<b>💻 GitHub：</b>\n• 这段时间没有 GitHub 活动\n")
+    if digest.get('running'):
+        buf.append("\n")
+        DIGEST_RUNNING.render_into(buf, digest['running'])
+    return ''.join(buf)
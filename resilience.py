@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+数据源的时限、重试与熔断
+- 每份日报有一个总时限（REPORT_DEADLINE），各数据源的请求和重试都在剩余时间内完成，
+  上游再慢也不会把一份日报拖过这个时间
+- 重试间隔按指数退避，并在 [0, 退避上限] 内随机（full jitter），避免批量推送时所有请求同时重试
+- 每个数据源一个熔断器：连续失败 BREAKER_THRESHOLD 次后打开，之后 BREAKER_RESET 秒内直接跳过该数据源，
+  批量推送时一个上游故障不会拖慢所有接收者；到时间后放行一次试探请求，成功则恢复
+- 数据源超时或熔断时，用该数据源上次成功的结果（last good）兜底
+
+环境变量：
+    REPORT_DEADLINE     每份日报等待数据源的总时间（秒），默认 8
+    SOURCE_ATTEMPTS     每个数据源最多尝试次数，默认 3
+    BREAKER_THRESHOLD   连续失败多少次后熔断，默认 3
+    BREAKER_RESET       熔断后多少秒放行试探请求，默认 300
+    LAST_GOOD_DIR       上次成功结果的保存目录，默认 .cache/last_good
+    LAST_GOOD_TTL       上次成功结果的有效期（秒），默认 604800（7 天）
+"""
+
+import hashlib
+import os
+import random
+import time
+
+import metrics
+from report_cache import ReportCache
+
+REPORT_DEADLINE = float(os.getenv('REPORT_DEADLINE', '8'))
+SOURCE_ATTEMPTS = int(os.getenv('SOURCE_ATTEMPTS', '3'))
+BREAKER_THRESHOLD = int(os.getenv('BREAKER_THRESHOLD', '3'))
+BREAKER_RESET = float(os.getenv('BREAKER_RESET', '300'))
+LAST_GOOD_DIR = os.getenv('LAST_GOOD_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'last_good'))
+LAST_GOOD_TTL = float(os.getenv('LAST_GOOD_TTL', str(7 * 24 * 3600)))
+# 第一次重试前的退避上限（秒），之后每次翻倍
+RETRY_BASE_DELAY = 0.2
+# 单次请求的超时不超过这个值，剩余时间留给重试
+MAX_ATTEMPT_TIMEOUT = 10
+
+
+class UpstreamError(RuntimeError):
+    """上游返回了错误状态码；4xx（429 除外）是请求本身的问题，不重试也不计入熔断"""
+
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+    @property
+    def retryable(self):
+        return self.status_code is None or self.status_code == 429 or self.status_code >= 500
+
+
+class SourceUnavailable(Exception):
+    """数据源已熔断或时限已用完，没有发出请求"""
+
+
+class Deadline:
+    """一份日报的总时限"""
+
+    def __init__(self, budget=None):
+        self.budget = REPORT_DEADLINE if budget is None else budget
+        self.expires_at = time.monotonic() + self.budget
+
+    def remaining(self):
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self):
+        return self.remaining() <= 0
+
+
+class CircuitBreaker:
+    """连续失败 threshold 次后打开，reset_after 秒后半开放行一次试探请求"""
+
+    def __init__(self, name, threshold=BREAKER_THRESHOLD, reset_after=BREAKER_RESET):
+        self.name = name
+        self.threshold = threshold
+        self.reset_after = reset_after
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.reset_after:
+            return 'half_open'
+        return 'open'
+
+    def allow(self):
+        """是否放行这次请求；半开时只放行一个试探请求"""
+        state = self.state
+        if state == 'closed':
+            return True
+        if state == 'half_open' and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+
+    def release(self):
+        """试探请求没有结果就结束了（被取消），让下一个请求重新试探"""
+        self._probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self._probing or (self.opened_at is None and self.failures >= self.threshold):
+            print(f"⚡ 数据源 {self.name} 连续失败 {self.failures} 次，暂停请求 {self.reset_after:.0f} 秒")
+            metrics.inc('circuit_open', source=self.name)
+            self.opened_at = time.monotonic()
+        self._probing = False
+
+
+_breakers = {}
+
+
+def get_breaker(name):
+    """进程内每个数据源共用一个熔断器"""
+    breaker = _breakers.get(name)
+    if breaker is None:
+        breaker = _breakers[name] = CircuitBreaker(name)
+    return breaker
+
+
+def reset_breakers():
+    """清空所有熔断器（测试、基准测试之间使用）"""
+    _breakers.clear()
+
+
+async def call_with_retries(name, fetch, deadline=None, attempts=SOURCE_ATTEMPTS):
+    """在时限内调用数据源，失败时带抖动退避重试
+
+    fetch(timeout) 返回 awaitable；timeout 是这次尝试可用的秒数。
+    熔断或时限已用完时抛 SourceUnavailable；最后一次失败的异常原样抛出。
+    """
+    # asyncio 导入较慢，advanced_report.py --help 等路径不需要它
+    import asyncio
+
+    deadline = deadline or Deadline()
+    breaker = get_breaker(name)
+    for attempt in range(attempts):
+        # 先看时限：时限已用完时不能占用半开时唯一的试探名额
+        remaining = deadline.remaining()
+        if remaining <= 0:
+            raise SourceUnavailable(f"{name} 超出时限")
+        if not breaker.allow():
+            raise SourceUnavailable(f"{name} 已熔断")
+        try:
+            result = await asyncio.wait_for(fetch(min(remaining, MAX_ATTEMPT_TIMEOUT)), remaining)
+        except asyncio.TimeoutError:
+            metrics.inc('deadline_exceeded', source=name)
+            breaker.record_failure()
+            raise SourceUnavailable(f"{name} 在 {deadline.budget:g} 秒内没有返回")
+        except Exception as e:
+            if isinstance(e, UpstreamError) and not e.retryable:
+                # 上游正常响应了，只是这个请求本身有问题
+                breaker.record_success()
+                raise
+            breaker.record_failure()
+            if attempt == attempts - 1:
+                raise
+            # full jitter，且不睡过时限
+            delay = min(random.uniform(0, RETRY_BASE_DELAY * 2 ** attempt), deadline.remaining())
+            metrics.inc('retries', source=name)
+            await asyncio.sleep(delay)
+        except BaseException:
+            # 被取消（交互模式到了回复时限、常驻进程退出）不说明上游的好坏，
+            # 但半开时的试探名额必须归还，否则熔断器再也不会放行
+            breaker.release()
+            raise
+        else:
+            breaker.record_success()
+            return result
+
+
+def last_good_key(source, *parts):
+    return hashlib.sha256('|'.join(['last_good', source, *map(str, parts)]).encode('utf-8')).hexdigest()
+
+
+_last_good = None
+
+
+def get_last_good():
+    """各数据源上次成功结果的存储（与日报缓存同样的格式，有效期更长）"""
+    global _last_good
+    if _last_good is None:
+        _last_good = ReportCache(LAST_GOOD_DIR, ttl=LAST_GOOD_TTL, source='last_good')
+    return _last_good
+
+
+def set_last_good(cache):
+    """替换共享实例（测试、基准测试中指向临时目录）"""
+    global _last_good
+    _last_good = cache
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+跑步记录
+每次跑步追加一条定长记录 (日期序数, 距离 km, 用时秒) 到二进制日志，日志只追加不修改；
+文件就是一个 float64 数组，读取用 array.fromfile 一次完成。
+
+按日 / 周（ISO 周）/ 月 / 年的汇总保存在旁边的 JSON 文件里，追加时顺带更新，
+生成日报时读汇总是 O(1) 的字典查找，不会每次把几年的记录重新加一遍。
+汇总里记着已经计入的记录条数；与日志条数不一致时（例如写完日志后进程中断），
+只把多出来的尾部记录补进汇总。
+
+用法:
+    python run_log.py add 5.2 [32:10] [YYYY-MM-DD]   记录一次跑步（距离 km、用时、日期，默认今天）
+    python run_log.py stats [YYYY-MM-DD]             查看周/月/年汇总和目标进度
+    python run_log.py rebuild                        从日志重新计算汇总
+
+环境变量：
+    RUN_LOG_PATH   日志文件，默认 data/runs.bin；汇总文件为同名 .rollup.json
+"""
+
+import json
+import os
+from array import array
+from datetime import date
+
+RUN_LOG_PATH = os.getenv('RUN_LOG_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'runs.bin'))
+# 每条记录三个 float64：日期序数、距离、用时
+FIELDS = 3
+RECORD_SIZE = FIELDS * array('d').itemsize
+PERIODS = ('day', 'week', 'month', 'year')
+DEFAULT_GOALS = {'weekly_goal': 20, 'monthly_goal': 80, 'yearly_goal': 1000}
+
+
+def period_keys(day):
+    """一天所属的日/周/月/年汇总键"""
+    iso_year, iso_week, _ = day.isocalendar()
+    return {
+        'day': day.isoformat(),
+        'week': f"{iso_year}-W{iso_week:02d}",
+        'month': f"{day.year}-{day.month:02d}",
+        'year': str(day.year),
+    }
+
+
+def parse_duration(text):
+    """'32:10'、'1:02:03' 或分钟数 '32' 转换成秒"""
+    if not text:
+        return 0.0
+    parts = [float(part) for part in text.split(':')]
+    if len(parts) == 1:
+        return parts[0] * 60
+    seconds = 0.0
+    for part in parts:
+        seconds = seconds * 60 + part
+    return seconds
+
+
+def format_duration(seconds):
+    seconds = int(round(seconds))
+    hours, rest = divmod(seconds, 3600)
+    return f"{hours}:{rest // 60:02d}:{rest % 60:02d}" if hours else f"{rest // 60}:{rest % 60:02d}"
+
+
+class RunLog:
+    """只追加的跑步日志 + 增量维护的汇总"""
+
+    def __init__(self, path=RUN_LOG_PATH):
+        self.path = path
+        self.rollup_path = f"{os.path.splitext(path)[0]}.rollup.json"
+        self.rollup = None
+
+    def record_count(self):
+        """日志里完整记录的条数（忽略写了一半的尾部）"""
+        try:
+            return os.stat(self.path).st_size // RECORD_SIZE
+        except FileNotFoundError:
+            return 0
+
+    def read_records(self, start=0):
+        """从第 start 条开始读取记录，返回 [(date, 距离, 用时)]"""
+        count = self.record_count() - start
+        if count <= 0:
+            return []
+        values = array('d')
+        with open(self.path, 'rb') as f:
+            f.seek(start * RECORD_SIZE)
+            values.fromfile(f, count * FIELDS)
+        return [(date.fromordinal(int(values[i])), values[i + 1], values[i + 2])
+                for i in range(0, len(values), FIELDS)]
+
+    def load(self):
+        """读取汇总并补上还没计入的尾部记录"""
+        if self.rollup is None:
+            try:
+                with open(self.rollup_path, 'r', encoding='utf-8') as f:
+                    self.rollup = json.load(f)
+            except (FileNotFoundError, ValueError):
+                self.rollup = None
+            if self.rollup is None or self.rollup.get('records', 0) > self.record_count():
+                # 汇总缺失、损坏或比日志还新（日志被替换过），从头计算
+                self.rollup = self.empty_rollup()
+
+        tail = self.read_records(self.rollup['records'])
+        if tail:
+            for run in tail:
+                self._apply(*run)
+            self.save()
+        return self.rollup
+
+    @staticmethod
+    def empty_rollup():
+        rollup = {'records': 0, 'last_run_date': None}
+        rollup.update({period: {} for period in PERIODS})
+        return rollup
+
+    def _apply(self, day, distance, duration):
+        """把一条记录计入各个汇总：[距离, 用时, 次数]"""
+        for period, key in period_keys(day).items():
+            total = self.rollup[period].setdefault(key, [0.0, 0.0, 0])
+            total[0] += distance
+            total[1] += duration
+            total[2] += 1
+        self.rollup['records'] += 1
+        if self.rollup['last_run_date'] is None or day.isoformat() > self.rollup['last_run_date']:
+            self.rollup['last_run_date'] = day.isoformat()
+
+    def save(self):
+        """原子替换汇总文件"""
+        os.makedirs(os.path.dirname(os.path.abspath(self.rollup_path)), exist_ok=True)
+        tmp_path = f"{self.rollup_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.rollup, f, separators=(',', ':'))
+        os.replace(tmp_path, self.rollup_path)
+
+    def append(self, day, distance, duration=0.0):
+        """追加一次跑步并更新汇总"""
+        if distance <= 0:
+            raise ValueError("距离必须大于 0")
+        self.load()
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with open(self.path, 'ab') as f:
+            # 上次写了一半的记录截掉，保证记录对齐
+            size = f.tell()
+            if size % RECORD_SIZE:
+                f.truncate(size - size % RECORD_SIZE)
+            array('d', (float(day.toordinal()), float(distance), float(duration))).tofile(f)
+        self._apply(day, distance, duration)
+        self.save()
+
+    def rebuild(self):
+        """丢弃汇总，从日志重新计算"""
+        self.rollup = self.empty_rollup()
+        for run in self.read_records():
+            self._apply(*run)
+        self.save()
+        return self.rollup
+
+    def total(self, period, day):
+        """day 所在周期的 (距离, 用时, 次数)"""
+        rollup = self.load()
+        distance, duration, count = rollup[period].get(period_keys(day)[period], (0.0, 0.0, 0))
+        return distance, duration, count
+
+    def streak(self, day):
+        """截至 day（含）连续跑步的天数；day 当天还没跑时从前一天算起"""
+        days = self.load()['day']
+        current = day if day.isoformat() in days else date.fromordinal(day.toordinal() - 1)
+        streak = 0
+        while current.isoformat() in days:
+            streak += 1
+            current = date.fromordinal(current.toordinal() - 1)
+        return streak
+
+    def stats(self, day, goals=None):
+        """day（一般是今天）的跑步统计：昨天是否跑步、周/月/年距离和目标进度"""
+        goals = dict(DEFAULT_GOALS, **(goals or {}))
+        yesterday = date.fromordinal(day.toordinal() - 1)
+        week, month, year = (self.total(period, day)[0] for period in ('week', 'month', 'year'))
+        yesterday_distance = self.total('day', yesterday)[0]
+
+        def progress(value, goal):
+            return round(value / goal * 100, 1) if goal else 0.0
+
+        return {
+            'yesterday': yesterday_distance > 0,
+            'yesterday_distance': round(yesterday_distance, 2),
+            'week_distance': round(week, 2),
+            'month_distance': round(month, 2),
+            'year_distance': round(year, 2),
+            'weekly_goal': goals['weekly_goal'],
+            'monthly_goal': goals['monthly_goal'],
+            'yearly_goal': goals['yearly_goal'],
+            'week_progress': progress(week, goals['weekly_goal']),
+            'month_progress': progress(month, goals['monthly_goal']),
+            'year_progress': progress(year, goals['yearly_goal']),
+            'last_run_date': self.rollup['last_run_date'],
+        }
+
+
+_default_log = None
+
+
+def get_run_log():
+    """进程内共享的跑步日志"""
+    global _default_log
+    if _default_log is None:
+        _default_log = RunLog()
+    return _default_log
+
+
+def set_run_log(run_log):
+    """替换共享实例（测试中指向临时文件）"""
+    global _default_log
+    _default_log = run_log
+
+
+def load_goals(config_path=None):
+    """config.json 中 running 段的目标距离"""
+    config_path = config_path or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config.json')
+    try:
+        with open(config_path, 'r', encoding='utf-8') as f:
+            running = json.load(f).get('running', {})
+    except (FileNotFoundError, ValueError):
+        running = {}
+    return {key: running.get(key, value) for key, value in DEFAULT_GOALS.items()}
+
+
+if __name__ == '__main__':
+    import sys
+
+    run_log = get_run_log()
+    if len(sys.argv) >= 3 and sys.argv[1] == 'add':
+        distance = float(sys.argv[2])
+        duration = parse_duration(sys.argv[3]) if len(sys.argv) > 3 else 0.0
+        day = date.fromisoformat(sys.argv[4]) if len(sys.argv) > 4 else date.today()
+        run_log.append(day, distance, duration)
+        print(f"✅ 已记录 {day.isoformat()} {distance} km {format_duration(duration)}")
+    elif len(sys.argv) >= 2 and sys.argv[1] == 'stats':
+        day = date.fromisoformat(sys.argv[2]) if len(sys.argv) > 2 else date.today()
+        stats = run_log.stats(day, load_goals())
+        print(f"🏃 {day.isoformat()} 跑步统计（共 {run_log.rollup['records']} 条记录）")
+        print(f"   本周 {stats['week_distance']} / {stats['weekly_goal']} km ({stats['week_progress']}%)")
+        print(f"   本月 {stats['month_distance']} / {stats['monthly_goal']} km ({stats['month_progress']}%)")
+        print(f"   今年 {stats['year_distance']} / {stats['yearly_goal']} km ({stats['year_progress']}%)")
+        print(f"   上次跑步 {stats['last_run_date'] or '无'}")
+    elif len(sys.argv) >= 2 and sys.argv[1] == 'rebuild':
+        rollup = run_log.rebuild()
+        print(f"✅ 已从 {rollup['records']} 条记录重新计算汇总")
+    else:
+        print("用法:")
+        print("  python run_log.py add <km> [用时 MM:SS] [YYYY-MM-DD]")
+        print("  python run_log.py stats [YYYY-MM-DD]")
+        print("  python run_log.py rebuild")
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+发送日志（断点续发）
+每发完一份日报，在日志里追加一行 (chat, 日报日期, 天数, message_id)；
+进程中途退出后重新运行，已经发过的 chat 直接跳过，不会给所有人再发一遍。
+
+- 只追加的 JSON Lines 文件，最后一行写了一半（进程被杀）时忽略
+- 写入先进缓冲区，每 JOURNAL_FSYNC_EVERY 条或每 JOURNAL_FSYNC_INTERVAL 秒 fsync 一次，
+  不是每条都等磁盘；崩溃时最多丢最后一批记录，这些 chat 会被重发一次（至少一次，而不是全部重发）
+- 发送失败的日报连同正文记为死信，`python send_journal.py replay` 只补发这些，不需要重新生成所有日报
+- 打开时丢弃 JOURNAL_RETENTION_DAYS 天以前的记录，文件不会无限增长
+
+用法:
+    python send_journal.py status      查看今天已发送数和死信
+    python send_journal.py replay      补发死信
+    python send_journal.py clear       清空死信（放弃补发）
+
+环境变量：
+    SEND_JOURNAL_PATH         日志文件，默认 .cache/send_journal.jsonl
+    JOURNAL_FSYNC_EVERY       每多少条记录 fsync 一次，默认 50
+    JOURNAL_FSYNC_INTERVAL    最长多少秒 fsync 一次，默认 1
+    JOURNAL_RETENTION_DAYS    保留最近几天的记录，默认 7
+"""
+
+import json
+import os
+import time
+from datetime import date, timedelta
+
+SEND_JOURNAL_PATH = os.getenv('SEND_JOURNAL_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'send_journal.jsonl'))
+JOURNAL_FSYNC_EVERY = int(os.getenv('JOURNAL_FSYNC_EVERY', '50'))
+JOURNAL_FSYNC_INTERVAL = float(os.getenv('JOURNAL_FSYNC_INTERVAL', '1'))
+JOURNAL_RETENTION_DAYS = int(os.getenv('JOURNAL_RETENTION_DAYS', '7'))
+
+
+def entry_key(chat_id, report_date, days_back=1):
+    return str(chat_id), str(report_date), int(days_back)
+
+
+def message_ids(messages):
+    """Message 对象（或基准测试桩返回的 dict）列表 -> message_id 列表"""
+    ids = []
+    for message in messages or []:
+        ids.append(message.get('message_id') if isinstance(message, dict) else getattr(message, 'message_id', None))
+    return ids
+
+
+class SendJournal:
+    """按 (chat, 日报日期, 天数) 记录发送结果的追加日志"""
+
+    def __init__(self, path=SEND_JOURNAL_PATH, fsync_every=JOURNAL_FSYNC_EVERY,
+                 fsync_interval=JOURNAL_FSYNC_INTERVAL, retention_days=JOURNAL_RETENTION_DAYS):
+        self.path = path
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.retention_days = retention_days
+        # 键 -> 该键最新的一条记录
+        self.entries = {}
+        self.syncs = 0
+        self._file = None
+        self._unsynced = 0
+        self._synced_at = time.monotonic()
+        self.load()
+
+    def load(self):
+        """读取日志；丢弃过期记录时重写文件"""
+        self.entries = {}
+        lines = 0
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    lines += 1
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # 进程被杀时写了一半的最后一行
+                        continue
+                    self.entries[entry_key(entry['chat'], entry['date'], entry.get('days_back', 1))] = entry
+        except FileNotFoundError:
+            return
+        cutoff = (date.today() - timedelta(days=self.retention_days)).isoformat()
+        expired = [key for key, entry in self.entries.items() if entry['date'] < cutoff]
+        for key in expired:
+            del self.entries[key]
+        if expired or lines > len(self.entries):
+            self.compact()
+
+    def compact(self):
+        """每个键只保留最新一条记录，原子替换日志文件"""
+        self.close()
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for entry in self.entries.values():
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def is_done(self, chat_id, report_date, days_back=1):
+        entry = self.entries.get(entry_key(chat_id, report_date, days_back))
+        return entry is not None and entry['status'] == 'sent'
+
+    def record_sent(self, chat_id, report_date, ids, days_back=1):
+        self._append({'chat': str(chat_id), 'date': str(report_date), 'days_back': int(days_back),
+                      'status': 'sent', 'message_ids': ids, 'at': round(time.time(), 3)})
+
+    def record_failed(self, chat_id, report_date, error, text=None, days_back=1, recipient=None):
+        """记为死信；有正文时补发直接发送正文，否则补发时重新生成"""
+        entry = {'chat': str(chat_id), 'date': str(report_date), 'days_back': int(days_back),
+                 'status': 'failed', 'error': str(error)[:200], 'at': round(time.time(), 3)}
+        if text is not None:
+            entry['text'] = text
+        if recipient:
+            entry['recipient'] = {key: value for key, value in recipient.items() if key != 'chat_id'}
+        self._append(entry)
+
+    def dead_letters(self):
+        """发送失败、之后也没有成功的记录"""
+        return [entry for entry in self.entries.values() if entry['status'] == 'failed']
+
+    def discard_dead_letters(self):
+        """放弃补发：去掉所有死信"""
+        self.entries = {key: entry for key, entry in self.entries.items() if entry['status'] != 'failed'}
+        self.compact()
+
+    def _append(self, entry):
+        self.entries[entry_key(entry['chat'], entry['date'], entry['days_back'])] = entry
+        if self._file is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._file = open(self.path, 'a', encoding='utf-8')
+        self._file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        self._unsynced += 1
+        if self._unsynced >= self.fsync_every or time.monotonic() - self._synced_at >= self.fsync_interval:
+            self.sync()
+
+    def sync(self):
+        """把缓冲的记录写到磁盘（批量 fsync）"""
+        if self._file is None or not self._unsynced:
+            return
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.syncs += 1
+        self._unsynced = 0
+        self._synced_at = time.monotonic()
+
+    def close(self):
+        if self._file is not None:
+            self.sync()
+            self._file.close()
+            self._file = None
+
+
+_default_journal = None
+
+
+def get_send_journal():
+    """进程内共享的发送日志"""
+    global _default_journal
+    if _default_journal is None:
+        _default_journal = SendJournal()
+    return _default_journal
+
+
+def set_send_journal(journal):
+    """替换共享实例（测试中指向临时文件）"""
+    global _default_journal
+    _default_journal = journal
+
+
+async def replay_dead_letters(bot, journal=None):
+    """补发死信，返回 (成功数, 失败数)；没有正文的按记录的接收者信息重新生成"""
+    from advanced_report import DailyReportGenerator
+    from delivery import DeliveryQueue
+
+    journal = journal or get_send_journal()
+    sent = failed = 0
+    async with DeliveryQueue(bot, workers=1) as delivery:
+        for entry in journal.dead_letters():
+            recipient = entry.get('recipient') or {}
+            try:
+                text = entry.get('text')
+                if text is None:
+                    generator = DailyReportGenerator(username=recipient.get('github_username'), chat_id=entry['chat'],
+                                                     timezone=recipient.get('timezone'),
+                                                     report_date=date.fromisoformat(entry['date']))
+                    text = await generator.generate_report(entry['days_back'])
+                messages = await delivery.send(entry['chat'], text)
+            except Exception as e:
+                failed += 1
+                journal.record_failed(entry['chat'], entry['date'], e, text=entry.get('text'),
+                                      days_back=entry['days_back'], recipient=recipient)
+                print(f"❌ 补发到 {entry['chat']} 失败: {e}")
+            else:
+                sent += 1
+                journal.record_sent(entry['chat'], entry['date'], message_ids(messages), entry['days_back'])
+    journal.close()
+    return sent, failed
+
+
+if __name__ == '__main__':
+    import sys
+
+    journal = get_send_journal()
+    command = sys.argv[1] if len(sys.argv) > 1 else 'status'
+    if command == 'status':
+        today = date.today().isoformat()
+        sent_today = sum(1 for entry in journal.entries.values() if entry['status'] == 'sent' and entry['date'] == today)
+        print(f"📒 今天已发送 {sent_today} 份，死信 {len(journal.dead_letters())} 份")
+        for entry in journal.dead_letters():
+            print(f"   {entry['date']} {entry['chat']}: {entry['error']}")
+    elif command == 'replay':
+        import asyncio
+        from advanced_report import BOT_TOKEN
+        from bot_client import create_bot
+
+        async def run_replay():
+            bot = create_bot(BOT_TOKEN)
+            async with bot:
+                return await replay_dead_letters(bot, journal)
+
+        sent, failed = asyncio.run(run_replay())
+        print(f"✅ 补发完成: 成功 {sent}，失败 {failed}")
+    elif command == 'clear':
+        count = len(journal.dead_letters())
+        journal.discard_dead_letters()
+        print(f"🗑️ 已清空 {count} 份死信")
+    else:
+        print("用法:")
+        print("  python send_journal.py status")
+        print("  python send_journal.py replay")
+        print("  python send_journal.py clear")
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+多进程批量推送（按用户分片）
+接收者很多时，解析 GitHub 事件、日期/农历计算和模板渲染都是 CPU 密集的，
+单个事件循环只能用满一个核。这里把接收者分片交给进程池：
+- 每个工作进程有自己的事件循环和 HTTP 连接池，跨分片复用，连接保持预热
+- 同一个 GitHub 用户的接收者总在同一个分片里，事件同步、日报缓存不会在进程间重复或冲突
+- 分片生成完就送回主进程，由唯一的投递队列（delivery.py）发送，
+  限速、429 重试、同一 chat 保序仍然是全局的；渲染和发送同时进行
+- 发送日志（send_journal.py）只在主进程读写：启动时跳过已发送的 chat，失败的记为死信
+
+用法:
+    python sharded_fanout.py [recipients.json] [--processes N] [--workers N]
+
+环境变量：
+    FANOUT_PROCESSES   工作进程数，默认 CPU 核数
+    SHARD_SIZE         每个分片的接收者数，默认 200
+    FANOUT_WORKERS     每个工作进程内同时生成的日报数（与 fanout.py 相同）
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import multiprocessing.util
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import metrics
+from bot_client import create_bot
+from advanced_report import BOT_TOKEN
+from delivery import GLOBAL_RATE, GROUP_RATE, DeliveryQueue
+from fanout import FANOUT_WORKERS, load_recipients, make_generator, prefetch_github
+from http_pool import close_shared_client, get_shared_client
+from send_journal import get_send_journal, message_ids
+
+# --- 配置 ---
+FANOUT_PROCESSES = int(os.getenv('FANOUT_PROCESSES', str(os.cpu_count() or 1)))
+SHARD_SIZE = int(os.getenv('SHARD_SIZE', '200'))
+
+
+def make_shards(recipients, shard_size=SHARD_SIZE):
+    """按 GitHub 用户名分组后切成分片；同一个用户的接收者不会被拆到两个分片"""
+    by_user = {}
+    for recipient in recipients:
+        by_user.setdefault(recipient.get('github_username') or '', []).append(recipient)
+    shards = []
+    current = []
+    for group in by_user.values():
+        if current and len(current) + len(group) > shard_size:
+            shards.append(current)
+            current = []
+        current.extend(group)
+    if current:
+        shards.append(current)
+    return shards
+
+
+# --- 工作进程 ---
+# 每个工作进程一个事件循环，分片之间复用（连同循环上的 HTTP 连接池）
+_worker_loop = None
+_worker_client = None
+_worker_concurrency = FANOUT_WORKERS
+
+
+def _init_worker(concurrency, setup, client_factory):
+    """工作进程启动时调用：创建事件循环，执行 setup（如把缓存指向临时目录）"""
+    global _worker_loop, _worker_client, _worker_concurrency
+    _worker_concurrency = concurrency
+    if setup is not None:
+        setup()
+    _worker_loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(_worker_loop)
+    if client_factory is not None:
+        _worker_client = client_factory()
+    # 进程退出时关闭连接池
+    multiprocessing.util.Finalize(None, _close_worker, exitpriority=10)
+
+
+def _close_worker():
+    if _worker_loop is None or _worker_loop.is_closed():
+        return
+    if _worker_client is not None:
+        _worker_loop.run_until_complete(_worker_client.aclose())
+    _worker_loop.run_until_complete(close_shared_client())
+    _worker_loop.close()
+
+
+async def _render_shard(recipients):
+    client = _worker_client or get_shared_client()
+    await prefetch_github(recipients, client)
+    semaphore = asyncio.Semaphore(_worker_concurrency)
+
+    async def render(recipient):
+        async with semaphore:
+            try:
+                generator = make_generator(recipient, client)
+                return recipient['chat_id'], await generator.generate_report(recipient.get('github_days_back', 1)), None
+            except Exception as e:
+                return recipient['chat_id'], None, str(e)
+
+    return await asyncio.gather(*(render(recipient) for recipient in recipients))
+
+
+def render_shard(recipients):
+    """在工作进程中生成一个分片的日报，返回 [(chat_id, 日报, 错误)] 和本分片的渲染耗时"""
+    start = time.perf_counter()
+    results = _worker_loop.run_until_complete(_render_shard(recipients))
+    return results, time.perf_counter() - start
+
+
+class ShardedFanout:
+    """进程池生成日报 + 主进程统一投递"""
+
+    def __init__(self, bot, processes=FANOUT_PROCESSES, workers=FANOUT_WORKERS, shard_size=SHARD_SIZE,
+                 global_rate=GLOBAL_RATE, group_rate=GROUP_RATE, setup=None, client_factory=None, journal=None):
+        """
+        Args:
+            processes (int): 工作进程数
+            workers (int): 主进程的发送并发数，以及每个工作进程内同时生成的日报数
+            setup: 每个工作进程启动时调用的函数（必须可 pickle，测试和基准用来替换共享实例）
+            client_factory: 返回工作进程 HTTP 客户端的函数（必须可 pickle），默认用进程内共享连接池
+            journal (SendJournal): 发送日志；传入时跳过已发送的 chat，并记录发送结果和死信
+        """
+        self.bot = bot
+        self.processes = processes
+        self.workers = workers
+        self.shard_size = shard_size
+        self.setup = setup
+        self.client_factory = client_factory
+        self.journal = journal
+        self.delivery = DeliveryQueue(bot, workers=workers, global_rate=global_rate, group_rate=group_rate)
+        self.stats = {'sent': 0, 'failed': 0, 'retries': 0, 'skipped': 0}
+
+    def _record(self, recipient, report_date, report, future):
+        if self.journal is None:
+            return
+        days_back = recipient.get('github_days_back', 1)
+        if future.cancelled() or future.exception() is not None:
+            error = 'cancelled' if future.cancelled() else future.exception()
+            self.journal.record_failed(recipient['chat_id'], report_date, error, text=report,
+                                       days_back=days_back, recipient=recipient)
+        else:
+            self.journal.record_sent(recipient['chat_id'], report_date, message_ids(future.result()), days_back)
+
+    def _on_sent(self, future):
+        if future.cancelled() or future.exception() is not None:
+            self.stats['failed'] += 1
+            if not future.cancelled():
+                print(f"❌ 发送失败: {future.exception()}")
+        else:
+            self.stats['sent'] += 1
+
+    async def run(self, recipients):
+        """分片生成并发送给所有接收者，返回统计信息"""
+        start = time.monotonic()
+        report_dates = {}
+        pending = recipients
+        if self.journal is not None:
+            # 日报日期在主进程按接收者时区算好，工作进程只负责生成
+            report_dates = {id(recipient): make_generator(recipient).current_time.date() for recipient in recipients}
+            pending = [recipient for recipient in recipients
+                       if not self.journal.is_done(recipient['chat_id'], report_dates[id(recipient)],
+                                                   recipient.get('github_days_back', 1))]
+            self.stats['skipped'] = len(recipients) - len(pending)
+            if self.stats['skipped']:
+                print(f"⏭️ 发送日志中已有 {self.stats['skipped']} 个 chat 发送成功，跳过")
+        shards = make_shards(pending, self.shard_size)
+        processes = max(1, min(self.processes, len(shards)))
+        render_seconds = 0.0
+        sends = []
+        try:
+            if shards:
+                loop = asyncio.get_running_loop()
+                # spawn：工作进程不继承主进程的事件循环和连接
+                context = multiprocessing.get_context('spawn')
+                with ProcessPoolExecutor(max_workers=processes, mp_context=context, initializer=_init_worker,
+                                         initargs=(self.workers, self.setup, self.client_factory)) as executor:
+
+                    async def render(shard):
+                        results, seconds = await loop.run_in_executor(executor, render_shard, shard)
+                        return shard, results, seconds
+
+                    # 哪个分片先生成完就先发送
+                    for finished in asyncio.as_completed([render(shard) for shard in shards]):
+                        shard, results, seconds = await finished
+                        render_seconds += seconds
+                        for recipient, (chat_id, report, error) in zip(shard, results):
+                            report_date = report_dates.get(id(recipient))
+                            if error is not None:
+                                self.stats['failed'] += 1
+                                print(f"❌ 为 {chat_id} 生成日报失败: {error}")
+                                if self.journal is not None:
+                                    self.journal.record_failed(chat_id, report_date, error,
+                                                               days_back=recipient.get('github_days_back', 1),
+                                                               recipient=recipient)
+                                continue
+                            future = self.delivery.submit(chat_id, report)
+                            future.add_done_callback(partial(self._record, recipient, report_date, report))
+                            future.add_done_callback(self._on_sent)
+                            sends.append(future)
+        finally:
+            # 分片生成出错或被取消时，已提交的消息照样发完，发送日志照样落盘
+            await asyncio.gather(*sends, return_exceptions=True)
+            await self.delivery.close()
+            if self.journal is not None:
+                self.journal.close()
+        elapsed = time.monotonic() - start
+
+        metrics.observe('shard_render', render_seconds)
+        self.stats['retries'] = self.delivery.stats['retries']
+        self.stats['total'] = len(recipients)
+        self.stats['shards'] = len(shards)
+        self.stats['processes'] = processes
+        self.stats['elapsed'] = round(elapsed, 3)
+        self.stats['throughput'] = round(self.stats['sent'] / elapsed, 2) if elapsed > 0 else 0.0
+        return self.stats
+
+
+async def send_sharded(recipients, processes=FANOUT_PROCESSES, workers=FANOUT_WORKERS):
+    """多进程批量发送日报"""
+    sender = ShardedFanout(create_bot(BOT_TOKEN, connection_pool_size=workers), processes=processes,
+                           workers=workers, journal=get_send_journal())
+    try:
+        stats = await sender.run(recipients)
+    finally:
+        metrics.export_run()
+    print(f"✅ 批量推送完成: 成功 {stats['sent']}/{stats['total']}，失败 {stats['failed']}，"
+          f"跳过 {stats['skipped']}，重试 {stats['retries']} 次")
+    if stats['failed']:
+        print("📮 失败的日报已记为死信，可用 python send_journal.py replay 补发")
+    print(f"📈 {stats['processes']} 个进程、{stats['shards']} 个分片，耗时 {stats['elapsed']} 秒，"
+          f"吞吐量 {stats['throughput']} 条/秒")
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='多进程批量推送日报')
+    parser.add_argument('recipients', nargs='?', help='接收者 JSON 文件，默认使用 config.json 中的 recipients')
+    parser.add_argument('--processes', type=int, default=FANOUT_PROCESSES, help='工作进程数，默认 CPU 核数')
+    parser.add_argument('--workers', type=int, default=FANOUT_WORKERS, help='发送并发数')
+    args = parser.parse_args()
+
+    recipients = load_recipients(args.recipients)
+    if not recipients:
+        print("❌ 没有找到接收者，请在 config.json 中配置 recipients 或传入 JSON 文件")
+        return 1
+    asyncio.run(send_sharded(recipients, args.processes, args.workers))
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
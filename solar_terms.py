@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+二十四节气计算
+按太阳视黄经计算每个节气的精确时刻（北京时间），每年只计算一次并缓存成查找表。
+
+太阳位置使用截断的 VSOP87 地球黄经级数（精度约 1 角秒），
+再加上章动、光行差修正；时间换算考虑了 ΔT（力学时与世界时之差）。
+"""
+
+import bisect
+import math
+from datetime import date, datetime, timedelta
+
+# 从小寒（黄经 285°）开始，按公历年内的顺序排列
+SOLAR_TERM_NAMES = [
+    "小寒", "大寒", "立春", "雨水", "惊蛰", "春分",
+    "清明", "谷雨", "立夏", "小满", "芒种", "夏至",
+    "小暑", "大暑", "立秋", "处暑", "白露", "秋分",
+    "寒露", "霜降", "立冬", "小雪", "大雪", "冬至",
+]
+
+J2000 = 2451545.0
+TROPICAL_YEAR = 365.2422
+# 北京时间相对 UTC 的偏移（天）
+CST_OFFSET = 8 / 24
+
+# VSOP87 地球日心黄经级数（截断），每项为 (A, B, C)，值为 A * cos(B + C * tau)
+_L0 = [
+    (175347046, 0, 0), (3341656, 4.6692568, 6283.07585), (34894, 4.6261, 12566.1517),
+    (3497, 2.7441, 5753.3849), (3418, 2.8289, 3.5231), (3136, 3.6277, 77713.7715),
+    (2676, 4.4181, 7860.4194), (2343, 6.1352, 3930.2097), (1324, 0.7425, 11506.7698),
+    (1273, 2.0371, 529.691), (1199, 1.1096, 1577.3435), (990, 5.233, 5884.927),
+    (902, 2.045, 26.298), (857, 3.508, 398.149), (780, 1.179, 5223.694),
+    (753, 2.533, 5507.553), (505, 4.583, 18849.228), (492, 4.205, 775.523),
+    (357, 2.92, 0.067), (317, 5.849, 11790.629), (284, 1.899, 796.298),
+    (271, 0.315, 10977.079), (243, 0.345, 5486.778), (206, 4.806, 2544.314),
+    (205, 1.869, 5573.143), (202, 2.458, 6069.777), (156, 0.833, 213.299),
+    (132, 3.411, 2942.463), (126, 1.083, 20.775), (115, 0.645, 0.98),
+    (103, 0.636, 4694.003), (102, 0.976, 15720.839), (102, 4.267, 7.114),
+    (99, 6.21, 2146.17), (98, 0.68, 155.42), (86, 5.98, 161000.69),
+    (85, 1.3, 6275.96), (85, 3.67, 71430.7), (80, 1.81, 17260.15),
+    (79, 3.04, 12036.46), (75, 1.76, 5088.63), (74, 3.5, 3154.69),
+    (74, 4.68, 801.82), (70, 0.83, 9437.76), (62, 3.98, 8827.39),
+    (61, 1.82, 7084.9), (57, 2.78, 6286.6), (56, 4.39, 14143.5),
+    (56, 3.47, 6279.55), (52, 0.19, 12139.55), (52, 1.33, 1748.02),
+    (51, 0.28, 5856.48), (49, 0.49, 1194.45), (41, 5.37, 8429.24),
+    (41, 2.4, 19651.05), (39, 6.17, 10447.39), (37, 6.04, 10213.29),
+    (37, 2.57, 1059.38), (36, 1.71, 2352.87), (36, 1.78, 6812.77),
+    (33, 0.59, 17789.85), (30, 0.44, 83996.85), (30, 2.74, 1349.87),
+    (25, 3.16, 4690.48),
+]
+_L1 = [
+    (628331966747, 0, 0), (206059, 2.678235, 6283.07585), (4303, 2.6351, 12566.1517),
+    (425, 1.59, 3.523), (119, 5.796, 26.298), (109, 2.966, 1577.344),
+    (93, 2.59, 18849.23), (72, 1.14, 529.69), (68, 1.87, 398.15),
+    (67, 4.41, 5507.55), (59, 2.89, 5223.69), (56, 2.17, 155.42),
+    (45, 0.4, 796.3), (36, 0.47, 775.52), (29, 2.65, 7.11),
+    (21, 5.34, 0.98), (19, 1.85, 5486.78), (19, 4.97, 213.3),
+    (17, 2.99, 6275.96), (16, 0.03, 2544.31), (16, 1.43, 2146.17),
+    (15, 1.21, 10977.08), (12, 2.83, 1748.02), (12, 3.26, 5088.63),
+    (12, 5.27, 1194.45), (12, 2.08, 4694.0), (11, 0.77, 553.57),
+    (10, 1.3, 6286.6), (10, 4.24, 1349.87), (9, 2.7, 242.73),
+    (9, 5.64, 951.72), (8, 5.3, 2352.87), (6, 2.65, 9437.76),
+    (6, 4.67, 4690.48),
+]
+_L2 = [
+    (52919, 0, 0), (8720, 1.0721, 6283.0758), (309, 0.867, 12566.152),
+    (27, 0.05, 3.52), (16, 5.19, 26.3), (16, 3.68, 155.42),
+    (10, 0.76, 18849.23), (9, 2.06, 77713.77), (7, 0.83, 775.52),
+    (5, 4.66, 1577.34), (4, 1.03, 7.11), (4, 3.44, 5573.14),
+    (3, 5.14, 796.3), (3, 6.05, 5507.55), (3, 1.19, 242.73),
+    (3, 6.12, 529.69), (3, 0.31, 398.15), (3, 2.28, 553.57),
+    (2, 4.38, 5223.69), (2, 3.75, 0.98),
+]
+_L3 = [
+    (289, 5.844, 6283.076), (35, 0, 0), (17, 5.49, 12566.15),
+    (3, 5.2, 155.42), (1, 4.72, 3.52), (1, 5.3, 18849.23),
+    (1, 5.97, 242.73),
+]
+_L4 = [(114, 3.142, 0), (8, 4.13, 6283.08), (1, 3.84, 12566.15)]
+_L5 = [(1, 3.14, 0)]
+
+# 每年的节气表：year -> ([日序号, ...], [节气名, ...])，以及按日序号的快速查找
+_year_tables = {}
+_day_lookup = {}
+
+
+def _series(terms, tau):
+    return sum(a * math.cos(b + c * tau) for a, b, c in terms)
+
+
+def sun_apparent_longitude(jde):
+    """太阳视黄经（度），jde 为儒略历书日（力学时）"""
+    tau = (jde - J2000) / 365250.0
+    series = [_L0, _L1, _L2, _L3, _L4, _L5]
+    heliocentric = sum(_series(terms, tau) * tau ** i for i, terms in enumerate(series)) / 1e8
+    longitude = math.degrees(heliocentric) + 180.0
+
+    t = tau * 10
+    # 转换到 FK5 坐标系
+    longitude -= 0.09033 / 3600
+    # 章动（低精度公式）
+    omega = math.radians(125.04452 - 1934.136261 * t)
+    sun_mean = math.radians(280.4665 + 36000.7698 * t)
+    moon_mean = math.radians(218.3165 + 481267.8813 * t)
+    nutation = (-17.20 * math.sin(omega) - 1.32 * math.sin(2 * sun_mean)
+                - 0.23 * math.sin(2 * moon_mean) + 0.21 * math.sin(2 * omega))
+    # 光行差，日地距离用平近点角近似
+    anomaly = math.radians(357.52911 + 35999.05029 * t)
+    distance = 1.000140 - 0.016708 * math.cos(anomaly) - 0.000139 * math.cos(2 * anomaly)
+    aberration = -20.4898 / distance
+    return (longitude + (nutation + aberration) / 3600) % 360
+
+
+def delta_t(year):
+    """ΔT = TT - UT（秒），Espenak & Meeus 多项式，适用于 1860-2150"""
+    if year < 1900:
+        t = year - 1860
+        return 7.62 + 0.5737 * t - 0.251754 * t ** 2 + 0.01680668 * t ** 3 - 0.0004473624 * t ** 4 + t ** 5 / 233174
+    if year < 1920:
+        t = year - 1900
+        return -2.79 + 1.494119 * t - 0.0598939 * t ** 2 + 0.0061966 * t ** 3 - 0.000197 * t ** 4
+    if year < 1941:
+        t = year - 1920
+        return 21.20 + 0.84493 * t - 0.076100 * t ** 2 + 0.0020936 * t ** 3
+    if year < 1961:
+        t = year - 1950
+        return 29.07 + 0.407 * t - t ** 2 / 233 + t ** 3 / 2547
+    if year < 1986:
+        t = year - 1975
+        return 45.45 + 1.067 * t - t ** 2 / 260 - t ** 3 / 718
+    if year < 2005:
+        t = year - 2000
+        return (63.86 + 0.3345 * t - 0.060374 * t ** 2 + 0.0017275 * t ** 3
+                + 0.000651814 * t ** 4 + 0.00002373599 * t ** 5)
+    if year < 2050:
+        t = year - 2000
+        return 62.92 + 0.32217 * t + 0.005589 * t ** 2
+    return -20 + 32 * ((year - 1820) / 100) ** 2 - 0.5628 * (2150 - year)
+
+
+def solar_term_jde(year, longitude):
+    """太阳视黄经到达 longitude 度的时刻（儒略历书日）"""
+    # 1 月 1 日附近太阳黄经约为 280°，以此估算初值
+    jde = J2000 + (year - 2000) * TROPICAL_YEAR + ((longitude - 280.0) % 360) / 360 * TROPICAL_YEAR
+    for _ in range(10):
+        diff = (longitude - sun_apparent_longitude(jde) + 180) % 360 - 180
+        jde += diff * TROPICAL_YEAR / 360
+        if abs(diff) < 1e-6:
+            break
+    return jde
+
+
+def solar_term_time(year, index):
+    """某年第 index 个节气（0 = 小寒）的北京时间"""
+    longitude = (285 + 15 * index) % 360
+    jde = solar_term_jde(year, longitude)
+    jd_utc = jde - delta_t(year + index / 24) / 86400
+    return datetime(2000, 1, 1, 12) + timedelta(days=jd_utc - J2000 + CST_OFFSET)
+
+
+def _year_table(year):
+    if year not in _year_tables:
+        ordinals = [solar_term_time(year, i).date().toordinal() for i in range(len(SOLAR_TERM_NAMES))]
+        _year_tables[year] = (ordinals, SOLAR_TERM_NAMES)
+        _day_lookup[year] = dict(zip(ordinals, SOLAR_TERM_NAMES))
+    return _year_tables[year]
+
+
+def solar_terms_of_year(year):
+    """某年 24 个节气的日期表 [(date, 节气名), ...]，按年缓存"""
+    ordinals, names = _year_table(year)
+    return [(date.fromordinal(ordinal), name) for ordinal, name in zip(ordinals, names)]
+
+
+def get_solar_term(day):
+    """如果 day 当天是节气，返回节气名，否则返回空字符串"""
+    if day.year not in _day_lookup:
+        _year_table(day.year)
+    return _day_lookup[day.year].get(day.toordinal(), "")
+
+
+def next_solar_term(day):
+    """下一个节气（不含当天），返回 (节气名, 日期, 还有几天)"""
+    ordinal = day.toordinal()
+    ordinals, names = _year_table(day.year)
+    index = bisect.bisect_right(ordinals, ordinal)
+    if index == len(ordinals):
+        ordinals, names = _year_table(day.year + 1)
+        index = 0
+    return names[index], date.fromordinal(ordinals[index]), ordinals[index] - ordinal
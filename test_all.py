@@ -7,6 +7,7 @@ import asyncio
 import os
 import sys
 import json
+import time
 from datetime import datetime
 
 # 添加当前目录到路径
@@ -16,10 +17,10 @@ async def test_basic_bot():
     """测试基本的 Bot 连接"""
     print("🤖 测试 Bot 连接...")
     try:
-        from telegram import Bot
+        from bot_client import create_bot
         
         bot_token = os.getenv('BOT_TOKEN', "8226079704:AAHuBWHZphave2xwU_A6ELI3M3IsZOfwZQ4")
-        bot = Bot(token=bot_token)
+        bot = create_bot(bot_token)
         
         bot_info = await bot.get_me()
         print(f"✅ Bot 连接成功: {bot_info.first_name} (@{bot_info.username})")
@@ -55,7 +56,7 @@ async def test_github_api():
     print("\n📊 测试 GitHub API...")
     
     try:
-        import requests
+        from http_pool import get_shared_client
         
         username = os.getenv('GH_USERNAME', '')
         if not username:
@@ -71,13 +72,13 @@ async def test_github_api():
             print("⚠️ 未设置 GitHub 用户名，跳过测试")
             return True
         
-        headers = {'User-Agent': 'Daily-Report-Bot'}
+        headers = {}
         github_token = os.getenv('GITHUB_TOKEN', '')
         if github_token:
             headers['Authorization'] = f'token {github_token}'
         
         url = f"https://api.github.com/users/{username}/events"
-        response = requests.get(url, headers=headers, timeout=10)
+        response = await get_shared_client().get(url, headers=headers, timeout=10)
         
         if response.status_code == 200:
             events = response.json()
@@ -93,6 +94,1423 @@ async def test_github_api():
         print(f"❌ GitHub API 测试失败: {e}")
         return False
 
+def test_lunar_calendar():
+    """测试离线农历换算（与参考表对照）"""
+    print("\n🏮 测试农历换算...")
+    
+    try:
+        from datetime import date
+        from lunar_calendar import solar_to_lunar, lunar_to_solar, format_lunar
+        
+        # 公历日期 -> (农历年, 月, 日, 是否闰月, 干支)
+        reference = {
+            date(1900, 1, 31): (1900, 1, 1, False, '庚子'),
+            date(1999, 12, 31): (1999, 11, 24, False, '己卯'),
+            date(2000, 2, 5): (2000, 1, 1, False, '庚辰'),
+            date(2020, 5, 23): (2020, 4, 1, True, '庚子'),
+            date(2023, 3, 22): (2023, 2, 1, True, '癸卯'),
+            date(2024, 2, 10): (2024, 1, 1, False, '甲辰'),
+            date(2024, 10, 1): (2024, 8, 29, False, '甲辰'),
+            date(2025, 1, 29): (2025, 1, 1, False, '乙巳'),
+            date(2025, 7, 25): (2025, 6, 1, True, '乙巳'),
+            date(2026, 10, 18): (2026, 9, 9, False, '丙午'),
+            date(2033, 12, 22): (2033, 11, 1, True, '癸丑'),
+            date(2100, 2, 9): (2100, 1, 1, False, '庚申'),
+        }
+        
+        failed = 0
+        for solar, expected in reference.items():
+            lunar = solar_to_lunar(solar)
+            actual = (lunar['year'], lunar['month'], lunar['day'], lunar['is_leap'], lunar['ganzhi'])
+            if actual != expected:
+                print(f"   ❌ {solar}: 期望 {expected}，实际 {actual}")
+                failed += 1
+            elif lunar_to_solar(*expected[:4]) != solar:
+                print(f"   ❌ {solar}: 农历转公历结果不一致")
+                failed += 1
+        
+        if failed:
+            return False
+        print(f"✅ 农历换算正确 ({len(reference)} 个参考日期)")
+        print(f"   示例: {format_lunar(date(2025, 7, 25))}")
+        return True
+        
+    except Exception as e:
+        print(f"❌ 农历换算测试失败: {e}")
+        return False
+
+def test_solar_terms():
+    """测试节气计算（与 2025 年历书对照）"""
+    print("\n🌸 测试节气计算...")
+    
+    try:
+        from datetime import date
+        from solar_terms import solar_terms_of_year, get_solar_term, next_solar_term
+        
+        # 2025 年各节气的公历日期（月, 日）
+        reference = [
+            (1, 5), (1, 20), (2, 3), (2, 18), (3, 5), (3, 20),
+            (4, 4), (4, 20), (5, 5), (5, 21), (6, 5), (6, 21),
+            (7, 7), (7, 22), (8, 7), (8, 23), (9, 7), (9, 23),
+            (10, 8), (10, 23), (11, 7), (11, 22), (12, 7), (12, 21),
+        ]
+        
+        actual = [(d.month, d.day) for d, _ in solar_terms_of_year(2025)]
+        if actual != reference:
+            print(f"❌ 节气日期不一致: {actual}")
+            return False
+        if get_solar_term(date(2025, 12, 21)) != "冬至" or get_solar_term(date(2025, 12, 22)):
+            print("❌ 节气当天查找错误")
+            return False
+        if next_solar_term(date(2025, 12, 21)) != ("小寒", date(2026, 1, 5), 15):
+            print("❌ 跨年查找下一个节气错误")
+            return False
+        
+        print("✅ 节气计算正确 (2025 年 24 个节气)")
+        return True
+        
+    except Exception as e:
+        print(f"❌ 节气计算测试失败: {e}")
+        return False
+
+def test_report_template():
+    """测试模板渲染的 HTML 转义"""
+    print("\n🧩 测试模板渲染...")
+    
+    try:
+        from report_template import Template
+        
+        template = Template("• {action} PR: {title} ({repo}) {note|raw}\n")
+        text = template.render({
+            'action': '创建了',
+            'title': 'Fix a < b && c > d',
+            'repo': 'user/repo',
+            'note': '<b>ok</b>'
+        })
+        expected = "• 创建了 PR: Fix a &lt; b &amp;&amp; c &gt; d (user/repo) <b>ok</b>\n"
+        if text != expected:
+            print(f"❌ 渲染结果不正确: {text!r}")
+            return False
+        
+        # 非字符串字段、含 { } 和引号的字面文本、整个列表一次渲染
+        items = Template('{n} "{{x}}" {name}\n')
+        buf = []
+        items.render_each(buf, [{'n': 1, 'name': 'a<b'}, {'n': 2.5, 'name': 'c'}])
+        if ''.join(buf) != '1 "{x}" a&lt;b\n2.5 "{x}" c\n':
+            print(f"❌ 列表渲染结果不正确: {''.join(buf)!r}")
+            return False
+        
+        print("✅ 模板渲染与转义正确")
+        return True
+        
+    except Exception as e:
+        print(f"❌ 模板渲染测试失败: {e}")
+        return False
+
+def test_poem_rotation():
+    """测试诗词库构建和不重复轮转"""
+    print("\n📜 测试诗词轮转...")
+    
+    try:
+        import tempfile
+        from datetime import timedelta
+        from poem_corpus import BUILTIN_POEMS, EPOCH, PoemCorpus, build_corpus, pick_poem
+        
+        with tempfile.TemporaryDirectory() as directory:
+            build_corpus(BUILTIN_POEMS, directory)
+            corpus = PoemCorpus(directory)
+            size = len(corpus)
+            
+            # 一个完整轮次内，每首诗恰好出现一次
+            start = EPOCH + timedelta(days=size * 100)
+            picked = [pick_poem('-1001', start + timedelta(days=i), corpus=corpus)['content']
+                      for i in range(size)]
+            if sorted(picked) != sorted(poem['content'] for poem in BUILTIN_POEMS):
+                print("❌ 一轮之内出现了重复的诗词")
+                return False
+            
+            # 同一个 (chat, 日期) 结果固定
+            if pick_poem('-1001', start, corpus=corpus) != pick_poem('-1001', start, corpus=corpus):
+                print("❌ 同一天选诗结果不固定")
+                return False
+            
+            # 按作者筛选
+            if pick_poem('-1001', start, author='杜牧', corpus=corpus)['author'] != '杜牧':
+                print("❌ 按作者筛选失败")
+                return False
+            
+            # 空记录不能覆盖已有的诗词库
+            try:
+                build_corpus([], directory)
+                print("❌ 空记录也构建了诗词库")
+                return False
+            except ValueError:
+                pass
+            if len(PoemCorpus(directory)) != size:
+                print("❌ 构建空诗词库破坏了已有的诗词库")
+                return False
+        
+        print(f"✅ 诗词轮转正确 ({size} 首一轮不重复)")
+        return True
+        
+    except Exception as e:
+        print(f"❌ 诗词轮转测试失败: {e}")
+        return False
+
+def test_metrics_export():
+    """测试指标记录与导出"""
+    print("\n📈 测试指标导出...")
+    
+    try:
+        import tempfile
+        from metrics import Metrics
+        
+        registry = Metrics()
+        with registry.span('github_activity'):
+            pass
+        try:
+            with registry.span('render'):
+                raise ValueError('boom')
+        except ValueError:
+            pass
+        registry.inc('requests', source='github')
+        registry.inc('bytes', 512, source='github')
+        
+        text = registry.to_prometheus({'http_requests': 1})
+        for line in ('daily_report_github_activity_seconds_count 1',
+                     'daily_report_render_seconds_count 1',
+                     'daily_report_errors_total{span="render"} 1',
+                     'daily_report_bytes_total{source="github"} 512',
+                     'daily_report_http_requests 1'):
+            if line not in text:
+                print(f"❌ Prometheus 输出缺少: {line}")
+                return False
+        
+        import metrics
+        with tempfile.TemporaryDirectory() as directory:
+            written = metrics.export_run(directory, 'prometheus,jsonl')
+            if len(written) != 2 or not all(os.path.exists(path) for path in written):
+                print("❌ 指标文件未写入")
+                return False
+            with open(written[1], 'r', encoding='utf-8') as f:
+                json.loads(f.readline())
+        
+        print("✅ 指标记录与导出正确")
+        return True
+        
+    except Exception as e:
+        print(f"❌ 指标导出测试失败: {e}")
+        return False
+
+async def test_fake_telegram():
+    """测试本地 Bot API 替身（getMe、sendMessage、editMessageText、sendPhoto、getUpdates、429 注入）"""
+    print("\n🧪 测试 Bot API 替身...")
+    
+    try:
+        from telegram.error import RetryAfter
+        from bot_client import create_bot
+        from fake_telegram import FAKE_TOKEN, FakeTelegramServer
+        
+        async with FakeTelegramServer() as server:
+            bot = create_bot(FAKE_TOKEN, base_url=server.base_url)
+            async with bot:
+                me = await bot.get_me()
+                message = await bot.send_message(chat_id=-1001, text='<b>hi</b>', parse_mode='HTML')
+                edited = await bot.edit_message_text('edited', chat_id=-1001, message_id=message.message_id)
+                photo = await bot.send_photo(chat_id=42, photo=b'\x89PNG fake', caption='chart')
+                server.push_update(42, '/start')
+                updates = await bot.get_updates()
+                
+                server.fail_next(error_code=429, retry_after=3)
+                try:
+                    await bot.send_message(chat_id=42, text='limited')
+                    print("❌ 没有触发 429")
+                    return False
+                except RetryAfter as e:
+                    retry_after = e.retry_after
+        
+        if (me.username != 'fake_daily_bot' or message.chat.type != 'supergroup' or edited.text != 'edited'
+                or not photo.photo or updates[0].message.text != '/start' or retry_after != 3):
+            print("❌ 替身返回的数据不正确")
+            return False
+        
+        print(f"✅ Bot API 替身正常 ({server.stats['requests']} 个请求，{server.stats['rate_limited']} 次 429)")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Bot API 替身测试失败: {e}")
+        return False
+
+async def test_fanout_sender():
+    """测试批量推送：全局令牌桶限速、429 (RetryAfter) 后重试、没有接收者时预取不出错"""
+    print("\n📨 测试批量推送...")
+
+    try:
+        import tempfile
+        import time
+        import httpx
+        import resilience
+        from bot_client import create_bot
+        from event_store import EventStore, set_event_store
+        from fake_telegram import FAKE_TOKEN, FakeTelegramServer
+        from fanout import FanoutSender, prefetch_github
+        from github_cache import GitHubResponseCache, set_default_cache
+        from github_graphql import GraphQLContributionSource, set_graphql_source
+        from report_cache import ReportCache, set_report_cache
+
+        def handler(request):
+            return httpx.Response(200, json=[])
+
+        recipients = [{'chat_id': str(3000 + i), 'github_username': f"user{i % 4}"} for i in range(20)]
+        with tempfile.TemporaryDirectory() as directory:
+            set_default_cache(GitHubResponseCache(os.path.join(directory, 'github')))
+            set_report_cache(ReportCache(os.path.join(directory, 'reports')))
+            set_event_store(EventStore(':memory:'))
+            resilience.set_last_good(ReportCache(os.path.join(directory, 'last_good'), source='last_good'))
+            client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+            try:
+                set_graphql_source(GraphQLContributionSource('test-token'))
+                if await prefetch_github([]) != 0:
+                    print("❌ 没有接收者时不应发出请求")
+                    return False
+                set_graphql_source(None)
+
+                async with FakeTelegramServer() as server:
+                    bot = create_bot(FAKE_TOKEN, base_url=server.base_url)
+                    async with bot:
+                        # 每秒 10 条：前 10 条用掉桶里的令牌，后 10 条按速率放行
+                        server.fail_next(1, error_code=429, retry_after=1)
+                        sender = FanoutSender(bot, workers=8, global_rate=10, group_rate=1e9, http_client=client)
+                        start = time.monotonic()
+                        stats = await sender.run(recipients)
+                        elapsed = time.monotonic() - start
+                    chats = sorted(message['chat']['id'] for message in server.messages)
+            finally:
+                await client.aclose()
+                set_graphql_source(None)
+                set_default_cache(None)
+                set_report_cache(None)
+                set_event_store(None)
+                resilience.set_last_good(None)
+
+        if stats['sent'] != len(recipients) or stats['failed'] or chats != sorted(int(r['chat_id']) for r in recipients):
+            print(f"❌ 批量推送结果不正确: {stats}")
+            return False
+        if stats['retries'] != 1 or server.stats['rate_limited'] != 1:
+            print(f"❌ 429 没有按 retry_after 重试: {stats}")
+            return False
+        if elapsed < 0.9:
+            print(f"❌ 没有限速: 20 条消息用了 {elapsed:.2f} 秒")
+            return False
+
+        print(f"✅ 批量推送正确 (每秒 10 条限速下 {elapsed:.2f} 秒发完 20 条，429 重试 1 次)")
+        return True
+
+    except Exception as e:
+        print(f"❌ 批量推送测试失败: {e}")
+        return False
+
+async def test_daemon_schedule():
+    """测试常驻进程的时区计算和堆调度"""
+    print("\n🕘 测试常驻进程调度...")
+    
+    try:
+        from datetime import timezone
+        from zoneinfo import ZoneInfo
+        from daemon import ReportScheduler, next_fire_time
+        
+        # 纽约夏令时结束当天 (2025-11-02)，09:00 仍是当地 09:00
+        after = datetime(2025, 11, 2, 0, 0, tzinfo=ZoneInfo('America/New_York')).timestamp()
+        fire_at = datetime.fromtimestamp(next_fire_time('09:00', 'America/New_York', after), timezone.utc)
+        if fire_at != datetime(2025, 11, 2, 14, 0, tzinfo=timezone.utc):
+            print(f"❌ 夏令时切换日计算错误: {fire_at}")
+            return False
+        
+        class StubSender:
+            workers = 1
+        
+        scheduler = ReportScheduler(StubSender())
+        scheduler.update([
+            {'chat_id': '1', 'send_time': '09:00', 'timezone': 'Asia/Shanghai'},
+            {'chat_id': '2', 'send_time': '09:00', 'timezone': 'Europe/London'},
+        ])
+        # 运行中修改计划：旧条目留在堆里，但会被跳过
+        scheduler.update([
+            {'chat_id': '1', 'send_time': '09:00', 'timezone': 'Asia/Shanghai'},
+            {'chat_id': '2', 'send_time': '09:00', 'timezone': 'Pacific/Auckland'},
+        ])
+        plans = scheduler.upcoming()
+        if len(plans) != 2 or scheduler.recipients['2']['timezone'] != 'Pacific/Auckland' or len(scheduler.heap) != 3:
+            print("❌ 运行中修改计划失败")
+            return False
+        
+        # 每一批发送导出的是这一批的指标，不是进程启动以来的累计
+        import metrics
+        
+        class CountingSender:
+            workers = 1
+            stats = {'sent': 0, 'failed': 0}
+            
+            async def deliver(self, recipient):
+                metrics.inc('requests', source='github')
+        
+        exported = []
+        export_run = metrics.export_run
+        metrics.export_run = lambda *args, **kwargs: exported.append(metrics.metrics.snapshot()['counters'])
+        try:
+            scheduler = ReportScheduler(CountingSender())
+            recipient = {'chat_id': '1', 'send_time': '09:00', 'timezone': 'Asia/Shanghai'}
+            await scheduler.fire(recipient)
+            await scheduler.fire(recipient)
+        finally:
+            metrics.export_run = export_run
+        if [[counter['value'] for counter in counters] for counters in exported] != [[1], [1]]:
+            print(f"❌ 常驻进程导出的指标跨批累计: {exported}")
+            return False
+        
+        print("✅ 常驻进程调度正确")
+        return True
+        
+    except Exception as e:
+        print(f"❌ 常驻进程调度测试失败: {e}")
+        return False
+
+async def test_github_cache():
+    """测试 GitHub 条件请求缓存：带 If-None-Match 重新请求，304 返回缓存内容，命中统计正确"""
+    print("\n🗄️ 测试 GitHub 条件请求缓存...")
+    
+    try:
+        import tempfile
+        import httpx
+        from github_cache import GitHubResponseCache
+        
+        url = 'https://api.github.com/users/octocat/events'
+        events = [{'id': '1', 'type': 'PushEvent'}]
+        conditions = []
+        
+        def handler(request):
+            conditions.append(request.headers.get('If-None-Match'))
+            if request.headers.get('If-None-Match') == '"v1"':
+                return httpx.Response(304)
+            return httpx.Response(200, json=events, headers={'ETag': '"v1"'})
+        
+        with tempfile.TemporaryDirectory() as directory:
+            cache = GitHubResponseCache(directory)
+            async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+                first = await cache.get_json(client, url, token='t')
+                second = await cache.get_json(client, url, token='t')
+                # 换一个 token 是另一个缓存条目
+                other = await cache.get_json(client, url, token='other')
+            leftovers = [name for name in os.listdir(directory) if not name.endswith('.json')]
+        
+        if first != (200, events) or second != (200, events) or other != (200, events):
+            print("❌ 304 没有返回缓存的内容")
+            return False
+        if conditions != [None, '"v1"', None] or (cache.hits, cache.misses) != (1, 2):
+            print(f"❌ 条件头或命中统计不正确: {conditions}, 命中 {cache.hits}，未命中 {cache.misses}")
+            return False
+        if leftovers:
+            print(f"❌ 缓存目录里留下了临时文件: {leftovers}")
+            return False
+        
+        print("✅ GitHub 条件请求缓存正确 (304 复用缓存，命中 1 次、未命中 2 次)")
+        return True
+        
+    except Exception as e:
+        print(f"❌ GitHub 条件请求缓存测试失败: {e}")
+        return False
+
+async def test_report_cache():
+    """测试日报缓存：重跑和多个 chat 命中缓存、TTL 过期、容量淘汰"""
+    print("\n🗃️ 测试日报缓存...")
+    
+    try:
+        import tempfile
+        import httpx
+        from datetime import date
+        from advanced_report import DailyReportGenerator
+        from event_store import EventStore, set_event_store
+        from github_cache import GitHubResponseCache, set_default_cache
+        from report_cache import ReportCache, report_key, set_report_cache
+        from resilience import set_last_good
+        
+        calls = []
+        
+        def handler(request):
+            calls.append(request.url)
+            return httpx.Response(200, json=[])
+        
+        with tempfile.TemporaryDirectory() as directory:
+            set_default_cache(GitHubResponseCache(os.path.join(directory, 'github')))
+            set_report_cache(ReportCache(os.path.join(directory, 'reports')))
+            set_event_store(EventStore(':memory:'))
+            set_last_good(ReportCache(os.path.join(directory, 'last_good'), source='last_good'))
+            async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+                first = await DailyReportGenerator('octocat', client, chat_id='1').generate_report(1)
+                retry = await DailyReportGenerator('octocat', client, chat_id='1').generate_report(1)
+                other_chat = await DailyReportGenerator('octocat', client, chat_id='2').generate_report(1)
+                preview = await DailyReportGenerator('octocat', client, chat_id='3').generate_report(1, cache_only=True)
+            if len(calls) != 1 or first != retry or not other_chat or not preview:
+                print(f"❌ 重跑或多 chat 没有命中缓存 (GitHub 请求 {len(calls)} 次)")
+                return False
+            
+            # 今天的日报只短暂缓存：之后的新提交要出现在所有 chat 的日报里
+            import advanced_report
+            target = DailyReportGenerator('octocat', chat_id='1').github_target_date(0)
+            feed = []
+            
+            def events_handler(request):
+                return httpx.Response(200, json=feed if request.url.params.get('page', '1') == '1' else [])
+            
+            def push(event_id, message):
+                feed.insert(0, {'id': str(event_id), 'type': 'PushEvent', 'repo': {'name': 'octocat/repo'},
+                                'payload': {'commits': [{'message': message}]},
+                                'created_at': f"{target.isoformat()}T12:00:00Z"})
+            
+            today_ttl = advanced_report.REPORT_CACHE_TODAY_TTL
+            advanced_report.REPORT_CACHE_TODAY_TTL = 0.05
+            try:
+                async with httpx.AsyncClient(transport=httpx.MockTransport(events_handler)) as client:
+                    push(1, 'morning work')
+                    await DailyReportGenerator('octocat', client, chat_id='1').generate_report(0)
+                    push(2, 'afternoon fix')
+                    time.sleep(0.06)
+                    again = await DailyReportGenerator('octocat', client, chat_id='1').generate_report(0)
+                    other = await DailyReportGenerator('octocat', client, chat_id='2').generate_report(0)
+            finally:
+                advanced_report.REPORT_CACHE_TODAY_TTL = today_ttl
+            if 'afternoon fix' not in again or 'afternoon fix' not in other:
+                print("❌ 今天的日报被长时间缓存，新提交没有出现")
+                return False
+            
+            # TTL 过期与容量淘汰
+            cache = ReportCache(os.path.join(directory, 'small'), ttl=0.05, max_entries=2)
+            keys = [report_key('u', date(2025, 1, 1), 1, chat) for chat in range(3)]
+            for key in keys:
+                cache.put(key, {'report': key})
+            if cache.get(keys[0]) is not None or cache.get(keys[2]) is None:
+                print("❌ 超过条目上限时没有淘汰最旧的条目")
+                return False
+            time.sleep(0.06)
+            if cache.get(keys[2]) is not None:
+                print("❌ 过期条目仍被命中")
+                return False
+
+            # 多个写入方同时写同一条目：每次都用各自的临时文件，最后留下一份完整的条目
+            from concurrent.futures import ThreadPoolExecutor
+            shared = ReportCache(os.path.join(directory, 'shared'))
+            with ThreadPoolExecutor(max_workers=8) as pool:
+                list(pool.map(lambda i: shared.put(keys[0], {'report': 'x' * 1000 * i}), range(1, 41)))
+            leftovers = [name for name in os.listdir(shared.cache_dir) if not name.endswith('.json')]
+            if leftovers or len(ReportCache(shared.cache_dir).get(keys[0])['report']) % 1000:
+                print(f"❌ 并发写入同一条目时结果不完整 (残留 {leftovers})")
+                return False
+        
+        set_default_cache(None)
+        set_report_cache(None)
+        set_event_store(None)
+        set_last_good(None)
+        print("✅ 日报缓存正确 (重跑、多 chat 均未重复请求 GitHub)")
+        return True
+        
+    except Exception as e:
+        print(f"❌ 日报缓存测试失败: {e}")
+        return False
+
+async def test_event_store():
+    """测试 GitHub 事件库：增量翻页、去重、按日期查询"""
+    print("\n🗂️ 测试 GitHub 事件库...")
+    
+    try:
+        import tempfile
+        import httpx
+        from datetime import date, timedelta
+        from event_store import EventStore
+        from github_cache import GitHubResponseCache, set_default_cache
+        
+        # 250 个事件，id 随时间递增，每 10 个事件相隔一天
+        def make_events(count, newest_id):
+            return [{'id': str(newest_id - i), 'type': 'PushEvent', 'repo': {'name': 'me/repo'},
+                     'payload': {'commits': [{'message': f'commit {newest_id - i}'}]},
+                     'created_at': (date(2025, 3, 31) - timedelta(days=i // 10)).isoformat() + 'T12:00:00Z'}
+                    for i in range(count)]
+        
+        feed = make_events(250, 1000)
+        pages = []
+        
+        def handler(request):
+            page = int(request.url.params['page'])
+            per_page = int(request.url.params['per_page'])
+            pages.append(page)
+            return httpx.Response(200, json=feed[(page - 1) * per_page:page * per_page])
+        
+        with tempfile.TemporaryDirectory() as directory:
+            set_default_cache(GitHubResponseCache(directory))
+            store = EventStore(':memory:')
+            async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+                first = await store.sync(client, 'me')
+                # 新增 5 个事件后再同步：只需要第一页
+                feed = make_events(5, 1005) + feed
+                pages.clear()
+                second = await store.sync(client, 'me')
+            set_default_cache(None)
+        
+        if first != 250 or second != 5 or pages != [1]:
+            print(f"❌ 增量同步错误: 首次 {first}，第二次 {second}，翻页 {pages}")
+            return False
+        # 第 20 天前的事件远在第一页之外，也能查到
+        if len(store.events_between('me', date(2025, 3, 11))) != 10:
+            print("❌ 按日期查询错误")
+            return False
+        
+        print("✅ GitHub 事件库正确 (增量翻页、去重、按日期查询)")
+        return True
+        
+    except Exception as e:
+        print(f"❌ GitHub 事件库测试失败: {e}")
+        return False
+
+async def test_graphql_source():
+    """测试 GraphQL 批量数据源：多个用户合并成一个请求，结果结构与 REST 相同"""
+    print("\n🐙 测试 GraphQL 批量数据源...")
+    
+    try:
+        import httpx
+        from datetime import date
+        from github_graphql import GraphQLContributionSource
+        from resilience import UpstreamError
+        
+        requests_seen = []
+        outage = []
+        
+        def handler(request):
+            body = json.loads(request.content)
+            requests_seen.append(body)
+            if outage:
+                return httpx.Response(200, json={'data': None, 'errors': [{'message': 'Something went wrong'}]})
+            users = {key: value for key, value in body['variables'].items() if key.startswith('u')}
+            data = {key: None if value == 'ghost' else {'contributionsCollection': {
+                'pullRequestContributions': {'nodes': [{'pullRequest': {
+                    'title': f'PR by {value}', 'url': 'https://github.com/x/y/pull/1',
+                    'repository': {'nameWithOwner': 'x/y'}}}]},
+                'issueContributions': {'nodes': []},
+                'commitContributionsByRepository': [{'repository': {'nameWithOwner': 'x/y'},
+                                                     'contributions': {'nodes': [{'commitCount': 3}]}}],
+            }} for key, value in users.items()}
+            return httpx.Response(200, json={'data': data})
+        
+        source = GraphQLContributionSource('token', batch_size=4)
+        users = [f'user{i}' for i in range(9)] + ['ghost']
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            batches = await source.prefetch(client, users, date(2025, 1, 1))
+            activity = await source.get_activity(client, 'user5', date(2025, 1, 1))
+            prefetched = len(requests_seen)
+            missing = await source.get_activity(client, 'ghost', date(2025, 1, 1))
+            # 错误结果不缓存：再问一次会重新请求
+            await source.get_activity(client, 'ghost', date(2025, 1, 1))
+            retried_error = len(requests_seen) - prefetched
+            
+            # 整个查询失败（data 为 null）抛出上游错误，不缓存
+            outage.append(True)
+            try:
+                await source.get_activity(client, 'user0', date(2025, 1, 2))
+                print("❌ GraphQL errors 没有按失败处理")
+                return False
+            except UpstreamError:
+                pass
+            outage.clear()
+            recovered = await source.get_activity(client, 'user0', date(2025, 1, 2))
+            
+            # 结果过期后重新请求，过期条目被清掉
+            source.result_ttl = 0
+            before = len(requests_seen)
+            await source.get_activity(client, 'user5', date(2025, 1, 1))
+            source.expire()
+            refetched = len(requests_seen) - before
+        
+        if retried_error != 2 or recovered.get('error') or refetched != 1 or source._results:
+            print(f"❌ 结果缓存不正确: 错误结果请求 {retried_error} 次，过期后请求 {refetched} 次")
+            return False
+        if batches != 3 or prefetched != 3 or requests_seen[0]['variables']['from'] != '2025-01-01T00:00:00Z':
+            print(f"❌ 批量请求数错误: {len(requests_seen)}")
+            return False
+        if activity['prs'][0]['title'] != 'PR by user5' or activity['commits'][0]['message'] != '3 个 commit':
+            print("❌ 结果转换错误")
+            return False
+        if not missing.get('error'):
+            print("❌ 不存在的用户没有标记错误")
+            return False
+        
+        print("✅ GraphQL 批量数据源正确 (10 个用户 3 个请求)")
+        return True
+        
+    except Exception as e:
+        print(f"❌ GraphQL 数据源测试失败: {e}")
+        return False
+
+def test_run_log():
+    """测试跑步日志：追加后汇总增量更新，汇总落后时只补尾部"""
+    print("\n🏃 测试跑步日志...")
+    
+    try:
+        import tempfile
+        from datetime import date
+        from run_log import RunLog, RECORD_SIZE
+        
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'runs.bin')
+            run_log = RunLog(path)
+            # 2025-10-06 是周一
+            run_log.append(date(2025, 10, 6), 5.0, 1800)
+            run_log.append(date(2025, 10, 7), 10.0, 3600)
+            run_log.append(date(2025, 9, 30), 8.0, 2700)
+            run_log.append(date(2024, 12, 31), 3.0, 1000)
+            stats = run_log.stats(date(2025, 10, 8), {'weekly_goal': 20, 'monthly_goal': 60, 'yearly_goal': 100})
+            expected = {'yesterday': True, 'week_distance': 15.0, 'month_distance': 15.0,
+                        'year_distance': 23.0, 'week_progress': 75.0, 'month_progress': 25.0,
+                        'last_run_date': '2025-10-07'}
+            wrong = {key: stats[key] for key in expected if stats[key] != expected[key]}
+            if wrong:
+                print(f"❌ 汇总错误: {wrong}")
+                return False
+            
+            # 另一个进程追加了记录、汇总文件没跟上：重新打开时只补上尾部
+            RunLog(path).append(date(2025, 10, 8), 2.0)
+            with open(f"{os.path.splitext(path)[0]}.rollup.json", 'r', encoding='utf-8') as f:
+                rollup = json.load(f)
+            rollup['records'] = 4
+            rollup['year']['2025'][0] -= 2.0
+            with open(f"{os.path.splitext(path)[0]}.rollup.json", 'w', encoding='utf-8') as f:
+                json.dump(rollup, f)
+            # 写了一半的记录不计入
+            with open(path, 'ab') as f:
+                f.write(b'\0' * (RECORD_SIZE // 2))
+            reopened = RunLog(path)
+            if reopened.total('year', date(2025, 10, 8))[0] != 25.0 or reopened.rollup['records'] != 5:
+                print(f"❌ 补齐尾部错误: {reopened.rollup['year']}")
+                return False
+            if reopened.rebuild()['year'] != reopened.rollup['year']:
+                print("❌ 重新计算结果不一致")
+                return False
+        
+        print("✅ 跑步日志正确 (增量汇总、目标进度、补齐尾部)")
+        return True
+        
+    except Exception as e:
+        print(f"❌ 跑步日志测试失败: {e}")
+        return False
+
+def test_activity_import():
+    """测试运动文件导入：GPX/TCX/FIT 流式解析、距离和移动时间、去重写入跑步日志"""
+    print("\n⌚ 测试运动文件导入...")
+    
+    try:
+        import struct
+        import tempfile
+        from datetime import date
+        from activity_import import FIT_EPOCH, SEMICIRCLE, import_activities
+        from run_log import RunLog
+        
+        # 沿经线每秒向北 3 米跑 10 分钟，中间停 60 秒（原地，没有移动时间）
+        start = 1759700000  # 2025-10-05 21:33:20 UTC = 10-06 北京时间
+        step = 3 / 111194.93
+        points = [(start + i, 22.5 + i * step, 114.0) for i in range(300)]
+        points += [(start + 300 + i, points[-1][1], 114.0) for i in range(1, 61)]
+        points += [(start + 360 + i, points[-1][1] + i * step, 114.0) for i in range(1, 301)]
+        iso = lambda t: time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(t))
+        
+        gpx = ['<?xml version="1.0"?><gpx xmlns="http://www.topografix.com/GPX/1/1"><metadata><time>2020-01-01T00:00:00Z</time></metadata><trk><trkseg>']
+        gpx += [f'<trkpt lat="{lat}" lon="{lon}"><ele>10</ele><time>{iso(t)}</time></trkpt>' for t, lat, lon in points]
+        gpx.append('</trkseg></trk></gpx>')
+        tcx = ['<TrainingCenterDatabase xmlns="http://www.garmin.com/xmlschemas/TrainingCenterDatabase/v2"><Activities><Activity><Lap><Track>']
+        tcx += [f'<Trackpoint><Time>{iso(t)}</Time><Position><LatitudeDegrees>{lat}</LatitudeDegrees>'
+                f'<LongitudeDegrees>{lon}</LongitudeDegrees></Position></Trackpoint>' for t, lat, lon in points]
+        tcx.append('</Track></Lap></Activity></Activities></TrainingCenterDatabase>')
+        # FIT：record 定义（时间戳、纬度、经度、心率），数据消息；再加一条不相关的消息
+        records = [bytes([0x40, 0, 0]) + struct.pack('<HB', 20, 4) + bytes([253, 4, 0x86, 0, 4, 0x85, 1, 4, 0x85, 3, 1, 0x02])]
+        records += [b'\x00' + struct.pack('<Iiib', t - FIT_EPOCH, round(lat / SEMICIRCLE), round(lon / SEMICIRCLE), 120)
+                    for t, lat, lon in points]
+        records += [bytes([0x41, 0, 0]) + struct.pack('<HB', 21, 1) + bytes([0, 1, 0]), b'\x01\x00']
+        data = b''.join(records)
+        fit = struct.pack('<BBHI4s', 12, 16, 2100, len(data), b'.FIT') + data + b'\x00\x00'
+        
+        with tempfile.TemporaryDirectory() as directory:
+            for name, content in (('a.gpx', ''.join(gpx).encode()), ('b.tcx', ''.join(tcx).encode()),
+                                  ('c.fit', fit), ('broken.gpx', b'<gpx><trk>')):
+                with open(os.path.join(directory, name), 'wb') as f:
+                    f.write(content)
+            run_log = RunLog(os.path.join(directory, 'log', 'runs.bin'))
+            summary = import_activities([directory], run_log=run_log, workers=2)
+            
+            if len(summary['imported']) != 3 or len(summary['failed']) != 1:
+                print(f"❌ 导入结果错误: {summary}")
+                return False
+            for result in summary['imported']:
+                if abs(result['distance_km'] - 1.797) > 0.005 or abs(result['moving_time'] - 598) > 1:
+                    print(f"❌ {result['path']} 距离/移动时间错误: {result['distance_km']} km {result['moving_time']}s")
+                    return False
+            if abs(run_log.total('day', date(2025, 10, 6))[0] - 3 * 1.797) > 0.02:
+                print(f"❌ 没有按北京时间日期写入跑步日志: {run_log.rollup['day']}")
+                return False
+            again = import_activities([directory], run_log=run_log, workers=1)
+            if again['imported'] or len(again['skipped']) != 3 or run_log.rollup['records'] != 3:
+                print("❌ 重复导入没有跳过")
+                return False
+        
+        # 没有安装 NumPy 时逐点计算，结果与向量化计算一致
+        import activity_import
+        track = activity_import.Track()
+        for t, lat, lon in points:
+            track.add(t, lat, lon)
+        numpy_module = activity_import.np
+        activity_import.np = None
+        try:
+            fallback = activity_import.track_stats(track)
+        finally:
+            activity_import.np = numpy_module
+        if abs(fallback[0] - 1797) > 5 or abs(fallback[1] - 598) > 1:
+            print(f"❌ 逐点计算的距离/移动时间错误: {fallback}")
+            return False
+        if numpy_module is not None:
+            vectorized = activity_import.track_stats(track)
+            if any(abs(a - b) > 1e-6 * max(1.0, abs(b)) for a, b in zip(fallback, vectorized)):
+                print(f"❌ 逐点计算与 NumPy 结果不一致: {fallback} / {vectorized}")
+                return False
+        
+        print("✅ 运动文件导入正确 (GPX/TCX/FIT、移动时间、去重、NumPy 与逐点计算一致)")
+        return True
+        
+    except Exception as e:
+        print(f"❌ 运动文件导入测试失败: {e}")
+        return False
+
+async def test_resilience():
+    """测试数据源时限与熔断：上游卡住时按时限返回上次成功的结果，连续失败后不再请求"""
+    print("\n⚡ 测试数据源时限与熔断...")
+    
+    try:
+        import tempfile
+        import httpx
+        import resilience
+        from advanced_report import DailyReportGenerator
+        from event_store import EventStore, set_event_store
+        from github_cache import GitHubResponseCache, set_default_cache
+        from report_cache import ReportCache
+        
+        mode = {'value': 'ok'}
+        calls = []
+        
+        async def handler(request):
+            calls.append(mode['value'])
+            if mode['value'] == 'hang':
+                await asyncio.sleep(5)
+            if mode['value'] == 'down':
+                return httpx.Response(503)
+            day = DailyReportGenerator('octocat').github_target_date(1)
+            return httpx.Response(200, json=[{
+                'id': '1', 'type': 'PushEvent', 'repo': {'name': 'octocat/hello'},
+                'payload': {'commits': [{'message': 'last good commit'}]},
+                'created_at': f"{day.isoformat()}T12:00:00Z"}])
+        
+        budget = resilience.REPORT_DEADLINE
+        with tempfile.TemporaryDirectory() as directory:
+            set_default_cache(GitHubResponseCache(os.path.join(directory, 'github')))
+            resilience.set_last_good(ReportCache(os.path.join(directory, 'last_good'), source='last_good'))
+            resilience.reset_breakers()
+            resilience.REPORT_DEADLINE = 0.3
+            try:
+                async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+                    set_event_store(EventStore(':memory:'))
+                    fresh = await DailyReportGenerator('octocat', client).generate_report(1, use_cache=False)
+                    
+                    # 上游卡住：本地事件库是空的，只能用上次成功的结果
+                    mode['value'] = 'hang'
+                    set_event_store(EventStore(':memory:'))
+                    start = time.perf_counter()
+                    stale = await DailyReportGenerator('octocat', client).generate_report(1, use_cache=False)
+                    elapsed = time.perf_counter() - start
+                    
+                    # 连续失败后熔断，之后的日报不再请求 GitHub
+                    mode['value'] = 'down'
+                    await DailyReportGenerator('octocat', client).generate_report(1, use_cache=False)
+                    before = len(calls)
+                    skipped = await DailyReportGenerator('octocat', client).generate_report(1, use_cache=False)
+            finally:
+                resilience.REPORT_DEADLINE = budget
+                breaker_state = resilience.get_breaker('github').state
+                resilience.reset_breakers()
+                resilience.set_last_good(None)
+                set_default_cache(None)
+                set_event_store(None)
+        
+        if 'last good commit' not in fresh or 'last good commit' not in stale or '上次获取的数据' not in stale:
+            print("❌ 超时后没有使用上次成功的结果")
+            return False
+        if elapsed > 1.0:
+            print(f"❌ 上游卡住时没有按时限返回 ({elapsed:.2f}s)")
+            return False
+        if breaker_state != 'open' or len(calls) != before or 'last good commit' not in skipped:
+            print(f"❌ 熔断器没有生效 (状态 {breaker_state}，请求 {calls})")
+            return False
+        
+        # 半开：只放行一个试探请求，失败后重新打开
+        breaker = resilience.CircuitBreaker('probe', threshold=2, reset_after=0)
+        breaker.record_failure()
+        breaker.record_failure()
+        if not breaker.allow() or breaker.allow():
+            print("❌ 半开状态应只放行一个试探请求")
+            return False
+        breaker.record_success()
+        if breaker.state != 'closed':
+            print("❌ 试探成功后熔断器没有恢复")
+            return False
+        
+        # 试探请求被取消（到了回复时限）后，下一个请求可以重新试探
+        breaker = resilience._breakers['probe'] = resilience.CircuitBreaker('probe', threshold=1, reset_after=0)
+        breaker.record_failure()
+        probe = asyncio.create_task(resilience.call_with_retries('probe', lambda timeout: asyncio.sleep(10)))
+        await asyncio.sleep(0.05)
+        probe.cancel()
+        await asyncio.gather(probe, return_exceptions=True)
+        allowed = breaker.allow()
+        resilience.reset_breakers()
+        if not allowed:
+            print("❌ 试探请求被取消后熔断器一直不放行")
+            return False
+
+        # 半开时时限已用完（交互模式的 Deadline(0)）：不占用试探名额，下一个请求照样可以试探
+        breaker = resilience._breakers['probe'] = resilience.CircuitBreaker('probe', threshold=1, reset_after=0)
+        breaker.record_failure()
+        try:
+            await resilience.call_with_retries('probe', lambda timeout: asyncio.sleep(0), resilience.Deadline(0))
+            print("❌ 时限已用完时仍然发出了请求")
+            return False
+        except resilience.SourceUnavailable:
+            pass
+        allowed = breaker.allow()
+        resilience.reset_breakers()
+        if not allowed:
+            print("❌ 时限用完后熔断器一直不放行")
+            return False
+        
+        print(f"✅ 数据源时限与熔断正确 (卡住时 {elapsed * 1000:.0f}ms 内返回旧数据，熔断后不再请求)")
+        return True
+        
+    except Exception as e:
+        print(f"❌ 数据源时限与熔断测试失败: {e}")
+        return False
+
+async def test_interactive_bot():
+    """测试交互模式：GitHub 很慢时 1 秒内用旧数据回复，相同请求只生成一次，完整结果出来后命中缓存"""
+    print("\n🤖 测试交互模式...")
+
+    try:
+        import tempfile
+        import httpx
+        import resilience
+        from advanced_report import DailyReportGenerator
+        from bot_client import create_bot
+        from event_store import EventStore, set_event_store
+        from fake_telegram import FAKE_TOKEN, FakeTelegramServer
+        from github_cache import GitHubResponseCache, set_default_cache
+        from interactive_bot import InteractiveBot, parse_command
+        from report_cache import ReportCache, set_report_cache
+
+        if (parse_command('/github@daily_bot 3'), parse_command('/today'), parse_command('/report'),
+                parse_command('/report abc'), parse_command('你好')) != (3, 0, 1, 'help', None):
+            print("❌ 命令解析错误")
+            return False
+
+        delay = {'value': 0.0}
+        calls = []
+
+        async def handler(request):
+            calls.append(delay['value'])
+            await asyncio.sleep(delay['value'])
+            day = DailyReportGenerator('octocat').github_target_date(1)
+            message = 'slow commit' if delay['value'] else 'old commit'
+            return httpx.Response(200, json=[{
+                'id': str(len(calls)), 'type': 'PushEvent', 'repo': {'name': 'octocat/hello'},
+                'payload': {'commits': [{'message': message}]},
+                'created_at': f"{day.isoformat()}T12:00:00Z"}])
+
+        with tempfile.TemporaryDirectory() as directory:
+            set_default_cache(GitHubResponseCache(os.path.join(directory, 'github')))
+            set_report_cache(ReportCache(os.path.join(directory, 'reports')))
+            resilience.set_last_good(ReportCache(os.path.join(directory, 'last_good'), source='last_good'))
+            resilience.reset_breakers()
+            try:
+                async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client, \
+                        FakeTelegramServer() as server:
+                    # 先有一次成功的结果，之后 GitHub 变慢
+                    set_event_store(EventStore(':memory:'))
+                    await DailyReportGenerator('octocat', client, chat_id='7').generate_report(1, use_cache=False)
+                    set_event_store(EventStore(':memory:'))
+                    delay['value'] = 1.5
+                    before = len(calls)
+
+                    bot = create_bot(FAKE_TOKEN, base_url=server.base_url)
+                    async with bot:
+                        interactive = InteractiveBot(bot, [{'chat_id': 7, 'github_username': 'octocat'}],
+                                                     poll_timeout=0.2, reply_deadline=0.3, http_client=client)
+                        poller = asyncio.create_task(interactive.poll())
+                        start = time.perf_counter()
+                        for _ in range(3):
+                            server.push_update(7, '/report')
+                        while len(server.messages) < 3 and time.perf_counter() - start < 5:
+                            await asyncio.sleep(0.02)
+                        elapsed = time.perf_counter() - start
+                        first = [message['text'] for message in server.messages]
+                        fetches = len(calls) - before
+                        shared = interactive.cache.coalesced + interactive.cache.hits
+
+                        # 后台的完整结果出来后，下一次命令直接命中缓存
+                        await asyncio.gather(*interactive._background)
+                        server.push_update(7, '/report')
+                        while len(server.messages) < 4 and time.perf_counter() - start < 10:
+                            await asyncio.sleep(0.02)
+                        interactive.stop()
+                        await poller
+                        await interactive.close()
+                    last = server.messages[-1]['text']
+            finally:
+                resilience.reset_breakers()
+                resilience.set_last_good(None)
+                set_report_cache(None)
+                set_default_cache(None)
+                set_event_store(None)
+
+        if len(first) != 3 or elapsed > 1.0 or not all('old commit' in text for text in first):
+            print(f"❌ GitHub 很慢时没有及时用旧数据回复 ({len(first)} 条，{elapsed:.2f}s)")
+            return False
+        if fetches != 1 or shared != 2:
+            print(f"❌ 相同的请求没有合并 (请求 GitHub {fetches} 次)")
+            return False
+        if 'slow commit' not in last or len(calls) - before != 1 or interactive.cache.hits < 1:
+            print("❌ 完整结果没有更新到回复缓存")
+            return False
+
+        # /today：回复缓存过期后重新获取当天的活动，不会被 12 小时的日报缓存挡住
+        from benchmark import FakeBot
+        from interactive_bot import ResponseCache
+
+        today = DailyReportGenerator('octocat').github_target_date(0)
+        feed = []
+
+        def today_handler(request):
+            return httpx.Response(200, json=feed if request.url.params.get('page', '1') == '1' else [])
+
+        def push(event_id, message):
+            feed.insert(0, {'id': str(event_id), 'type': 'PushEvent', 'repo': {'name': 'octocat/hello'},
+                            'payload': {'commits': [{'message': message}]},
+                            'created_at': f"{today.isoformat()}T12:00:00Z"})
+
+        with tempfile.TemporaryDirectory() as directory:
+            set_default_cache(GitHubResponseCache(os.path.join(directory, 'github')))
+            set_report_cache(ReportCache(os.path.join(directory, 'reports')))
+            set_event_store(EventStore(':memory:'))
+            resilience.set_last_good(ReportCache(os.path.join(directory, 'last_good'), source='last_good'))
+            try:
+                async with httpx.AsyncClient(transport=httpx.MockTransport(today_handler)) as client:
+                    interactive = InteractiveBot(FakeBot(), [{'chat_id': 8, 'github_username': 'octocat'}],
+                                                 cache=ResponseCache(ttl=0.05), http_client=client)
+                    push(1, 'morning work')
+                    await interactive.answer(8, 0)
+                    push(2, 'afternoon fix')
+                    await asyncio.sleep(0.06)
+                    refreshed = await interactive.answer(8, 0)
+                    await interactive.close()
+            finally:
+                resilience.set_last_good(None)
+                set_report_cache(None)
+                set_default_cache(None)
+                set_event_store(None)
+        if 'afternoon fix' not in refreshed:
+            print("❌ /today 的回复缓存过期后仍是旧数据")
+            return False
+
+        print(f"✅ 交互模式正确 (GitHub 延迟 1.5s 时 {elapsed * 1000:.0f}ms 内回复，3 个相同请求只请求一次)")
+        return True
+
+    except Exception as e:
+        print(f"❌ 交互模式测试失败: {e}")
+        return False
+
+async def test_sharded_fanout():
+    """测试多进程分片推送：同一用户不跨分片，所有接收者都收到各自的日报"""
+    print("\n🧵 测试多进程分片推送...")
+
+    try:
+        import functools
+        import tempfile
+        from benchmark import FakeBot, sharded_worker_client, sharded_worker_setup
+        from sharded_fanout import ShardedFanout, make_shards
+
+        recipients = [{'chat_id': str(1000 + i), 'github_username': f"user{i % 7}"} for i in range(60)]
+        shards = make_shards(recipients, shard_size=10)
+        owners = {}
+        for index, shard in enumerate(shards):
+            for recipient in shard:
+                owners.setdefault(recipient['github_username'], set()).add(index)
+        if sorted(r['chat_id'] for shard in shards for r in shard) != sorted(r['chat_id'] for r in recipients):
+            print("❌ 分片丢失或重复了接收者")
+            return False
+        if any(len(indexes) > 1 for indexes in owners.values()):
+            print("❌ 同一个 GitHub 用户被拆到了多个分片")
+            return False
+
+        bot = FakeBot()
+        with tempfile.TemporaryDirectory() as directory:
+            sender = ShardedFanout(bot, processes=2, workers=8, shard_size=10, global_rate=1e9, group_rate=1e9,
+                                   setup=functools.partial(sharded_worker_setup, directory),
+                                   client_factory=functools.partial(sharded_worker_client, 0.0))
+            stats = await sender.run(recipients)
+
+        if stats['sent'] != len(recipients) or stats['failed'] or bot.sent != len(recipients):
+            print(f"❌ 分片推送结果不正确: {stats}")
+            return False
+
+        # 工作进程起不来时 run 抛出异常，但发送日志照样关闭、落盘
+        from send_journal import SendJournal
+        with tempfile.TemporaryDirectory() as directory:
+            journal = SendJournal(os.path.join(directory, 'journal.jsonl'), fsync_every=100)
+            journal.record_sent('1', '2026-03-01', [1])
+            sender = ShardedFanout(FakeBot(), processes=1, shard_size=10, journal=journal,
+                                   setup=functools.partial(int, 'not a number'))
+            try:
+                await sender.run(recipients[:3])
+                print("❌ 工作进程初始化失败时 run 没有报错")
+                return False
+            except Exception:
+                pass
+            if journal._file is not None or journal._unsynced:
+                print("❌ 分片生成失败后发送日志没有关闭")
+                return False
+
+        print(f"✅ 多进程分片推送正确 ({stats['processes']} 个进程、{stats['shards']} 个分片，"
+              f"{stats['sent']} 条，{stats['elapsed']} 秒)")
+        return True
+
+    except Exception as e:
+        print(f"❌ 多进程分片推送测试失败: {e}")
+        return False
+
+async def test_backfill():
+    """测试补生成：一次同步取回整个范围，按天分桶生成日报，回顾统计正确"""
+    print("\n🗓️ 测试补生成与回顾...")
+
+    try:
+        import tempfile
+        from datetime import date, timedelta
+        import httpx
+        import resilience
+        from advanced_report import DailyReportGenerator
+        from backfill import build_review, fetch_github_range, iter_reports, parse_range
+        from event_store import EventStore, set_event_store
+        from github_cache import GitHubResponseCache, set_default_cache
+        from report_template import render_review
+        from run_log import RunLog
+
+        start, end = date(2026, 3, 1), date(2026, 3, 10)
+        # 3 月 2、3、4 日和 8 日有提交，9 日有一个 PR
+        events = []
+        for day, count in ((2, 2), (3, 1), (4, 3), (8, 1)):
+            events.append({'id': str(1000 + day), 'type': 'PushEvent', 'repo': {'name': 'octocat/hello'},
+                           'payload': {'commits': [{'message': f"day {day} #{i}"} for i in range(count)]},
+                           'created_at': f"2026-03-{day:02d}T08:00:00Z"})
+        events.append({'id': '1009', 'type': 'PullRequestEvent', 'repo': {'name': 'octocat/world'},
+                       'payload': {'action': 'opened', 'pull_request': {'title': 'Add <review>', 'html_url': 'https://github.com/o/w/1'}},
+                       'created_at': "2026-03-09T08:00:00Z"})
+        events.sort(key=lambda event: int(event['id']), reverse=True)
+        calls = []
+
+        def handler(request):
+            calls.append(str(request.url))
+            return httpx.Response(200, json=events)
+
+        with tempfile.TemporaryDirectory() as directory:
+            set_default_cache(GitHubResponseCache(os.path.join(directory, 'github')))
+            set_event_store(EventStore(':memory:'))
+            resilience.reset_breakers()
+            run_log = RunLog(os.path.join(directory, 'runs.bin'))
+            run_log.append(date(2026, 3, 2), 5.0, 1800)
+            run_log.append(date(2026, 3, 5), 10.5, 3600)
+            run_log.append(date(2026, 4, 1), 3.0, 1000)
+            try:
+                async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+                    generator = DailyReportGenerator('octocat', client)
+                    buckets = await fetch_github_range(generator, start - timedelta(days=1), end)
+                reports = dict(iter_reports(buckets, start, end, username='octocat', chat_id='1'))
+                summary = build_review(buckets, start, end, run_log)
+                review = render_review(summary)
+            finally:
+                set_default_cache(None)
+                set_event_store(None)
+
+        if len(calls) != 1:
+            print(f"❌ 应只请求一次 GitHub，实际 {len(calls)} 次")
+            return False
+        if len(reports) != 10 or 'day 4 #1' not in reports[date(2026, 3, 5)] or '2026年03月09日' not in reports[date(2026, 3, 9)]:
+            print("❌ 逐天日报的日期或 GitHub 活动不正确")
+            return False
+        github, running = summary['github'], summary['running']
+        if (github['active_days'], github['longest_streak'], github['commits'], github['prs']) != (5, 3, 7, 1):
+            print(f"❌ 回顾中的 GitHub 统计不正确: {github}")
+            return False
+        if (running['runs'], running['distance'], running['longest']) != (2, 15.5, 10.5):
+            print(f"❌ 回顾中的跑步统计不正确: {running}")
+            return False
+        if parse_range('2025') != (date(2025, 1, 1), date(2025, 12, 31)) or parse_range('2024-02')[1] != date(2024, 2, 29):
+            print("❌ 日期范围解析错误")
+            return False
+        if 'octocat/hello（7 次提交）' not in review:
+            print("❌ 回顾渲染不正确")
+            return False
+
+        print(f"✅ 补生成正确 (1 次请求生成 {len(reports)} 天日报和回顾)")
+        return True
+
+    except Exception as e:
+        print(f"❌ 补生成测试失败: {e}")
+        return False
+
+def test_digest():
+    """测试周报 / 月报：每日汇总随事件写入增量更新、重复事件不重复计数，按汇总生成周报"""
+    print("\n📊 测试周报与月报...")
+
+    try:
+        import tempfile
+        from datetime import date
+        from digest import build_digest, build_digests, due_digests
+        from event_store import EventStore
+        from report_template import render_digest
+        from run_log import RunLog
+
+        def push(event_id, day, repo, commits):
+            return {'id': str(event_id), 'type': 'PushEvent', 'repo': {'name': repo},
+                    'payload': {'commits': [{'message': 'm'}] * commits}, 'created_at': f"{day}T10:00:00Z"}
+
+        store = EventStore(':memory:')
+        store.add_events('octocat', [push(1, '2026-10-12', 'o/a', 2), push(2, '2026-10-13', 'o/a', 1)])
+        # 第二次同步带着一个已经入库的事件
+        store.add_events('octocat', [push(2, '2026-10-13', 'o/a', 1), push(3, '2026-10-14', 'o/b', 4),
+                                     {'id': '4', 'type': 'PullRequestEvent', 'repo': {'name': 'o/b'},
+                                      'payload': {'action': 'opened'}, 'created_at': '2026-10-14T11:00:00Z'},
+                                     push(5, '2026-10-20', 'o/a', 1)])
+        incremental = store.activity_between('octocat', date(2026, 10, 1), date(2026, 10, 31))
+        store.rebuild_rollups()
+        if store.activity_between('octocat', date(2026, 10, 1), date(2026, 10, 31)) != incremental:
+            print("❌ 增量汇总与重新计算的结果不一致")
+            return False
+
+        with tempfile.TemporaryDirectory() as directory:
+            run_log = RunLog(os.path.join(directory, 'runs.bin'))
+            for day, distance in ((17, 5.0), (18, 8.0), (3, 10.0)):
+                run_log.append(date(2026, 10, day), distance, 1800)
+            goals = {'weekly_goal': 20, 'monthly_goal': 100, 'yearly_goal': 1000}
+            weekly = build_digest('weekly', date(2026, 10, 18), 'octocat', store, run_log, goals)
+            monthly = build_digest('monthly', date(2026, 10, 31), 'octocat', store, run_log, goals)
+
+            # 几千个用户：每人一次汇总查询
+            for index in range(2000):
+                store.set_day_activity(f"user{index}", date(2026, 10, 5), {'o/r': [index % 5 + 1, 1, 0]})
+            recipients = [{'chat_id': str(index), 'github_username': f"user{index}"} for index in range(2000)]
+            start = time.perf_counter()
+            messages = build_digests('monthly', date(2026, 10, 31), recipients, store, run_log, goals)
+            per_user_ms = (time.perf_counter() - start) / len(recipients) * 1000
+
+        github = weekly['github']
+        if (github['commits'], github['prs'], github['active_days'], github['streak']) != (7, 1, 3, 0):
+            print(f"❌ 周报 GitHub 统计不正确: {github}")
+            return False
+        if [repo['repo'] for repo in github['repos']] != ['o/b', 'o/a'] or monthly['github']['commits'] != 8:
+            print("❌ 仓库排序或月报统计不正确")
+            return False
+        running = weekly['running']
+        if (running['distance'], running['runs'], running['progress'], running['streak']) != (13.0, 2, 65.0, 2):
+            print(f"❌ 周报跑步统计不正确: {running}")
+            return False
+        if monthly['running']['distance'] != 23.0 or 'o/b：4 次提交，1 个 PR' not in render_digest(weekly):
+            print("❌ 月报跑步统计或渲染不正确")
+            return False
+        if due_digests(date(2026, 10, 18)) != ['weekly'] or due_digests(date(2026, 5, 31)) != ['weekly', 'monthly']:
+            print("❌ 发送日期判断错误")
+            return False
+        if len(messages) != 2000 or '3 次提交' not in messages[2][1] or per_user_ms > 5:
+            print(f"❌ 批量月报结果或耗时不正确 ({per_user_ms:.2f} ms/人)")
+            return False
+
+        print(f"✅ 周报与月报正确 (2000 个用户的月报每人 {per_user_ms:.2f} ms)")
+        return True
+
+    except Exception as e:
+        print(f"❌ 周报与月报测试失败: {e}")
+        return False
+
+async def test_send_journal():
+    """测试发送日志：批量 fsync、半行记录被忽略、重跑跳过已发送的 chat、死信补发不重新生成"""
+    print("\n📒 测试发送日志...")
+
+    try:
+        import tempfile
+        import resilience
+        from benchmark import FakeBot, sharded_worker_client, sharded_worker_setup
+        from event_store import set_event_store
+        from fanout import FanoutSender
+        from github_cache import set_default_cache
+        from report_cache import set_report_cache
+        from send_journal import SendJournal, replay_dead_letters
+
+        class FlakyBot(FakeBot):
+            """发往 failing 中的 chat 时抛出异常"""
+
+            def __init__(self, failing=()):
+                super().__init__()
+                self.failing = set(failing)
+                self.chats = []
+
+            async def send_message(self, chat_id, text, **kwargs):
+                if str(chat_id) in self.failing:
+                    raise ConnectionError("network down")
+                self.chats.append(str(chat_id))
+                return await super().send_message(chat_id, text, **kwargs)
+
+        recipients = [{'chat_id': str(2000 + i), 'github_username': f"user{i % 5}"} for i in range(40)]
+        failing = {'2003', '2017', '2031'}
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'send_journal.jsonl')
+            sharded_worker_setup(directory)
+            client = sharded_worker_client(0.0)
+            try:
+                # 第一次运行：3 个 chat 发送失败
+                journal = SendJournal(path, fsync_every=10, fsync_interval=3600)
+                sender = FanoutSender(FlakyBot(failing), workers=8, global_rate=1e9, group_rate=1e9,
+                                      http_client=client, journal=journal)
+                stats = await sender.run(recipients)
+                if stats['sent'] != 37 or stats['failed'] != 3 or not 0 < journal.syncs < len(recipients):
+                    print(f"❌ 第一次运行结果不正确: {stats}，fsync {journal.syncs} 次")
+                    return False
+
+                # 进程被杀时写了一半的最后一行
+                with open(path, 'a', encoding='utf-8') as f:
+                    f.write('{"chat": "2005", "date": ')
+
+                # 重跑：只处理没有发送成功的 chat
+                journal = SendJournal(path)
+                bot = FlakyBot(failing)
+                sender = FanoutSender(bot, workers=8, global_rate=1e9, group_rate=1e9,
+                                      http_client=client, journal=journal)
+                stats = await sender.run(recipients)
+                if stats['skipped'] != 37 or stats['failed'] != 3 or bot.sent:
+                    print(f"❌ 重跑没有跳过已发送的 chat: {stats}")
+                    return False
+                letters = journal.dead_letters()
+                if sorted(entry['chat'] for entry in letters) != sorted(failing) or not all(entry.get('text') for entry in letters):
+                    print("❌ 死信缺失或没有保存正文")
+                    return False
+
+                # 补发：直接发送保存的正文
+                bot = FlakyBot()
+                sent, failed = await replay_dead_letters(bot, SendJournal(path))
+                journal = SendJournal(path)
+                if (sent, failed) != (3, 0) or sorted(bot.chats) != sorted(failing) or journal.dead_letters():
+                    print(f"❌ 死信补发不正确: 成功 {sent}，失败 {failed}")
+                    return False
+                if not all(journal.is_done(r['chat_id'], sender.make_generator(r).current_time.date())
+                           for r in recipients):
+                    print("❌ 补发后发送日志没有标记为已发送")
+                    return False
+
+
+                # 预取 GitHub 数据出错：异常照样抛出，发送日志照样落盘、关闭
+                journal = SendJournal(os.path.join(directory, 'prefetch.jsonl'), fsync_every=100)
+                journal.record_sent('1', '2026-03-01', [1])
+                sender = FanoutSender(FlakyBot(), http_client=client, journal=journal)
+
+                async def broken_prefetch(pending):
+                    raise ConnectionError("graphql down")
+
+                sender.prefetch_github = broken_prefetch
+                try:
+                    await sender.run(recipients[:3])
+                    print("❌ 预取失败时 run 没有报错")
+                    return False
+                except ConnectionError:
+                    pass
+                if journal._file is not None or journal._unsynced:
+                    print("❌ 预取失败后发送日志没有关闭")
+                    return False
+            finally:
+                await client.aclose()
+                set_default_cache(None)
+                set_report_cache(None)
+                set_event_store(None)
+                resilience.set_last_good(None)
+
+        print("✅ 发送日志正确 (重跑跳过 37 个已发送 chat，3 份死信补发成功)")
+        return True
+
+    except Exception as e:
+        print(f"❌ 发送日志测试失败: {e}")
+        return False
+
+async def test_delivery_queue():
+    """测试投递队列：超长日报按 HTML 安全边界拆分、同一 chat 保序、429 后重试"""
+    print("\n📬 测试投递队列...")
+    
+    try:
+        import re
+        from bot_client import create_bot
+        from delivery import DeliveryQueue, message_length, split_message
+        from fake_telegram import FAKE_TOKEN, FakeTelegramServer
+        
+        report = "<b>📅 今日日报</b>\n\n" + "".join(
+            f"• 提交了: <a href=\"https://github.com/o/r/{i}\">修复 &amp; 优化 {i}</a> (<i>o/r</i>)\n" for i in range(300))
+        report += "<b>" + "很长的一段话 " * 800 + "</b>\n"
+        parts = split_message(report)
+        for part in parts:
+            if message_length(part) > 4096 or sorted(re.findall(r'<([a-z]+)[ >]', part)) != sorted(re.findall(r'</([a-z]+)>', part)):
+                print(f"❌ 拆分结果超长或标签不完整 ({message_length(part)} 字符)")
+                return False
+        if re.sub(r'</?b>', '', ''.join(parts)) != re.sub(r'</?b>', '', report):
+            print("❌ 拆分后内容不一致")
+            return False
+        
+        # 单个标签比上限还长（href 极长的链接）：去掉链接保留文字，每段都不超过上限
+        long_link = '<a href="https://example.com/?q=' + 'x' * 5000 + '">很长的链接</a>'
+        linked = report.replace('\n\n', '\n\n' + long_link + '\n', 1)
+        linked_parts = split_message(linked)
+        if max(message_length(part) for part in linked_parts) > 4096 or '很长的链接' not in ''.join(linked_parts):
+            print(f"❌ 超长标签导致分段超过上限: {[message_length(part) for part in linked_parts]}")
+            return False
+        if 'href="https://github.com/o/r/8"' not in ''.join(linked_parts):
+            print("❌ 普通链接也被去掉了")
+            return False
+        
+        async with FakeTelegramServer() as server:
+            bot = create_bot(FAKE_TOKEN, base_url=server.base_url)
+            async with bot:
+                server.fail_next(1, error_code=429, retry_after=1)
+                async with DeliveryQueue(bot, workers=4) as delivery:
+                    futures = [delivery.submit(42, report), delivery.submit(42, "⚠️ 错误通知", parse_mode=None)]
+                    futures += [delivery.submit(chat, f"chat {chat}") for chat in range(100, 110)]
+                    results = await asyncio.gather(*futures)
+            texts = [message['text'] for message in server.messages if message['chat']['id'] == 42]
+        
+        if len(results[0]) != len(parts) or len(texts) != len(parts) + 1:
+            print(f"❌ 分段数量错误: {len(results[0])} / {len(parts)}")
+            return False
+        if texts[-1] != "⚠️ 错误通知" or server.stats['rate_limited'] != 1 or delivery.stats['retries'] != 1:
+            print("❌ 同一 chat 的消息乱序或 429 没有重试")
+            return False
+        
+        print(f"✅ 投递队列正确 ({message_length(report)} 字符拆成 {len(parts)} 条，顺序与 429 重试正确)")
+        return True
+        
+    except Exception as e:
+        print(f"❌ 投递队列测试失败: {e}")
+        return False
+
 async def test_report_generation():
     """测试报告生成"""
     print("\n📋 测试报告生成...")
@@ -135,6 +1553,10 @@ async def test_send_report():
         print("⚠️ 未设置 CHAT_ID，跳过发送测试")
         return True
     
+    if not sys.stdin.isatty():
+        print("⏭️ 非交互环境，跳过发送测试")
+        return True
+    
     response = input("是否发送测试报告到 Telegram？(y/N): ").strip().lower()
     if response == 'y':
         try:
@@ -168,6 +1590,69 @@ async def main():
     result3 = await test_github_api()
     test_results.append(("GitHub API", result3))
     
+    # 农历换算测试
+    test_results.append(("农历换算", test_lunar_calendar()))
+    
+    # 节气计算测试
+    test_results.append(("节气计算", test_solar_terms()))
+    
+    # 模板渲染测试
+    test_results.append(("模板渲染", test_report_template()))
+    
+    # 诗词轮转测试
+    test_results.append(("诗词轮转", test_poem_rotation()))
+    
+    # 指标导出测试
+    test_results.append(("指标导出", test_metrics_export()))
+    
+    # Bot API 替身测试
+    test_results.append(("Bot API 替身", await test_fake_telegram()))
+    
+    # 批量推送测试
+    test_results.append(("批量推送", await test_fanout_sender()))
+    
+    # 常驻进程调度测试
+    test_results.append(("常驻进程调度", await test_daemon_schedule()))
+    
+    # GitHub 条件请求缓存测试
+    test_results.append(("GitHub 条件请求缓存", await test_github_cache()))
+    
+    # 日报缓存测试
+    test_results.append(("日报缓存", await test_report_cache()))
+    
+    # GitHub 事件库测试
+    test_results.append(("GitHub 事件库", await test_event_store()))
+    
+    # GraphQL 数据源测试
+    test_results.append(("GraphQL 数据源", await test_graphql_source()))
+    
+    # 投递队列测试
+    test_results.append(("投递队列", await test_delivery_queue()))
+    
+    # 数据源时限与熔断测试
+    test_results.append(("数据源时限与熔断", await test_resilience()))
+    
+    # 跑步日志测试
+    test_results.append(("跑步日志", test_run_log()))
+    
+    # 运动文件导入测试
+    test_results.append(("运动文件导入", test_activity_import()))
+    
+    # 交互模式测试
+    test_results.append(("交互模式", await test_interactive_bot()))
+    
+    # 多进程分片推送测试
+    test_results.append(("多进程分片推送", await test_sharded_fanout()))
+    
+    # 补生成与回顾测试
+    test_results.append(("补生成与回顾", await test_backfill()))
+    
+    # 周报与月报测试
+    test_results.append(("周报与月报", test_digest()))
+    
+    # 发送日志测试
+    test_results.append(("发送日志", await test_send_journal()))
+    
     # 报告生成测试
     result4 = await test_report_generation()
     test_results.append(("报告生成", result4))
@@ -197,6 +1682,11 @@ async def main():
     else:
         print("⚠️ 部分测试失败，请检查配置和网络连接。")
     
+    from http_pool import close_shared_client, get_pool_stats
+    await close_shared_client()
+    pool_stats = get_pool_stats()
+    print(f"\n🔌 HTTP 连接: 请求 {pool_stats['requests']} 次，新建 {pool_stats['connections_opened']} 个，复用 {pool_stats['connections_reused']} 次")
+    
     print("\n💡 接下来你可以:")
     print("   1. 运行 'python update_config.py' 更新配置")
     print("   2. 运行 'python advanced_report.py' 发送完整日报")
@@ -17,9 +17,6 @@ def load_config():
     except FileNotFoundError:
         return {
             "running": {
-                "month_distance": 0,
-                "year_distance": 0,
-                "last_run_date": "2025-01-01",
                 "weekly_goal": 20,
                 "monthly_goal": 80,
                 "yearly_goal": 1000
@@ -41,34 +38,39 @@ def save_config(config):
     print(f"✅ 配置已保存到 {config_path}")
 
 def update_running_data():
-    """更新跑步数据"""
+    """记录一次跑步（追加到跑步日志），可顺便修改目标距离"""
+    from run_log import format_duration, get_run_log, parse_duration
+
     config = load_config()
+    run_log = get_run_log()
     
-    print("🏃 更新跑步数据")
+    print("🏃 记录跑步")
     print("=" * 30)
     
     # 显示当前数据
     running = config['running']
-    print(f"当前本月距离: {running['month_distance']} km")
-    print(f"当前本年距离: {running['year_distance']} km") 
-    print(f"上次跑步日期: {running['last_run_date']}")
+    stats = run_log.stats(datetime.now().date(), running)
+    print(f"本周距离: {stats['week_distance']} / {stats['weekly_goal']} km")
+    print(f"本月距离: {stats['month_distance']} / {stats['monthly_goal']} km")
+    print(f"本年距离: {stats['year_distance']} / {stats['yearly_goal']} km")
+    print(f"上次跑步日期: {stats['last_run_date'] or '无'}")
     print()
     
-    # 更新数据
+    # 记录跑步
     try:
-        month_dist = input(f"输入本月跑步距离 (当前: {running['month_distance']} km): ").strip()
-        if month_dist:
-            running['month_distance'] = float(month_dist)
-        
-        year_dist = input(f"输入本年跑步距离 (当前: {running['year_distance']} km): ").strip()
-        if year_dist:
-            running['year_distance'] = float(year_dist)
-        
-        last_run = input(f"输入最后跑步日期 YYYY-MM-DD (当前: {running['last_run_date']}): ").strip()
-        if last_run:
+        distance = input("输入跑步距离 km（留空跳过）: ").strip()
+        if distance:
+            duration = parse_duration(input("输入用时 MM:SS 或 HH:MM:SS（可留空）: ").strip())
+            day = input(f"输入跑步日期 YYYY-MM-DD (默认: {datetime.now():%Y-%m-%d}): ").strip()
             # 验证日期格式
-            datetime.strptime(last_run, '%Y-%m-%d')
-            running['last_run_date'] = last_run
+            run_day = datetime.strptime(day, '%Y-%m-%d').date() if day else datetime.now().date()
+            run_log.append(run_day, float(distance), duration)
+            print(f"✅ 已记录 {run_day} {float(distance)} km {format_duration(duration)}")
+        
+        for key, label in (('weekly_goal', '每周'), ('monthly_goal', '每月'), ('yearly_goal', '每年')):
+            goal = input(f"输入{label}目标 km (当前: {stats[key]} km): ").strip()
+            if goal:
+                running[key] = float(goal)
         
         config['running'] = running
         save_config(config)
@@ -147,7 +149,7 @@ def main():
     while True:
         print("\n🔧 配置管理工具")
         print("=" * 30)
-        print("1. 更新跑步数据")
+        print("1. 记录跑步 / 修改目标")
         print("2. 更新 GitHub 用户名")
         print("3. 更新起床时间")
         print("4. 显示当前配置")